@@ -86,30 +86,18 @@ class PoolInfoHandler(BaseWebHandler):
         )
         expected_blocks = 144
         mining_time_interval = 600
-        shares_count = await self.config.mongo.async_db.shares.count_documents(
-            {"time": {"$gte": time.time() - mining_time_interval}}
-        )
-        if shares_count > 0:
-            pool_hash_rate = (
-                shares_count * self.config.pool_diff
-            ) / mining_time_interval
-        else:
-            pool_hash_rate = 0
+        pool_stats = self.config.pool_stats
+        pool_hash_rate = pool_stats.get_pool_hash_rate(mining_time_interval)
 
-        daily_blocks_found = await self.config.mongo.async_db.blocks.count_documents(
-            {"time": {"$gte": time.time() - (600 * 144)}}
-        )
+        daily_blocks_found = len(pool_stats.get_blocks_since(time.time() - (600 * 144)))
         if daily_blocks_found > 0:
             net_target = self.config.LatestBlock.block.target
-        avg_blocks_found = self.config.mongo.async_db.blocks.find(
-            {"time": {"$gte": time.time() - (600 * 36)}}
-        )
-        avg_blocks_found = await avg_blocks_found.to_list(length=52)
+        avg_blocks_found = pool_stats.get_blocks_since(time.time() - (600 * 36))[:52]
         avg_block_time = daily_blocks_found / expected_blocks * 600
         if len(avg_blocks_found) > 0:
             avg_net_target = 0
             for block in avg_blocks_found:
-                avg_net_target += int(block["target"], 16)
+                avg_net_target += block.target
             avg_net_target = avg_net_target / len(avg_blocks_found)
             avg_net_difficulty = (
                 0x0000FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF
@@ -157,12 +145,6 @@ class PoolInfoHandler(BaseWebHandler):
                     avg_time.append(f"{n} {u}" + "s" * (n > 1))
             avg_time = "  ".join(avg_time)
 
-        miner_count_pool_stat = await self.config.mongo.async_db.pool_stats.find_one(
-            {"stat": "miner_count"}
-        ) or {"value": 0}
-        worker_count_pool_stat = await self.config.mongo.async_db.pool_stats.find_one(
-            {"stat": "worker_count"}
-        ) or {"value": 0}
         payouts = (
             await self.config.mongo.async_db.share_payout.find({}, {"_id": 0})
             .sort([("index", -1)])
@@ -179,8 +161,8 @@ class PoolInfoHandler(BaseWebHandler):
                 "pool": {
                     "hashes_per_second": pool_hash_rate,
                     "pool_address": self.config.address,
-                    "miner_count": miner_count_pool_stat["value"],
-                    "worker_count": worker_count_pool_stat["value"],
+                    "miner_count": pool_stats.miner_count,
+                    "worker_count": pool_stats.worker_count,
                     "payout_scheme": "PPLNS",
                     "pool_fee": self.config.pool_take,
                     "min_payout": 0,
@@ -0,0 +1,109 @@
+from unittest import mock
+
+from bitcoin.wallet import P2PKHBitcoinAddress
+from coincurve import PrivateKey
+
+from yadacoin.core.balanceledger import BalanceLedger
+from yadacoin.core.config import Config
+
+from ..mocks import MockBlock, MockCursor, MockTransaction
+from ..test_setup import AsyncTestCase
+
+PUBLIC_KEY = PrivateKey().public_key.format().hex()
+ADDRESS = str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(PUBLIC_KEY)))
+
+
+class TestBalanceLedger(AsyncTestCase):
+    async def asyncSetUp(self):
+        config = Config.generate()
+        config.LatestBlock = mock.MagicMock()
+        config.LatestBlock.block = None
+        config.mongo = mock.MagicMock()
+        self.balances = {}
+        self.deltas = []
+
+        async def bulk_write(writes, ordered=True):
+            for write in writes:
+                address = write._filter["address"]
+                self.balances[address] = (
+                    self.balances.get(address, 0) + write._doc["$inc"]["balance"]
+                )
+
+        async def insert_many(docs):
+            self.deltas.extend(docs)
+
+        def find(query, projection):
+            return MockCursor(
+                [x for x in self.deltas if x["index"] >= query["index"]["$gte"]]
+            )
+
+        async def find_one(query, projection):
+            for x in self.deltas:
+                if x["index"] == query["index"]:
+                    return x
+
+        db = config.mongo.async_db
+        db.address_balances.bulk_write = bulk_write
+        db.address_balance_deltas.insert_many = insert_many
+        db.address_balance_deltas.bulk_write = mock.AsyncMock()
+        db.address_balance_deltas.find = find
+        db.address_balance_deltas.find_one = find_one
+        db.address_balance_state.update_one = mock.AsyncMock()
+        db.address_balance_state.replace_one = mock.AsyncMock()
+        self.ledger = BalanceLedger()
+        self.ledger.ready = True
+
+    async def test_get_block_deltas(self):
+        block = MockBlock(
+            0,
+            "hash0",
+            "",
+            [
+                MockTransaction(PUBLIC_KEY, [], [(ADDRESS, 50)]),
+                MockTransaction(PUBLIC_KEY, ["a"], [("other", 10), (ADDRESS, 40)]),
+            ],
+        )
+        self.assertEqual(
+            self.ledger.get_block_deltas(block), {ADDRESS: 40, "other": 10}
+        )
+        self.assertEqual(
+            self.ledger.get_block_deltas(
+                {
+                    "transactions": [
+                        {
+                            "public_key": PUBLIC_KEY,
+                            "inputs": [{"id": "a"}],
+                            "outputs": [{"to": "other", "value": 10}],
+                        }
+                    ]
+                }
+            ),
+            {ADDRESS: -10, "other": 10},
+        )
+
+    async def test_rollback_on_reorg(self):
+        await self.ledger.apply_block(
+            MockBlock(
+                0, "hash0", "", [MockTransaction(PUBLIC_KEY, [], [(ADDRESS, 50)])]
+            )
+        )
+        await self.ledger.apply_block(
+            MockBlock(
+                1,
+                "hash1",
+                "hash0",
+                [MockTransaction(PUBLIC_KEY, ["a"], [("other", 10)])],
+            )
+        )
+        self.assertEqual(self.balances, {ADDRESS: 40, "other": 10})
+        await self.ledger.apply_block(
+            MockBlock(
+                1,
+                "hash1b",
+                "hash0",
+                [MockTransaction(PUBLIC_KEY, ["a"], [("other2", 5)])],
+            )
+        )
+        self.assertEqual(self.ledger.height, 1)
+        self.assertEqual(self.ledger.block_hash, "hash1b")
+        self.assertEqual(self.balances, {ADDRESS: 45, "other": 0, "other2": 5})
@@ -1,3 +1,4 @@
+import json
 import unittest
 from unittest import mock
 from unittest.mock import AsyncMock, Mock
@@ -141,6 +142,20 @@ class TestBlock(AsyncTestCase):
         block_copy = await block.copy()
         self.assertIsInstance(block_copy, Block)
 
+        block = await Block.from_dict(json.loads(json.dumps(masternode_fee_block)))
+        block_copy = await block.copy()
+        self.assertEqual(block_copy.to_dict(), block.to_dict())
+        self.assertIsNot(block_copy.transactions[0], block.transactions[0])
+
+    async def test_lazy_transactions(self):
+        block = await Block.from_dict(json.loads(json.dumps(masternode_fee_block)))
+        self.assertIsNone(block._transactions)
+        self.assertEqual(
+            [x.transaction_signature for x in block.transactions],
+            [x["id"] for x in masternode_fee_block["transactions"]],
+        )
+        self.assertTrue(block.get_coinbase().coinbase)
+
     async def test_to_dict(self):
         block = await Block.init_async()
         self.assertIsInstance(block.to_dict(), dict)
@@ -0,0 +1,30 @@
+from yadacoin.core.blockverifier import BlockVerifier
+from yadacoin.core.config import Config
+
+from ..mocks import MockBlock
+from ..test_setup import AsyncTestCase
+
+
+class TestBlockVerifier(AsyncTestCase):
+    async def asyncSetUp(self):
+        Config.generate()
+        self.block_verifier = BlockVerifier()
+
+    def get_block(self):
+        transaction = {
+            "id": "signature",
+            "hash": "hash",
+            "outputs": [{"to": "address", "value": 1}],
+        }
+        return MockBlock(1, "blockhash", "prevhash", [transaction])
+
+    async def test_mark_verified(self):
+        self.block_verifier.mark_verified(self.get_block())
+        self.assertTrue(self.block_verifier.is_verified(self.get_block()))
+
+    async def test_tampered_body_is_not_verified(self):
+        self.block_verifier.mark_verified(self.get_block())
+        block = self.get_block()
+        # same block hash and signatures, different outputs
+        block.transactions[0]["outputs"][0]["value"] = 100
+        self.assertFalse(self.block_verifier.is_verified(block))
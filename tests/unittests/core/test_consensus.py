@@ -1,7 +1,16 @@
 import unittest
+from time import time
+from unittest import mock
 
+from pymongo.errors import OperationFailure
+
+from yadacoin.core.block import Block
+from yadacoin.core.blockchain import Blockchain
+from yadacoin.core.chain import CHAIN
+from yadacoin.core.config import Config
 from yadacoin.core.consensus import Consensus
 
+from ..mocks import MockBlock, MockTransaction
 from ..test_setup import AsyncTestCase
 
 
@@ -11,5 +20,145 @@ class TestTransaction(AsyncTestCase):
         self.assertIsInstance(c, Consensus)
 
 
+def get_block(index, transaction_signatures):
+    return MockBlock(
+        index,
+        transactions=[
+            MockTransaction(transaction_signature=x) for x in transaction_signatures
+        ],
+    )
+
+
+class TestWriteBlocks(AsyncTestCase):
+    async def asyncSetUp(self):
+        config = Config.generate()
+        config.mongo = mock.MagicMock()
+        config.mongo.async_client.start_session = mock.AsyncMock(
+            side_effect=OperationFailure("standalone", code=20)
+        )
+        config.mongo.async_db.blocks.bulk_write = mock.AsyncMock()
+        config.mongo.async_db.miner_transactions.delete_many = mock.AsyncMock()
+        self.config = config
+        self.consensus = Consensus()
+        self.consensus.app_log = mock.MagicMock()
+        self.consensus.mongo = config.mongo
+
+    async def asyncTearDown(self):
+        Consensus.mongo_transactions = None
+
+    async def test_write_blocks(self):
+        await self.consensus.write_blocks(
+            [get_block(5, ["a", "b"]), get_block(6, ["c"])]
+        )
+        self.assertFalse(Consensus.mongo_transactions)
+
+        writes = self.config.mongo.async_db.blocks.bulk_write.call_args.args[0]
+        self.assertEqual(len(writes), 3)
+        self.assertEqual(writes[0]._filter, {"index": {"$gte": 5}})
+        self.assertEqual([x._filter for x in writes[1:]], [{"index": 5}, {"index": 6}])
+        self.config.mongo.async_db.miner_transactions.delete_many.assert_called_once_with(
+            {"id": {"$in": ["a", "b", "c"]}}
+        )
+
+        await self.consensus.write_blocks([get_block(7, [])])
+        self.config.mongo.async_client.start_session.assert_called_once()
+
+    async def test_insert_blocks_notifies_after_followers(self):
+        calls = mock.MagicMock()
+        self.consensus.config = self.config
+        self.consensus.write_blocks = mock.AsyncMock()
+        self.config.LatestBlock = mock.MagicMock()
+        self.config.LatestBlock.update_latest_block = mock.AsyncMock()
+        calls.utxo.apply_block = mock.AsyncMock()
+        self.config.utxo = calls.utxo
+        self.config.pool_stats = calls.pool_stats
+        self.config.workers = calls.workers
+        self.config.mp = None
+        blocks = [get_block(5, []), get_block(6, [])]
+        self.assertTrue(await self.consensus.insert_blocks(blocks, None))
+        self.assertEqual(
+            [x[0] for x in calls.mock_calls],
+            [
+                "utxo.apply_block",
+                "pool_stats.add_block",
+                "utxo.apply_block",
+                "pool_stats.add_block",
+                "workers.notify",
+            ],
+        )
+
+
+def get_spending_block(index, input_id):
+    transaction = MockTransaction("public_key", [input_id])
+    transaction.verify = mock.AsyncMock()
+    transaction.find_in_extra_blocks = mock.AsyncMock(return_value=None)
+    block = MockBlock(index, "00" * 32, "00" * 32, [transaction])
+    block.time = int(time()) - 1000
+    block.target = CHAIN.MAX_TARGET
+    block.special_min = False
+    block.verify = mock.AsyncMock()
+    return block
+
+
+class TestIntegrateBlocks(AsyncTestCase):
+    async def asyncSetUp(self):
+        config = Config.generate()
+        config.network = "mainnet"
+        config.mongo = mock.MagicMock()
+        config.BU = mock.MagicMock()
+        config.BU.get_transaction_by_id = mock.AsyncMock(return_value=True)
+        config.BU.is_input_spent = mock.AsyncMock(return_value=False)
+        config.app_log = mock.MagicMock()
+        self.config = config
+        self.consensus = Consensus()
+        self.consensus.config = config
+        self.consensus.app_log = mock.MagicMock()
+        self.consensus.insert_blocks = mock.AsyncMock()
+
+    async def test_double_spend_within_run(self):
+        index = CHAIN.CHECK_DOUBLE_SPEND_FROM + 100000
+        last_block = get_spending_block(index - 1, "other")
+        blocks = [
+            get_spending_block(index, "input"),
+            get_spending_block(index + 1, "input"),
+        ]
+        # test_block reads the whole previous block, test_block_linkage its hash
+        self.config.mongo.async_db.blocks.find_one = mock.AsyncMock(
+            side_effect=lambda *args: last_block
+            if len(args) == 1
+            else {"hash": "00" * 32}
+        )
+        with mock.patch.object(
+            Block, "from_dict", mock.AsyncMock(side_effect=lambda x: x)
+        ), mock.patch.object(
+            CHAIN, "get_target_10min", mock.AsyncMock(return_value=CHAIN.MAX_TARGET)
+        ), mock.patch.object(
+            Blockchain, "test_inbound_blockchain", mock.AsyncMock(return_value=True)
+        ):
+            await self.consensus.integrate_blocks_with_existing_chain(
+                Blockchain(blocks), None
+            )
+        self.consensus.insert_blocks.assert_awaited_once_with(blocks[:1], None)
+
+    async def test_second_pass_checks_linkage_only(self):
+        index = CHAIN.CHECK_DOUBLE_SPEND_FROM + 100000
+        blocks = [get_spending_block(index, "a"), get_spending_block(index + 1, "b")]
+        self.config.mongo.async_db.blocks.find_one = mock.AsyncMock(
+            return_value={"hash": "00" * 32}
+        )
+        with mock.patch.object(
+            Block, "from_dict", mock.AsyncMock(side_effect=lambda x: x)
+        ), mock.patch.object(
+            Blockchain, "test_block", mock.AsyncMock(return_value=True)
+        ) as test_block, mock.patch.object(
+            Blockchain, "test_inbound_blockchain", mock.AsyncMock(return_value=True)
+        ):
+            await self.consensus.integrate_blocks_with_existing_chain(
+                Blockchain(blocks), None
+            )
+        self.assertEqual(test_block.await_count, len(blocks))
+        self.consensus.insert_blocks.assert_awaited_once_with(blocks, None)
+
+
 if __name__ == "__main__":
     unittest.main(argv=["first-arg-is-ignored"], exit=False)
@@ -0,0 +1,28 @@
+from bitcoin.wallet import P2PKHBitcoinAddress
+
+from yadacoin.core.config import Config
+from yadacoin.core.crypt import RIPEMD160, hash160, public_key_to_address
+
+from ..test_setup import AsyncTestCase
+
+
+class TestCrypt(AsyncTestCase):
+    async def asyncSetUp(self):
+        self.config = Config.generate()
+
+    async def test_hash160(self):
+        for data in [b"", b"abc", bytes.fromhex(self.config.public_key), b"a" * 200]:
+            self.assertEqual(hash160(data), RIPEMD160.ripemd160(data))
+        self.assertEqual(
+            RIPEMD160.ripemd160(b""),
+            bytes.fromhex("b472a266d0bd89c13706a4132ccfb16f7c3b9fcb"),
+        )
+
+    async def test_public_key_to_address(self):
+        address = public_key_to_address(self.config.public_key)
+        self.assertEqual(address, self.config.address)
+        self.assertEqual(
+            address,
+            str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(self.config.public_key))),
+        )
+        self.assertIs(public_key_to_address(self.config.public_key), address)
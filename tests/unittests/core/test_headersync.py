@@ -0,0 +1,86 @@
+from unittest import mock
+
+from yadacoin.core.config import Config
+from yadacoin.core.headersync import HeaderSync
+
+from ..mocks import MockStream
+from ..test_setup import AsyncTestCase
+
+
+def get_header(index):
+    return {
+        "index": index,
+        "hash": "%064x" % (index + 1),
+        "prevHash": "%064x" % index,
+        "time": 1,
+        "target": "f" * 64,
+        "special_min": False,
+        "special_target": "f" * 64,
+        "nonce": "0",
+        "merkleRoot": "",
+    }
+
+
+class TestHeaderSync(AsyncTestCase):
+    async def asyncSetUp(self):
+        self.config = Config.generate()
+        self.config.headers_first_sync = True
+        self.config.LatestBlock = mock.MagicMock()
+        self.config.LatestBlock.block = mock.MagicMock(index=9, hash="%064x" % 10)
+        self.streams = [MockStream("a"), MockStream("b")]
+
+        async def get_sync_peers():
+            for stream in self.streams:
+                yield stream
+
+        self.config.peer = mock.MagicMock()
+        self.config.peer.get_sync_peers = get_sync_peers
+        self.config.nodeShared = mock.MagicMock()
+        self.config.nodeShared.write_params = mock.AsyncMock()
+        self.config.processing_queues = mock.MagicMock()
+        self.header_sync = HeaderSync()
+
+    async def test_has_valid_work(self):
+        header = get_header(10)
+        self.assertTrue(HeaderSync.has_valid_work(header))
+        header["target"] = "0" * 64
+        self.assertFalse(HeaderSync.has_valid_work(header))
+
+    async def test_sync(self):
+        self.assertTrue(await self.header_sync.sync())
+        stream, method, params = self.config.nodeShared.write_params.call_args.args
+        self.assertEqual(method, "getheaders")
+        self.assertEqual(params["start_index"], 10)
+
+        await self.header_sync.on_headers(
+            stream, [get_header(x) for x in range(10, 250)]
+        )
+        self.assertEqual(self.header_sync.header_tip[0], 249)
+        self.assertEqual(sorted(self.header_sync.in_flight), [0, 100, 200])
+
+        # bodies arriving out of order are buffered until the tip can be extended
+        for start_index in [200, 100]:
+            peer_id = self.header_sync.in_flight[start_index][0]
+            await self.header_sync.on_blocks(
+                self.streams[["a", "b"].index(peer_id)],
+                start_index,
+                [get_header(x) for x in range(start_index, start_index + 100)],
+            )
+        self.config.processing_queues.block_queue.add.assert_not_called()
+        peer_id = self.header_sync.in_flight[0][0]
+        await self.header_sync.on_blocks(
+            self.streams[["a", "b"].index(peer_id)],
+            0,
+            [get_header(x) for x in range(0, 100)],
+        )
+        self.config.processing_queues.block_queue.add.assert_called_once()
+        self.assertEqual(self.header_sync.queued[0], 209)
+
+    async def test_headers_not_connecting(self):
+        await self.header_sync.sync()
+        stream = self.streams[0]
+        header = get_header(10)
+        header["prevHash"] = "f" * 64
+        await self.header_sync.on_headers(stream, [header])
+        self.assertIsNone(self.header_sync.header_tip)
+        self.assertIn("a", self.header_sync.unsupported)
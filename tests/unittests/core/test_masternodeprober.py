@@ -0,0 +1,44 @@
+from unittest import mock
+
+from yadacoin.core.config import Config
+from yadacoin.core.masternodeprober import MasternodeProber
+
+from ..test_setup import AsyncTestCase
+
+
+class MockNode:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+
+class TestMasternodeProber(AsyncTestCase):
+    async def asyncSetUp(self):
+        Config.generate()
+        self.prober = MasternodeProber()
+        self.nodes = [MockNode("up", 8000), MockNode("down", 8000)]
+
+    async def connect(self, host, port, timeout=None):
+        if host == "down":
+            raise TimeoutError()
+        return mock.MagicMock()
+
+    async def test_get_reachable_nodes(self):
+        with mock.patch(
+            "yadacoin.core.masternodeprober.TCPClient.connect", side_effect=self.connect
+        ) as connect:
+            self.assertEqual(
+                await self.prober.get_reachable_nodes(self.nodes), [self.nodes[0]]
+            )
+            self.assertEqual(connect.call_count, 2)
+
+            # known nodes are answered from their records
+            self.assertEqual(
+                await self.prober.get_reachable_nodes(self.nodes), [self.nodes[0]]
+            )
+            self.assertEqual(connect.call_count, 2)
+
+        record = self.prober.records[("down", 8000)]
+        self.assertFalse(record["reachable"])
+        self.assertEqual(record["failures"], 1)
+        self.assertIsNotNone(self.prober.records[("up", 8000)]["last_success"])
@@ -0,0 +1,41 @@
+import hashlib
+import os
+from unittest import TestCase
+
+from yadacoin.core.merkle import MerkleTree, fill_header, get_merkle_root
+
+
+def get_hex_merkle_root(txn_hashes):
+    hashes = []
+    for i in range(0, len(txn_hashes), 2):
+        txn1 = txn_hashes[i]
+        txn2 = txn_hashes[i + 1] if i + 1 < len(txn_hashes) else ""
+        hashes.append(hashlib.sha256((txn1 + txn2).encode("utf-8")).digest().hex())
+    if len(hashes) > 1:
+        return get_hex_merkle_root(hashes)
+    return hashes[0]
+
+
+class TestMerkle(TestCase):
+    def test_get_merkle_root(self):
+        for count in [1, 2, 3, 7, 16, 33]:
+            txn_hashes = sorted(os.urandom(32).hex() for _ in range(count))
+            self.assertEqual(
+                get_merkle_root(txn_hashes), get_hex_merkle_root(txn_hashes)
+            )
+
+    def test_merkle_tree_update(self):
+        tree = MerkleTree()
+        txn_hashes = sorted(os.urandom(32).hex() for _ in range(20))
+        self.assertEqual(tree.update(txn_hashes), get_hex_merkle_root(txn_hashes))
+        for txn_hashes in [
+            txn_hashes[:-1],
+            sorted(txn_hashes[1:] + [os.urandom(32).hex()]),
+            txn_hashes[:1],
+            txn_hashes,
+        ]:
+            self.assertEqual(tree.update(txn_hashes), get_hex_merkle_root(txn_hashes))
+
+    def test_fill_header(self):
+        self.assertEqual(fill_header("ab{nonce}cd", b"\x01\x02"), b"ab\x01\x02cd")
+        self.assertEqual(fill_header("abcd", b"\x01"), b"abcd")
@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from yadacoin.core.config import Config
+from yadacoin.core.miningpool import MiningPool
+
+from ..mocks import MockCursor
+from ..test_setup import AsyncTestCase
+
+
+class TestMiningPool(AsyncTestCase):
+    async def asyncSetUp(self):
+        Config.generate()
+        self.pool = MiningPool()
+        self.pool.app_log = mock.MagicMock()
+        self.pool.block_factory = SimpleNamespace(header="header1", index=5)
+
+        async def generate_hash(index, header, nonce):
+            return header + nonce
+
+        self.pool.block_factory.async_generate_hash_from_header = generate_hash
+        self.processed = []
+
+        async def process_nonce(
+            miner, nonce, job, hash1=None, header=None, shares=None
+        ):
+            self.processed.append((nonce, hash1, header))
+            if nonce == "b":
+                # the share found a block and the template moved on
+                self.pool.block_factory.header = "header2"
+                self.pool.block_factory.index = 6
+            return {"hash": hash1}
+
+        self.pool.process_nonce = process_nonce
+
+    async def test_rehash_after_accepted_block(self):
+        job = SimpleNamespace(index=5, extra_nonce="")
+        valid = [(SimpleNamespace(miner=None), {}, x, job) for x in "abc"]
+        shares = []
+        while valid:
+            valid = await self.pool.process_nonce_hashes(valid, shares)
+        self.assertEqual(
+            self.processed,
+            [
+                ("a", "header1a", "header1"),
+                ("b", "header1b", "header1"),
+                ("c", "header2c", "header2"),
+            ],
+        )
+
+    async def test_refresh_recomputes_target_of_reused_template(self):
+        config = Config()
+        config.LatestBlock = mock.MagicMock()
+        config.LatestBlock.block_checker = mock.AsyncMock()
+        config.LatestBlock.block = SimpleNamespace(hash="tip", index=4)
+        self.pool.config = config
+        self.pool.refreshing = False
+        self.pool.template_key = ("tip", ())
+        self.pool.get_pending_transactions = mock.AsyncMock(return_value=[])
+        block_factory = mock.MagicMock(time=1)
+        block_factory.set_target = mock.AsyncMock()
+        self.pool.block_factory = block_factory
+        with mock.patch(
+            "yadacoin.core.miningpool.Peer.is_synced",
+            mock.AsyncMock(return_value=True),
+        ):
+            await self.pool.refresh()
+        self.assertIs(self.pool.block_factory, block_factory)
+        block_factory.set_target.assert_awaited_once()
+
+    async def test_rejected_transaction_is_retried(self):
+        config = Config()
+        config.LatestBlock = mock.MagicMock()
+        config.LatestBlock.block = SimpleNamespace(hash="tip", prev_hash="prev")
+        config.mongo = mock.MagicMock()
+        config.mongo.async_db.miner_transactions.find = mock.MagicMock(
+            side_effect=lambda *args: MockCursor([{"id": "txn1"}])
+        )
+        self.pool.config = config
+        self.pool.mongo = config.mongo
+        self.pool.candidates = {}
+        self.pool.candidates_tip = "tip"
+        self.pool.candidates_checks = (False, False)
+        self.pool.rejected = {}
+        self.pool.verify_pending_transaction = mock.AsyncMock(return_value=None)
+        with mock.patch("yadacoin.core.miningpool.time", return_value=1000):
+            await self.pool.update_candidates(False, False)
+            await self.pool.update_candidates(False, False)
+        self.assertEqual(self.pool.verify_pending_transaction.await_count, 1)
+        retry_time = 1000 + MiningPool.rejected_ttl + 1
+        with mock.patch("yadacoin.core.miningpool.time", return_value=retry_time):
+            await self.pool.update_candidates(False, False)
+        self.assertEqual(self.pool.verify_pending_transaction.await_count, 2)
@@ -0,0 +1,76 @@
+from unittest import mock
+
+from coincurve import PrivateKey
+
+from yadacoin.core.chain import CHAIN
+from yadacoin.core.config import Config
+from yadacoin.core.crypt import public_key_to_address
+from yadacoin.core.miningpoolpayout import PoolPayer
+from yadacoin.core.shareledger import ShareLedger
+
+from ..mocks import MockCursor
+from ..test_setup import AsyncTestCase
+
+
+class TestPoolPayer(AsyncTestCase):
+    async def asyncSetUp(self):
+        self.config = Config.generate()
+        self.config.mongo = mock.MagicMock()
+        self.other_address = public_key_to_address(
+            PrivateKey().public_key.format().hex()
+        )
+        self.config.share_ledger = ShareLedger()
+        self.pool_payer = PoolPayer()
+
+    async def test_get_share_list_for_height(self):
+        db = self.config.mongo.async_db
+        db.share_rollups.find = mock.MagicMock(
+            return_value=MockCursor(
+                [
+                    {"index": 10, "address": self.config.address, "difficulty": 2.0},
+                    {
+                        "index": 10,
+                        "address": self.config.address + ".worker",
+                        "difficulty": 4.0,
+                    },
+                    {"index": 10, "address": self.other_address, "difficulty": 6.0},
+                ]
+            )
+        )
+        # height 11 has no rollups and is summed from the raw shares
+        db.shares.aggregate = mock.MagicMock(
+            return_value=MockCursor(
+                [
+                    {
+                        "_id": {"index": 11, "address": self.other_address},
+                        "hashes": ["%064x" % (CHAIN.MAX_TARGET - 1)],
+                    },
+                ]
+            )
+        )
+        share_difficulties = await self.pool_payer.get_share_difficulties_for_heights(
+            [10, 11]
+        )
+        db.shares.aggregate.assert_called_once()
+        self.assertEqual(
+            db.shares.aggregate.call_args.args[0][0]["$match"]["index"], {"$in": [11]}
+        )
+
+        shares = await self.pool_payer.get_share_list_for_height(
+            10, share_difficulties[10]
+        )
+        self.assertEqual(shares[self.config.address]["payout_share"], 0.5)
+        self.assertEqual(shares[self.other_address]["payout_share"], 0.5)
+        shares = await self.pool_payer.get_share_list_for_height(
+            11, share_difficulties[11]
+        )
+        self.assertEqual(shares, {self.other_address: {"payout_share": 1.0}})
+        self.assertFalse(await self.pool_payer.get_share_list_for_height(12, {}))
+
+    async def test_get_difficulty(self):
+        self.assertEqual(
+            self.pool_payer.get_difficulty(
+                ["%064x" % (CHAIN.MAX_TARGET - x) for x in [1, 2]]
+            ),
+            3,
+        )
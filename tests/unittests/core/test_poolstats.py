@@ -0,0 +1,95 @@
+from unittest import mock
+
+from yadacoin.core.blockchainutils import BlockChainUtils
+from yadacoin.core.chain import CHAIN
+from yadacoin.core.config import Config
+from yadacoin.core.poolstats import PoolStats, TimeSeries
+
+from ..mocks import MockCursor
+from ..test_setup import AsyncTestCase
+
+
+def get_block(index, time, target=CHAIN.MAX_TARGET // 1000):
+    return {"index": index, "time": time, "target": "%064x" % target}
+
+
+class TestPoolStats(AsyncTestCase):
+    async def asyncSetUp(self):
+        config = Config.generate()
+        config.mongo = mock.MagicMock()
+        config.BU = BlockChainUtils()
+        config.pool_diff = 100
+        self.config = config
+        self.pool_stats = PoolStats()
+
+    async def test_time_series(self):
+        series = TimeSeries(60, 2)
+        series.add(0, 1)
+        series.add(59, 3)
+        series.add(60, 2)
+        series.add(30, 1)
+        self.assertEqual(
+            series.to_list(mean=True),
+            [{"time": 0, "value": 5 / 3}, {"time": 60, "value": 2}],
+        )
+        series.add(120, 1)
+        self.assertEqual([x["time"] for x in series.to_list()], [60, 120])
+        # older than the buffer
+        series.add(0, 1)
+        self.assertEqual(series.total_since(60), 3)
+
+    async def test_add_share(self):
+        with mock.patch("yadacoin.core.poolstats.time", return_value=600):
+            for time in range(0, 600, 10):
+                self.pool_stats.add_share(
+                    {"address": "a.worker", "address_only": "a", "time": time}
+                )
+            self.assertEqual(self.pool_stats.get_pool_hash_rate(600), 10)
+        self.assertEqual(self.pool_stats.get_miner_hash_rate("a", 600), 10)
+        self.assertIsNone(self.pool_stats.get_miner_hash_rate("b"))
+        self.assertEqual(
+            self.pool_stats.get_series("miner_hashrate", "1h", "a.worker"),
+            [{"time": 0, "value": 60 / 3600 * 100}],
+        )
+        with self.assertRaises(KeyError):
+            self.pool_stats.get_series("shares", "1h")
+
+    async def test_add_block(self):
+        self.pool_stats.add_block(get_block(1, 0))
+        self.pool_stats.add_block(get_block(2, 600))
+        self.pool_stats.add_block(get_block(3, 1000))
+        # reorg replaces the tip
+        self.pool_stats.add_block(get_block(3, 1200))
+        self.assertEqual([x.index for x in self.pool_stats.blocks], [1, 2, 3])
+        self.assertEqual(
+            self.pool_stats.get_series("block_time", "1h"),
+            [{"time": 0, "value": 600}],
+        )
+        self.assertEqual(
+            self.pool_stats.get_series("network_difficulty", "1d")[0]["value"],
+            CHAIN.MAX_TARGET / (CHAIN.MAX_TARGET // 1000),
+        )
+        self.assertEqual(len(self.pool_stats.get_blocks_since(600)), 2)
+        self.assertEqual(
+            self.pool_stats.get_network_hash_rate(),
+            self.config.BU.get_hash_rate(list(reversed(self.pool_stats.blocks))),
+        )
+
+    async def test_load_shares(self):
+        shares = [
+            {"address": "a.worker{}".format(time % 20), "time": time}
+            for time in range(0, 600, 10)
+        ]
+        self.config.mongo.async_db.shares.find = mock.MagicMock(
+            return_value=MockCursor(shares)
+        )
+        await self.pool_stats.load_shares(600)
+        query = self.config.mongo.async_db.shares.find.call_args.args[0]
+        self.assertEqual(query, {"time": {"$gte": 600 - PoolStats.share_load_seconds}})
+        with mock.patch("yadacoin.core.poolstats.time", return_value=600):
+            self.assertEqual(self.pool_stats.get_pool_hash_rate(600), 10)
+        self.assertEqual(self.pool_stats.get_miner_hash_rate("a", 600), 10)
+        self.assertEqual(
+            self.pool_stats.get_series("workers", "1m"),
+            [{"time": x, "value": 2} for x in range(0, 600, 60)],
+        )
@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from yadacoin.core.config import Config
+from yadacoin.core.processingqueue import (
+    BlockProcessingQueue,
+    TransactionProcessingQueue,
+    TransactionProcessingQueueItem,
+)
+
+from ..test_setup import AsyncTestCase
+
+
+def get_stream(rid):
+    return SimpleNamespace(peer=SimpleNamespace(id_attribute="rid", rid=rid))
+
+
+def get_block_item(hash, method=None, stream=None):
+    return SimpleNamespace(
+        blockchain=SimpleNamespace(
+            first_block={"hash": hash}, final_block={"hash": hash}
+        ),
+        body={"method": method} if method else {},
+        stream=stream,
+    )
+
+
+def get_transaction_item(signature, fee, stream=None):
+    return TransactionProcessingQueueItem(
+        SimpleNamespace(transaction_signature=signature, fee=fee), stream
+    )
+
+
+class TestProcessingQueue(AsyncTestCase):
+    async def asyncSetUp(self):
+        Config.generate()
+
+    async def test_block_priority(self):
+        queue = BlockProcessingQueue()
+        queue.add(get_block_item("a", "blocksresponse"))
+        queue.add(get_block_item("b", "blockresponse"))
+        queue.add(get_block_item("c", "newblock"))
+        queue.add(get_block_item("d", "newblock"))
+        self.assertEqual(
+            [queue.pop().blockchain.first_block["hash"] for x in range(4)],
+            ["c", "d", "b", "a"],
+        )
+        self.assertIsNone(queue.pop())
+
+    async def test_transaction_fee_order(self):
+        queue = TransactionProcessingQueue()
+        queue.add(get_transaction_item("a", 0))
+        queue.add(get_transaction_item("b", 1.5))
+        queue.add(get_transaction_item("c", 0.1))
+        self.assertEqual(
+            [queue.pop().transaction.transaction_signature for x in range(3)],
+            ["b", "c", "a"],
+        )
+
+    async def test_dedup(self):
+        queue = TransactionProcessingQueue()
+        self.assertTrue(queue.add(get_transaction_item("a", 0)))
+        self.assertIsNone(queue.add(get_transaction_item("a", 0)))
+        queue.pop()
+        self.assertIsNone(queue.add(get_transaction_item("a", 0)))
+        with mock.patch(
+            "yadacoin.core.processingqueue.time",
+            return_value=queue.seen["a"] + 1,
+        ):
+            self.assertTrue(queue.add(get_transaction_item("a", 0)))
+            queue.pop()
+        self.assertEqual(list(queue.seen), ["a"])
+        self.assertEqual(queue.num_items_seen, 2)
+        self.assertEqual(queue.num_items_dropped, 0)
+
+    async def test_requeue_skips_seen(self):
+        queue = BlockProcessingQueue()
+        queue.add(get_block_item("a"))
+        queue.pop()
+        self.assertIsNone(queue.add(get_block_item("a")))
+        self.assertTrue(queue.add(get_block_item("a"), requeue=True))
+        self.assertIsNone(queue.add(get_block_item("a"), requeue=True))
+        self.assertEqual(queue.num_items_seen, 2)
+
+    async def test_bounds(self):
+        queue = TransactionProcessingQueue()
+        queue.max_size = 3
+        queue.max_per_source = 2
+        stream = get_stream("rid1")
+        self.assertTrue(queue.add(get_transaction_item("a", 0, stream)))
+        self.assertTrue(queue.add(get_transaction_item("b", 0, stream)))
+        self.assertFalse(queue.add(get_transaction_item("c", 0, stream)))
+        self.assertTrue(queue.add(get_transaction_item("d", 0, get_stream("rid2"))))
+        self.assertTrue(queue.is_full())
+        self.assertFalse(queue.add(get_transaction_item("e", 0)))
+        self.assertEqual(queue.num_items_dropped, 2)
+        queue.pop()
+        self.assertFalse(queue.is_full())
+        await queue.wait_for_space()
+        self.assertEqual(queue.sources, {"rid1": 1, "rid2": 1})
+        queue.clear()
+        self.assertFalse(queue.queue)
@@ -0,0 +1,86 @@
+from unittest import mock
+
+from bitcoin.wallet import P2PKHBitcoinAddress
+from coincurve import PrivateKey
+
+from yadacoin.core.config import Config
+from yadacoin.core.publickeyindex import PublicKeyIndex
+
+from ..mocks import MockBlock, MockTransaction
+from ..test_setup import AsyncTestCase
+
+PUBLIC_KEY = PrivateKey().public_key.format().hex()
+ADDRESS = str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(PUBLIC_KEY)))
+
+
+class TestPublicKeyIndex(AsyncTestCase):
+    async def asyncSetUp(self):
+        config = Config.generate()
+        config.mongo = mock.MagicMock()
+        config.mongo.async_db.reversed_public_keys.bulk_write = mock.AsyncMock()
+        config.mongo.async_db.reversed_public_keys.find_one = mock.AsyncMock(
+            return_value=None
+        )
+        config.mongo.async_db.reversed_public_keys_state.replace_one = mock.AsyncMock()
+        config.mongo.async_db.blocks.find_one = mock.AsyncMock(
+            return_value={"hash": "hash1"}
+        )
+        config.LatestBlock = mock.MagicMock()
+        config.LatestBlock.block = MockBlock(2, "hash2")
+        self.config = config
+        self.public_key_index = PublicKeyIndex(max_size=2)
+
+    async def test_apply_block(self):
+        self.public_key_index.ready = True
+        for index in (0, 1):
+            block = MockBlock(
+                index,
+                "hash{}".format(index),
+                "hash{}".format(index - 1),
+                [MockTransaction(PUBLIC_KEY), MockTransaction(PUBLIC_KEY)],
+            )
+            await self.public_key_index.apply_block(block)
+        self.assertEqual(self.public_key_index.height, 1)
+        bulk_write = self.config.mongo.async_db.reversed_public_keys.bulk_write
+        bulk_write.assert_called_once()
+        self.assertEqual(len(bulk_write.call_args.args[0]), 1)
+        self.assertEqual(
+            await self.public_key_index.get_public_key(ADDRESS), PUBLIC_KEY
+        )
+        self.config.mongo.async_db.reversed_public_keys.find_one.assert_not_called()
+
+    async def test_get_public_key(self):
+        find_one = self.config.mongo.async_db.reversed_public_keys.find_one
+        self.assertIsNone(await self.public_key_index.get_public_key("a"))
+        find_one.return_value = {"address": "b", "public_key": "pk_b"}
+        self.assertEqual(await self.public_key_index.get_public_key("b"), "pk_b")
+        self.assertEqual(await self.public_key_index.get_public_key("b"), "pk_b")
+        self.assertEqual(find_one.call_count, 2)
+        self.assertEqual(self.public_key_index.hits, 1)
+
+        self.public_key_index.set_public_key("c", "pk_c")
+        self.public_key_index.set_public_key("d", "pk_d")
+        self.assertNotIn("b", self.public_key_index.public_keys)
+
+    async def test_miss_is_cached_while_current(self):
+        find_one = self.config.mongo.async_db.reversed_public_keys.find_one
+        self.assertIsNone(await self.public_key_index.get_public_key("a"))
+        self.public_key_index.ready = True
+        self.public_key_index.set_tip(2, "hash2")
+        self.assertIsNone(await self.public_key_index.get_public_key("a"))
+        self.assertIsNone(await self.public_key_index.get_public_key("a"))
+        self.assertEqual(find_one.call_count, 2)
+        await self.public_key_index._apply([(3, "hash3", [])])
+        self.assertIsNone(await self.public_key_index.get_public_key("a"))
+        self.assertEqual(find_one.call_count, 3)
+
+    async def test_rollback_keeps_pairs(self):
+        await self.public_key_index._apply([(0, "hash0", [PUBLIC_KEY])])
+        await self.public_key_index._apply([(1, "hash1", [])])
+        self.config.mongo.async_db.blocks.find_one.return_value = {"hash": "hash0"}
+        await self.public_key_index._rollback(1)
+        self.assertEqual(self.public_key_index.height, 0)
+        self.assertEqual(self.public_key_index.block_hash, "hash0")
+        self.assertEqual(
+            await self.public_key_index.get_public_key(ADDRESS), PUBLIC_KEY
+        )
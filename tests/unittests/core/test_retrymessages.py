@@ -0,0 +1,43 @@
+from unittest import mock
+
+from yadacoin.core.retrymessages import RetryMessages
+
+from ..test_setup import AsyncTestCase
+
+
+class TestRetryMessages(AsyncTestCase):
+    async def asyncSetUp(self):
+        self.retry_messages = RetryMessages()
+
+    async def test_pop_due(self):
+        with mock.patch("yadacoin.core.retrymessages.time", return_value=0):
+            self.retry_messages[("rid1", "newtxn", "a")] = {"transaction": {}}
+            self.retry_messages[("rid2", "newblock", "b")] = {"block": {}}
+        self.assertEqual(self.retry_messages.pop_due(now=5), [])
+        self.assertEqual(len(self.retry_messages.pop_due(now=10)), 2)
+        # acknowledged messages are not retried
+        del self.retry_messages[("rid2", "newblock", "b")]
+        self.retry_messages[("rid1", "newtxn", "a")]["retry_attempts"] = 1
+        self.assertEqual(self.retry_messages.pop_due(now=29), [])
+        self.assertEqual(self.retry_messages.pop_due(now=30), [("rid1", "newtxn", "a")])
+        self.retry_messages[("rid1", "newtxn", "a")]["retry_attempts"] = 2
+        self.assertEqual(self.retry_messages.pop_due(now=69), [])
+        self.assertEqual(len(self.retry_messages.pop_due(now=70)), 1)
+
+    async def test_get_delay(self):
+        self.assertEqual(self.retry_messages.get_delay(0), 10)
+        self.assertEqual(self.retry_messages.get_delay(2), 40)
+        self.assertEqual(self.retry_messages.get_delay(10), 120)
+
+    async def test_remove_peer(self):
+        self.retry_messages[("rid1", "newtxn", "a")] = {}
+        self.retry_messages[("rid1", "newtxn", "b")] = {}
+        self.retry_messages[("rid2", "newtxn", "a")] = {}
+        self.retry_messages.remove_peer("rid1")
+        self.assertEqual(list(self.retry_messages), [("rid2", "newtxn", "a")])
+        self.assertNotIn("rid1", self.retry_messages.by_peer)
+        self.assertEqual(
+            self.retry_messages.pop_due(now=10**10), [("rid2", "newtxn", "a")]
+        )
+        self.retry_messages.pop(("rid2", "newtxn", "a"))
+        self.assertFalse(self.retry_messages.by_peer)
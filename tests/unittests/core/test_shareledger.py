@@ -0,0 +1,73 @@
+from unittest import mock
+
+from yadacoin.core.chain import CHAIN
+from yadacoin.core.config import Config
+from yadacoin.core.shareledger import ShareLedger
+
+from ..test_setup import AsyncTestCase
+
+
+def get_share(hash, index=10, address="address.worker", time=1):
+    return {
+        "address": address,
+        "address_only": address.split(".")[0],
+        "index": index,
+        "hash": "%064x" % (CHAIN.MAX_TARGET - hash),
+        "nonce": "00",
+        "weight": 5,
+        "time": time,
+    }
+
+
+class TestShareLedger(AsyncTestCase):
+    async def asyncSetUp(self):
+        config = Config.generate()
+        config.mongo = mock.MagicMock()
+        config.mongo.async_db.shares.bulk_write = mock.AsyncMock()
+        config.mongo.async_db.share_rollups.bulk_write = mock.AsyncMock()
+        self.config = config
+        self.share_ledger = ShareLedger()
+
+    async def test_add_shares(self):
+        shares = [
+            get_share(1, time=3),
+            get_share(2, time=1),
+            get_share(3),
+            get_share(4, index=11),
+        ]
+        # the third share was already in the shares collection
+        self.config.mongo.async_db.shares.bulk_write.return_value = mock.MagicMock(
+            upserted_ids={0: "a", 1: "b", 3: "c"}
+        )
+        await self.share_ledger.add_shares(shares)
+        self.assertEqual(len(self.share_ledger.pending), 2)
+        rollup = self.share_ledger.pending[(10, "address.worker")]
+        self.assertEqual(rollup["shares"], 2)
+        self.assertEqual(rollup["weight"], 10)
+        self.assertEqual(rollup["difficulty"], 3)
+        self.assertEqual(rollup["first_time"], 1)
+        self.assertEqual(rollup["last_time"], 3)
+        raw = self.config.mongo.async_db.shares.bulk_write.call_args.args[0]
+        self.assertIn("created_at", raw[0]._doc["$set"])
+
+        await self.share_ledger.flush()
+        bulk_write = self.config.mongo.async_db.share_rollups.bulk_write
+        bulk_write.assert_called_once()
+        self.assertEqual(len(bulk_write.call_args.args[0]), 2)
+        self.assertEqual(
+            bulk_write.call_args.args[0][0]._doc["$inc"],
+            {"shares": 2, "weight": 10, "difficulty": 3.0},
+        )
+        self.assertFalse(self.share_ledger.pending)
+
+    async def test_flush_failure_keeps_pending(self):
+        self.config.mongo.async_db.shares.bulk_write.return_value = mock.MagicMock(
+            upserted_ids={0: "a"}
+        )
+        self.config.mongo.async_db.share_rollups.bulk_write.side_effect = Exception
+        await self.share_ledger.add_shares([get_share(1)])
+        await self.share_ledger.flush()
+        await self.share_ledger.add_shares([get_share(2)])
+        rollup = self.share_ledger.pending[(10, "address.worker")]
+        self.assertEqual(rollup["shares"], 2)
+        self.assertEqual(rollup["difficulty"], 3)
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from yadacoin.core.config import Config
+from yadacoin.core.transactionindex import TransactionIndex
+
+from ..mocks import MockBlock
+from ..test_setup import AsyncTestCase
+
+
+def get_transaction(id, input_ids=None):
+    return {
+        "id": id,
+        "hash": id + "hash",
+        "public_key": "pk1",
+        "time": 1,
+        "inputs": [{"id": x} for x in input_ids or []],
+        "outputs": [{"to": "address", "value": 1}],
+    }
+
+
+class TestTransactionIndex(AsyncTestCase):
+    async def asyncSetUp(self):
+        config = Config.generate()
+        config.mongo = mock.MagicMock()
+        self.documents = []
+
+        async def insert_many(documents, ordered=True):
+            self.documents.extend(documents)
+
+        async def delete_many(query):
+            self.documents = [
+                x
+                for x in self.documents
+                if x["block_index"] < query["block_index"]["$gte"]
+            ]
+
+        async def find_one(query, projection):
+            for x in self.documents:
+                if x["block_index"] == query["block_index"]:
+                    return x
+
+        db = config.mongo.async_db
+        db.transactions.insert_many = insert_many
+        db.transactions.delete_many = delete_many
+        db.transactions.find_one = find_one
+        db.transactions_state.replace_one = mock.AsyncMock()
+        self.transaction_index = TransactionIndex()
+        self.transaction_index.ready = True
+
+    async def test_get_block_documents(self):
+        documents = TransactionIndex.get_block_documents(
+            MockBlock(5, "hash5", "hash4", [get_transaction("a", ["b", "c"])])
+        )
+        self.assertEqual(len(documents), 1)
+        self.assertEqual(documents[0]["id"], "a")
+        self.assertEqual(documents[0]["block_index"], 5)
+        self.assertEqual(documents[0]["block_hash"], "hash5")
+        self.assertEqual(documents[0]["input_ids"], ["b", "c"])
+        self.assertEqual(documents[0]["output_to"], ["address"])
+        self.assertEqual(documents[0]["txn"]["hash"], "ahash")
+
+    async def test_rollback_on_reorg(self):
+        await self.transaction_index.apply_block(
+            MockBlock(0, "hash0", "", [get_transaction("a")])
+        )
+        await self.transaction_index.apply_block(
+            MockBlock(1, "hash1", "hash0", [get_transaction("b", ["a"])])
+        )
+        await self.transaction_index.apply_block(
+            MockBlock(1, "hash1b", "hash0", [get_transaction("c", ["a"])])
+        )
+        self.assertEqual(self.transaction_index.height, 1)
+        self.assertEqual(self.transaction_index.block_hash, "hash1b")
+        self.assertEqual([x["id"] for x in self.documents], ["a", "c"])
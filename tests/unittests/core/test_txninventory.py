@@ -0,0 +1,91 @@
+from unittest import mock
+
+from yadacoin.core.config import Config
+from yadacoin.core.processingqueue import TransactionProcessingQueue
+from yadacoin.core.txninventory import TransactionInventory
+from yadacoin.tcpsocket.codec import INVENTORY_PROTOCOL_VERSION
+
+from ..mocks import MockCursor, MockStream
+from ..test_setup import AsyncTestCase
+
+
+def get_stream(rid):
+    return MockStream(rid, INVENTORY_PROTOCOL_VERSION)
+
+
+class TestTransactionInventory(AsyncTestCase):
+    async def asyncSetUp(self):
+        config = Config.generate()
+        config.mongo = mock.MagicMock()
+        config.mongo.async_db.miner_transactions.find = mock.MagicMock(
+            return_value=MockCursor([{"id": "have"}])
+        )
+        config.nodeShared = mock.MagicMock()
+        config.nodeShared.write_params = mock.AsyncMock()
+        config.processing_queues = mock.MagicMock()
+        config.processing_queues.transaction_queue = TransactionProcessingQueue()
+        self.config = config
+        self.inventory = TransactionInventory()
+
+    async def test_supports(self):
+        self.assertTrue(self.inventory.supports(get_stream("a")))
+        self.assertFalse(self.inventory.supports(MockStream("a", protocol_version=4)))
+
+    async def test_announce_batches_and_suppresses(self):
+        stream = get_stream("a")
+        self.assertTrue(self.inventory.announce(stream, "txn1"))
+        self.assertTrue(self.inventory.announce(stream, "txn2"))
+        self.assertFalse(self.inventory.announce(stream, "txn1"))
+        await self.inventory.flush()
+        self.config.nodeShared.write_params.assert_awaited_once_with(
+            stream, "txninv", {"ids": ["txn1", "txn2"]}
+        )
+        await self.inventory.flush()
+        self.assertEqual(self.config.nodeShared.write_params.await_count, 1)
+        self.assertEqual(self.inventory.num_suppressed, 1)
+
+    async def test_announced_is_retried_until_known(self):
+        stream = get_stream("a")
+        self.inventory.announce(stream, "txn1")
+        await self.inventory.flush()
+        self.assertFalse(self.inventory.is_known("a", "txn1"))
+        # the next rebroadcast announces it again
+        self.assertTrue(self.inventory.announce(stream, "txn1"))
+        await self.inventory.flush()
+        self.assertEqual(self.config.nodeShared.write_params.await_count, 2)
+        self.inventory.add_requested(stream, ["txn1"])
+        self.assertFalse(self.inventory.announce(stream, "txn1"))
+
+    async def test_known_from_peer_is_not_announced(self):
+        stream = get_stream("a")
+        self.inventory.add_received(stream, "txn1")
+        self.assertFalse(self.inventory.announce(stream, "txn1"))
+        self.assertTrue(self.inventory.announce(get_stream("b"), "txn1"))
+
+    async def test_known_is_bounded(self):
+        self.inventory.max_known = 2
+        for txn_id in ("txn1", "txn2", "txn3"):
+            self.inventory.add_known("a", txn_id)
+        self.assertFalse(self.inventory.is_known("a", "txn1"))
+        self.assertTrue(self.inventory.is_known("a", "txn3"))
+
+    async def test_get_missing(self):
+        stream = get_stream("a")
+        missing = await self.inventory.get_missing(stream, ["have", "new", "new"])
+        self.assertEqual(missing, ["new"])
+        self.assertTrue(self.inventory.is_known("a", "have"))
+        # already requested from a peer
+        self.assertEqual(
+            await self.inventory.get_missing(get_stream("b"), ["new"]),
+            [],
+        )
+        self.inventory.expire_requests(self.inventory.requested["new"] + 60)
+        self.assertNotIn("new", self.inventory.requested)
+
+    async def test_remove_peer(self):
+        stream = get_stream("a")
+        self.inventory.announce(stream, "txn1")
+        self.inventory.remove_peer("a")
+        await self.inventory.flush()
+        self.config.nodeShared.write_params.assert_not_awaited()
+        self.assertFalse(self.inventory.is_known("a", "txn1"))
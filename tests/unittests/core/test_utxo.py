@@ -0,0 +1,49 @@
+from unittest import mock
+
+from yadacoin.core.config import Config
+from yadacoin.core.utxo import UTXOSet
+
+from ..mocks import MockBlock, MockTransaction
+from ..test_setup import AsyncTestCase
+
+
+class TestUTXOSet(AsyncTestCase):
+    async def asyncSetUp(self):
+        config = Config.generate()
+        config.mongo = mock.MagicMock()
+        config.mongo.async_db.utxo_spent.bulk_write = mock.AsyncMock()
+        config.mongo.async_db.utxo_spent.delete_many = mock.AsyncMock()
+        config.mongo.async_db.utxo_state.replace_one = mock.AsyncMock()
+        self.utxo = UTXOSet()
+        self.utxo.ready = True
+
+    async def test_apply_block(self):
+        await self.utxo.apply_block(
+            MockBlock(0, "hash0", "", [MockTransaction("pk1", ["a", "b"])])
+        )
+        self.assertEqual(self.utxo.height, 0)
+        self.assertEqual(self.utxo.get_spent_index("a", "pk1"), 0)
+        self.assertEqual(self.utxo.get_spent_index(["c", "b"], "pk1"), 0)
+        self.assertIsNone(self.utxo.get_spent_index("a", "pk2"))
+        self.assertIsNone(self.utxo.get_spent_index("c", "pk1"))
+
+    async def test_from_index(self):
+        await self.utxo.apply_block(MockBlock(0, "hash0", "", []))
+        await self.utxo.apply_block(
+            MockBlock(1, "hash1", "hash0", [MockTransaction("pk1", ["a"])])
+        )
+        self.assertEqual(self.utxo.get_spent_index("a", "pk1", from_index=2), 1)
+        self.assertIsNone(self.utxo.get_spent_index("a", "pk1", from_index=1))
+
+    async def test_rollback_on_reorg(self):
+        await self.utxo.apply_block(MockBlock(0, "hash0", "", []))
+        await self.utxo.apply_block(
+            MockBlock(1, "hash1", "hash0", [MockTransaction("pk1", ["a"])])
+        )
+        await self.utxo.apply_block(
+            MockBlock(1, "hash1b", "hash0", [MockTransaction("pk1", ["b"])])
+        )
+        self.assertEqual(self.utxo.height, 1)
+        self.assertEqual(self.utxo.block_hash, "hash1b")
+        self.assertIsNone(self.utxo.get_spent_index("a", "pk1"))
+        self.assertEqual(self.utxo.get_spent_index("b", "pk1"), 1)
@@ -0,0 +1,26 @@
+from unittest import IsolatedAsyncioTestCase
+
+from yadacoin.core.verificationcache import VerificationCache
+
+
+class TestVerificationCache(IsolatedAsyncioTestCase):
+    async def test_has_passed(self):
+        cache = VerificationCache()
+        key = ("signature", "hash", "public_key")
+        self.assertFalse(cache.has_passed(key, "signature"))
+        cache.mark_passed(key, "signature")
+        self.assertTrue(cache.has_passed(key, "signature"))
+        self.assertFalse(cache.has_passed(key, "relationship_size"))
+        self.assertFalse(
+            cache.has_passed(("signature", "other hash", "public_key"), "signature")
+        )
+
+    async def test_max_size(self):
+        cache = VerificationCache(max_size=2)
+        cache.mark_passed(("a",), "signature")
+        cache.mark_passed(("b",), "signature")
+        cache.has_passed(("a",), "signature")
+        cache.mark_passed(("c",), "signature")
+        self.assertTrue(cache.has_passed(("a",), "signature"))
+        self.assertFalse(cache.has_passed(("b",), "signature"))
+        self.assertTrue(cache.has_passed(("c",), "signature"))
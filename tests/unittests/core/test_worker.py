@@ -0,0 +1,49 @@
+import asyncio
+from types import SimpleNamespace
+
+from yadacoin.core.worker import Worker, Workers
+
+from ..test_setup import AsyncTestCase
+
+
+class TestWorker(AsyncTestCase):
+    async def asyncSetUp(self):
+        self.calls = 0
+
+    async def target(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+
+    async def test_wake(self):
+        worker = Worker("test", self.target, 60, events=("block",))
+        workers = Workers()
+        workers.add(worker)
+        workers.notify("block")
+        # wakes during a run coalesce into one more run
+        await asyncio.sleep(0.005)
+        workers.notify("block")
+        workers.notify("block")
+        workers.notify("transaction")
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(worker.wakes, 2)
+        self.assertEqual(workers.to_status_dict()["test"]["runs"], 2)
+
+    async def test_interval(self):
+        Workers().add(Worker("test", self.target, 0.02))
+        await asyncio.sleep(0.07)
+        self.assertGreaterEqual(self.calls, 2)
+
+    async def test_queue_backlog(self):
+        queue = SimpleNamespace(queue={"a": 1, "b": 2, "c": 3})
+
+        async def target():
+            queue.queue.popitem()
+
+        worker = Workers().add(Worker("test", target, 60, queue=queue))
+        self.assertIs(queue.worker, worker)
+        worker.wake()
+        await asyncio.sleep(0.01)
+        self.assertEqual(queue.queue, {})
+        self.assertEqual(worker.runs, 3)
+        self.assertEqual(worker.to_status_dict()["backlog"], 0)
@@ -0,0 +1,85 @@
+import asyncio
+from unittest import mock
+
+
+class MockCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        self.iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    async def to_list(self, length=None):
+        return list(self.docs)[:length]
+
+
+class MockInput:
+    def __init__(self, id):
+        self.id = id
+
+
+class MockOutput:
+    def __init__(self, to, value):
+        self.to = to
+        self.value = value
+
+
+class MockTransaction:
+    def __init__(
+        self, public_key=None, input_ids=(), outputs=(), transaction_signature=None
+    ):
+        self.public_key = public_key
+        self.inputs = [MockInput(x) for x in input_ids]
+        self.outputs = [MockOutput(*x) for x in outputs]
+        self.transaction_signature = transaction_signature
+
+
+class MockBlock:
+    def __init__(self, index=0, hash="", prev_hash="", transactions=()):
+        self.index = index
+        self.hash = hash
+        self.prev_hash = prev_hash
+        self.transactions = list(transactions)
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "hash": self.hash,
+            "prevHash": self.prev_hash,
+            "transactions": self.transactions,
+        }
+
+
+class MockStream:
+    def __init__(self, rid="rid", protocol_version=3, data=b""):
+        self.data = data
+        self.writes = []
+        self.message_queue = {}
+        self.synced = False
+        self.syncing = False
+        self.peer = mock.MagicMock(
+            rid=rid, id_attribute="rid", host=rid, protocol_version=protocol_version
+        )
+
+    async def read_bytes(self, num_bytes):
+        result, self.data = self.data[:num_bytes], self.data[num_bytes:]
+        return result
+
+    async def read_until(self, delimiter):
+        end = self.data.index(delimiter) + len(delimiter)
+        result, self.data = self.data[:end], self.data[end:]
+        return result
+
+    async def write(self, data):
+        self.writes.append(data)
+        await asyncio.sleep(0)
@@ -0,0 +1,61 @@
+import asyncio
+import json
+from unittest import IsolatedAsyncioTestCase, mock
+
+from tornado.iostream import StreamClosedError
+
+from yadacoin.core.config import Config
+from yadacoin.tcpsocket.base import BaseRPC, OutboundBuffer
+
+from ..mocks import MockStream
+
+
+class TestOutboundBuffer(IsolatedAsyncioTestCase):
+    async def test_coalesces_writes_while_pending(self):
+        stream = MockStream()
+        buffer = OutboundBuffer.get(stream)
+        self.assertIs(OutboundBuffer.get(stream), buffer)
+        await asyncio.gather(*[buffer.write(b"%d\n" % i) for i in range(5)])
+        self.assertEqual(stream.writes, [b"0\n", b"1\n2\n3\n4\n"])
+        self.assertEqual(buffer.writes, 2)
+        self.assertEqual(buffer.messages, 5)
+
+    async def test_error_reaches_every_writer(self):
+        stream = MockStream()
+        stream.write = mock.AsyncMock(side_effect=StreamClosedError())
+        buffer = OutboundBuffer.get(stream)
+        results = await asyncio.gather(
+            buffer.write(b"a"), buffer.write(b"b"), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(x, StreamClosedError) for x in results))
+        self.assertFalse(buffer.writing)
+        self.assertEqual(buffer.chunks, [])
+
+
+class TestBroadcast(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        Config.generate()
+
+    async def test_broadcast_params_encodes_once(self):
+        rpc = BaseRPC()
+        rpc.config = mock.MagicMock(protocol_version=3)
+        streams = [MockStream() for _ in range(3)]
+        with mock.patch(
+            "yadacoin.tcpsocket.base.encode", wraps=lambda x, compact: b"x"
+        ) as encode:
+            await rpc.broadcast_params(streams, "newtxn", {"transaction": {}})
+        self.assertEqual(encode.call_count, 1)
+        for stream in streams:
+            self.assertEqual(stream.writes, [b"x"])
+            self.assertEqual(len(stream.message_queue["newtxn"]), 1)
+
+    async def test_message_queue_evicts_oldest(self):
+        rpc = BaseRPC()
+        rpc.config = mock.MagicMock(protocol_version=3)
+        stream = MockStream()
+        for i in range(30):
+            await rpc.write_params(stream, "newtxn", {"i": i})
+        queued = list(stream.message_queue["newtxn"].values())
+        self.assertEqual(len(queued), 26)
+        self.assertEqual(queued[-1]["params"], {"i": 29})
+        self.assertEqual(json.loads(stream.writes[-1])["params"], {"i": 29})
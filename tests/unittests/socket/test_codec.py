@@ -0,0 +1,50 @@
+from unittest import IsolatedAsyncioTestCase
+
+from yadacoin.tcpsocket import codec
+
+from ..mocks import MockStream
+
+
+class TestCodec(IsolatedAsyncioTestCase):
+    def get_message(self):
+        txn = {
+            "id": "MEUCIQDx" + "a" * 56 + "==",
+            "hash": "ab" * 32,
+            "public_key": "AB" * 33,
+            "relationship": "not hex",
+            "inputs": [{"id": "MEQCIF" + "b" * 58 + "=="}],
+            "outputs": [{"to": "1Hash160Address", "value": 1.5}],
+        }
+        return {
+            "id": "request-id",
+            "method": "blocksresponse",
+            "jsonrpc": 2.0,
+            "result": {
+                "start_index": 1,
+                "blocks": [{"hash": "cd" * 32, "transactions": [txn] * 20}],
+            },
+        }
+
+    async def test_json_round_trip(self):
+        message = self.get_message()
+        self.assertEqual(codec.decode(codec.encode(message)), message)
+
+    async def test_compact_round_trip(self):
+        if not codec.is_available():
+            self.skipTest("msgpack is not installed")
+        message = self.get_message()
+        data = codec.encode(message, compact=True)
+        self.assertLess(len(data), len(codec.encode(message)))
+        self.assertEqual(codec.decode(data), message)
+
+    async def test_read_mixed_frames(self):
+        if not codec.is_available():
+            self.skipTest("msgpack is not installed")
+        message = self.get_message()
+        stream = MockStream(
+            data=codec.encode(message)
+            + codec.encode(message, compact=True)
+            + codec.encode(message)
+        )
+        for _ in range(3):
+            self.assertEqual(codec.decode(await codec.read_frame(stream)), message)
@@ -43,14 +43,19 @@ import yadacoin.core.config
 import yadacoin.core.transactionutils
 from plugins.yadacoinpool import handlers
 from yadacoin import version
+from yadacoin.core.balanceledger import BalanceLedger
 from yadacoin.core.block import Block
 from yadacoin.core.blockchain import Blockchain
+from yadacoin.core.blockverifier import BlockVerifier
 from yadacoin.core.chain import CHAIN
 from yadacoin.core.consensus import Consensus
 from yadacoin.core.crypt import Crypt
 from yadacoin.core.graphutils import GraphUtils
+from yadacoin.core.hashservice import HashService
+from yadacoin.core.headersync import HeaderSync
 from yadacoin.core.health import Health
 from yadacoin.core.latestblock import LatestBlock
+from yadacoin.core.masternodeprober import MasternodeProber
 from yadacoin.core.miningpool import MiningPool
 from yadacoin.core.miningpoolpayout import PoolPayer
 from yadacoin.core.mongo import Mongo
@@ -65,13 +70,23 @@ from yadacoin.core.peer import (
     ServiceProvider,
     User,
 )
+from yadacoin.core.poolstats import PoolStats
 from yadacoin.core.processingqueue import (
     BlockProcessingQueueItem,
     ProcessingQueues,
     TransactionProcessingQueueItem,
 )
+from yadacoin.core.publickeyindex import PublicKeyIndex
+from yadacoin.core.retrymessages import RetryMessages
+from yadacoin.core.shareledger import ShareLedger
 from yadacoin.core.smtp import Email
+from yadacoin.core.targetwindow import TargetWindow
 from yadacoin.core.transaction import Transaction
+from yadacoin.core.transactionindex import TransactionIndex
+from yadacoin.core.txninventory import TransactionInventory
+from yadacoin.core.utxo import UTXOSet
+from yadacoin.core.verificationcache import VerificationCache
+from yadacoin.core.worker import Worker, Workers
 from yadacoin.enums.modes import MODES
 from yadacoin.enums.peertypes import PEER_TYPES
 from yadacoin.http.explorer import EXPLORER_HANDLERS
@@ -237,19 +252,16 @@ class NodeApplication(Application):
             ] = int(time())
 
         self.delete_retry_messages(id_attr)
+        self.config.txn_inventory.remove_peer(id_attr)
 
     def delete_retry_messages(self, rid):
         try:
-            for y in self.config.nodeServer.retry_messages.copy():
-                if y[0] == rid:
-                    del self.config.nodeServer.retry_messages[y]
+            self.config.nodeServer.retry_messages.remove_peer(rid)
         except:
             pass
 
         try:
-            for y in self.config.nodeClient.retry_messages.copy():
-                if y[0] == rid:
-                    del self.config.nodeClient.retry_messages[y]
+            self.config.nodeClient.retry_messages.remove_peer(rid)
         except:
             pass
 
@@ -294,15 +306,26 @@ class NodeApplication(Application):
             status["synced"] = await Peer.is_synced()
             status["timestamp"] = int(time())
             status["processing_queues"] = self.config.processing_queues.to_status_dict()
+            status["utxo"] = self.config.utxo.to_status_dict()
+            status["balance_ledger"] = self.config.balance_ledger.to_status_dict()
+            status["transaction_index"] = self.config.transaction_index.to_status_dict()
+            status["block_verifier"] = self.config.block_verifier.to_status_dict()
+            status["hash_service"] = self.config.hash_service.to_status_dict()
+            status["header_sync"] = self.config.header_sync.to_status_dict()
+            status["masternode_prober"] = self.config.masternode_prober.to_status_dict()
+            status[
+                "verification_cache"
+            ] = self.config.verification_cache.to_status_dict()
+            status["public_key_index"] = self.config.public_key_index.to_status_dict()
+            status["share_ledger"] = self.config.share_ledger.to_status_dict()
+            status["pool_stats"] = self.config.pool_stats.to_status_dict()
+            status["workers"] = self.config.workers.to_status_dict()
+            status["txn_inventory"] = self.config.txn_inventory.to_status_dict()
             await self.config.health.check_health()
             status["health"] = self.config.health.to_dict()
             status["message_sender"] = {
-                "nodeServer": {
-                    "num_messages": len(list(self.config.nodeServer.retry_messages))
-                },
-                "nodeClient": {
-                    "num_messages": len(list(self.config.nodeClient.retry_messages))
-                },
+                "nodeServer": self.config.nodeServer.retry_messages.to_status_dict(),
+                "nodeClient": self.config.nodeClient.retry_messages.to_status_dict(),
             }
             status["slow_queries"] = {
                 "count": len(self.config.mongo.async_db.slow_queries),
@@ -480,94 +503,16 @@ class NodeApplication(Application):
             return
         self.config.background_message_sender.busy = True
         try:
-            for x in self.config.nodeServer.retry_messages.copy():
-                message = self.config.nodeServer.retry_messages.get(x)
-                if not message:
-                    if x in self.config.nodeServer.retry_messages:
-                        del self.config.nodeServer.retry_messages[x]
-                    self.config.app_log.debug("background_message_sender - continue 1")
-                    continue
-                message.setdefault("retry_attempts", 0)
-                message["retry_attempts"] += 1
-                for peer_cls in list(
-                    self.config.nodeServer.inbound_streams.keys()
-                ).copy():
-                    found = False
-                    if x[0] in self.config.nodeServer.inbound_streams[peer_cls]:
-                        found = True
-                        if message["retry_attempts"] > 3:
-                            await self.remove_peer(
-                                self.config.nodeServer.inbound_streams[peer_cls][x[0]],
-                                reason=f"background_message_sender nodeServer {x}",
-                            )
-                            self.config.app_log.warning(
-                                f"peer removed: background_message_sender nodeServer {x}"
-                            )
-                            self.config.app_log.debug(
-                                "background_message_sender - continue 2"
-                            )
-                            continue
-                        if len(x) > 3:
-                            await self.config.nodeShared.write_result(
-                                self.config.nodeServer.inbound_streams[peer_cls][x[0]],
-                                x[1],
-                                message,
-                                x[3],
-                            )
-                        else:
-                            await self.config.nodeShared.write_params(
-                                self.config.nodeServer.inbound_streams[peer_cls][x[0]],
-                                x[1],
-                                message,
-                            )
-                    if not found:
-                        self.delete_retry_messages(
-                            x[0],
-                        )
-
-            for x in self.config.nodeClient.retry_messages.copy():
-                message = self.config.nodeClient.retry_messages.get(x)
-                if not message:
-                    if x in self.config.nodeClient.retry_messages:
-                        del self.config.nodeClient.retry_messages[x]
-                    self.config.app_log.debug("background_message_sender - continue 3")
-                    continue
-                message.setdefault("retry_attempts", 0)
-                message["retry_attempts"] += 1
-                for peer_cls in list(
-                    self.config.nodeClient.outbound_streams.keys()
-                ).copy():
-                    found = False
-                    if x[0] in self.config.nodeClient.outbound_streams[peer_cls]:
-                        found = True
-                        if message["retry_attempts"] > 3:
-                            await self.remove_peer(
-                                self.config.nodeClient.outbound_streams[peer_cls][x[0]],
-                                reason=f"background_message_sender nodeClient {x}",
-                            )
-                            self.config.app_log.warning(
-                                f"peer removed: background_message_sender nodeClient {x}"
-                            )
-                            continue
-                        if message.get("test"):
-                            continue
-                        if len(x) > 3:
-                            await self.config.nodeShared.write_result(
-                                self.config.nodeClient.outbound_streams[peer_cls][x[0]],
-                                x[1],
-                                message,
-                                x[3],
-                            )
-                        else:
-                            await self.config.nodeShared.write_params(
-                                self.config.nodeClient.outbound_streams[peer_cls][x[0]],
-                                x[1],
-                                message,
-                            )
-                    if not found:
-                        self.delete_retry_messages(
-                            x[0],
-                        )
+            await self.send_retry_messages(
+                self.config.nodeServer.retry_messages,
+                self.config.nodeServer.inbound_streams,
+                "nodeServer",
+            )
+            await self.send_retry_messages(
+                self.config.nodeClient.retry_messages,
+                self.config.nodeClient.outbound_streams,
+                "nodeClient",
+            )
 
             self.config.health.message_sender.last_activity = int(time())
 
@@ -575,6 +520,43 @@ class NodeApplication(Application):
             self.config.app_log.error(format_exc())
         self.config.background_message_sender.busy = False
 
+    async def send_retry_messages(self, retry_messages, streams, name):
+        for x in retry_messages.pop_due():
+            message = retry_messages.get(x)
+            if not message:
+                if x in retry_messages:
+                    del retry_messages[x]
+                self.config.app_log.debug("background_message_sender - continue 1")
+                continue
+            stream = None
+            for peer_cls in list(streams.keys()):
+                if x[0] in streams[peer_cls]:
+                    stream = streams[peer_cls][x[0]]
+                    break
+            if not stream:
+                self.delete_retry_messages(x[0])
+                continue
+            message.setdefault("retry_attempts", 0)
+            message["retry_attempts"] += 1
+            if message["retry_attempts"] > 3:
+                await self.remove_peer(
+                    stream, reason=f"background_message_sender {name} {x}"
+                )
+                self.config.app_log.warning(
+                    f"peer removed: background_message_sender {name} {x}"
+                )
+                continue
+            if message.get("test"):
+                continue
+            if len(x) > 3:
+                await self.config.nodeShared.write_result(stream, x[1], message, x[3])
+            else:
+                await self.config.nodeShared.write_params(stream, x[1], message)
+
+    async def background_txn_inventory(self):
+        """Sends the transaction ids announced since the last run, one txninv per peer"""
+        await self.config.txn_inventory.flush()
+
     async def background_txn_queue_processor(self):
         self.config.app_log.debug("background_txn_queue_processor")
         if not hasattr(self.config, "background_txn_queue_processor"):
@@ -767,6 +749,23 @@ class NodeApplication(Application):
             self.config.app_log.error(format_exc())
         self.config.background_mempool_cleaner.busy = False
 
+    async def background_masternode_prober(self):
+        """Responsible for keeping masternode reachability current for block generation"""
+        self.config.app_log.debug("background_masternode_prober")
+
+        if not hasattr(self.config, "background_masternode_prober"):
+            self.config.background_masternode_prober = WorkerVars(busy=False)
+
+        if self.config.background_masternode_prober.busy:
+            self.config.app_log.debug("background_masternode_prober - busy")
+            return
+        self.config.background_masternode_prober.busy = True
+        try:
+            await self.config.masternode_prober.probe_all()
+        except Exception:
+            self.config.app_log.error(format_exc())
+        self.config.background_masternode_prober.busy = False
+
     async def background_mempool_sender(self):
         """Responsible for rebroadcasting mempool transactions"""
         self.config.app_log.debug("background_mempool_sender")
@@ -911,44 +910,94 @@ class NodeApplication(Application):
             ThreadPoolExecutor(max_workers=1)
         )
 
+        self.config.workers = Workers()
+        queues = self.config.processing_queues
         if MODES.NODE.value in self.config.modes:
-            PeriodicCallback(
-                self.background_status, self.config.status_wait * 1000
-            ).start()
+            self.config.workers.add(
+                Worker("status", self.background_status, self.config.status_wait)
+            )
 
-            PeriodicCallback(
-                self.background_block_checker, self.config.block_checker_wait * 1000
-            ).start()
+            self.config.workers.add(
+                Worker(
+                    "block_checker",
+                    self.background_block_checker,
+                    self.config.block_checker_wait,
+                )
+            )
 
-            PeriodicCallback(
-                self.background_cache_validator, self.config.cache_validator_wait * 1000
-            ).start()
+            self.config.workers.add(
+                Worker(
+                    "cache_validator",
+                    self.background_cache_validator,
+                    self.config.cache_validator_wait,
+                )
+            )
 
-            PeriodicCallback(
-                self.background_mempool_cleaner, self.config.mempool_cleaner_wait * 1000
-            ).start()
+            self.config.workers.add(
+                Worker(
+                    "mempool_cleaner",
+                    self.background_mempool_cleaner,
+                    self.config.mempool_cleaner_wait,
+                    events=("block",),
+                )
+            )
 
-            PeriodicCallback(
-                self.background_mempool_sender, self.config.mempool_sender_wait * 1000
-            ).start()
+            self.config.workers.add(
+                Worker(
+                    "mempool_sender",
+                    self.background_mempool_sender,
+                    self.config.mempool_sender_wait,
+                )
+            )
 
-            PeriodicCallback(
-                self.background_txn_queue_processor,
-                self.config.txn_queue_processor_wait * 1000,
-            ).start()
+            self.config.workers.add(
+                Worker(
+                    "txn_queue_processor",
+                    self.background_txn_queue_processor,
+                    self.config.txn_queue_processor_wait,
+                    queue=queues.transaction_queue,
+                )
+            )
+
+            self.config.workers.add(
+                Worker(
+                    "block_queue_processor",
+                    self.background_block_queue_processor,
+                    self.config.block_queue_processor_wait,
+                    queue=queues.block_queue,
+                )
+            )
+
+            self.config.workers.add(
+                Worker("peers", self.background_peers, self.config.peers_wait)
+            )
 
-            PeriodicCallback(
-                self.background_block_queue_processor,
-                self.config.block_queue_processor_wait * 1000,
-            ).start()
+            # Block.generate and the node status read the probe records
+            self.config.workers.add(
+                Worker(
+                    "masternode_prober",
+                    self.background_masternode_prober,
+                    self.config.masternode_prober_wait,
+                )
+            )
 
-            PeriodicCallback(
-                self.background_peers, self.config.peers_wait * 1000
-            ).start()
+            self.config.workers.add(
+                Worker(
+                    "txn_inventory",
+                    self.background_txn_inventory,
+                    self.config.txn_inventory_wait,
+                )
+            )
 
-            PeriodicCallback(
-                self.background_message_sender, self.config.message_sender_wait * 1000
-            ).start()
+            # first retry after one sender tick, then backing off
+            RetryMessages.base_delay = self.config.message_sender_wait
+            self.config.workers.add(
+                Worker(
+                    "message_sender",
+                    self.background_message_sender,
+                    self.config.message_sender_wait,
+                )
+            )
 
             if self.config.peer_type in [
                 PEER_TYPES.SERVICE_PROVIDER.value,
@@ -956,24 +1005,36 @@ class NodeApplication(Application):
                 PEER_TYPES.SEED.value,
                 PEER_TYPES.USER.value,
             ]:
-                PeriodicCallback(
-                    self.background_transactions_combining,
-                    self.config.transactions_combining_wait * 1000,
-                ).start()
+                self.config.workers.add(
+                    Worker(
+                        "transactions_combining",
+                        self.background_transactions_combining,
+                        self.config.transactions_combining_wait,
+                    )
+                )
 
             if MODES.POOL.value in self.config.modes:
-                PeriodicCallback(
-                    self.background_nonce_processor,
-                    self.config.nonce_processor_wait * 1000,
-                ).start()
+                self.config.workers.add(
+                    Worker(
+                        "nonce_processor",
+                        self.background_nonce_processor,
+                        self.config.nonce_processor_wait,
+                        queue=queues.nonce_queue,
+                    )
+                )
 
         if self.config.pool_payout:
             self.config.app_log.info("PoolPayout activated")
             self.config.pp = PoolPayer()
 
-            PeriodicCallback(
-                self.background_pool_payer, self.config.pool_payer_wait * 1000
-            ).start()
+            self.config.workers.add(
+                Worker(
+                    "pool_payer",
+                    self.background_pool_payer,
+                    self.config.pool_payer_wait,
+                    events=("block",),
+                )
+            )
 
         if (
             hasattr(self.config, "stress_test_newtxn")
@@ -1147,20 +1208,40 @@ class NodeApplication(Application):
         yadacoin.core.blockchainutils.set_BU(self.config.BU)  # To be removed
         self.config.GU = GraphUtils()
         self.config.LatestBlock = LatestBlock
+        self.config.utxo = UTXOSet()
+        self.config.balance_ledger = BalanceLedger()
+        self.config.transaction_index = TransactionIndex()
+        self.config.block_verifier = BlockVerifier()
+        self.config.target_window = TargetWindow()
+        self.config.header_sync = HeaderSync()
+        self.config.masternode_prober = MasternodeProber()
+        self.config.verification_cache = VerificationCache(
+            self.config.verification_cache_size
+        )
+        self.config.public_key_index = PublicKeyIndex(self.config.public_key_cache_size)
+        self.config.share_ledger = ShareLedger()
+        self.config.pool_stats = PoolStats()
+        self.config.txn_inventory = TransactionInventory()
         if test:
             return
+        self.config.hash_service = HashService()
         tornado.ioloop.IOLoop.current().run_sync(self.config.LatestBlock.block_checker)
+        tornado.ioloop.IOLoop.current().run_sync(self.config.utxo.load)
+        tornado.ioloop.IOLoop.current().spawn_callback(self.config.utxo.sync)
+        tornado.ioloop.IOLoop.current().run_sync(self.config.balance_ledger.load)
+        tornado.ioloop.IOLoop.current().spawn_callback(self.config.balance_ledger.sync)
+        tornado.ioloop.IOLoop.current().run_sync(self.config.transaction_index.load)
+        tornado.ioloop.IOLoop.current().spawn_callback(
+            self.config.transaction_index.sync
+        )
+        tornado.ioloop.IOLoop.current().run_sync(self.config.public_key_index.load)
+        tornado.ioloop.IOLoop.current().spawn_callback(
+            self.config.public_key_index.sync
+        )
+        tornado.ioloop.IOLoop.current().run_sync(self.config.pool_stats.load)
         self.init_consensus()
         self.config.cipher = Crypt(self.config.wif)
         if MODES.NODE.value in self.config.modes:
-            # self.config.pyrx = pyrx.PyRX()
-            # self.config.pyrx.get_rx_hash(
-            #     "header",
-            #     binascii.unhexlify(
-            #         "4181a493b397a733b083639334bc32b407915b9a82b7917ac361816f0a1f5d4d"
-            #     ),
-            #     4,
-            # )
             self.config.nodeServer = NodeSocketServer
             self.config.nodeShared = NodeRPC()
             self.config.nodeClient = NodeSocketClient()
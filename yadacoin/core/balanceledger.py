@@ -0,0 +1,179 @@
+from collections import defaultdict
+
+from pymongo import DeleteMany, UpdateOne
+
+from yadacoin.core.chainfollower import ChainFollower
+from yadacoin.core.crypt import public_key_to_address
+
+
+class BalanceLedger(ChainFollower):
+    """Materialized balance per address
+
+    Every block contributes a delta per address: coinbase outputs credit the
+    sender's own address, outputs to other addresses credit the recipient and,
+    when the transaction has inputs, debit the sender. Change outputs back to
+    the sender do not move the balance. This matches the coinbase, received
+    and spent aggregations of BlockChainUtils.get_final_balance.
+
+    Balances live in address_balances. The deltas of recent blocks are kept
+    in address_balance_deltas so a reorg can be reversed, and reorgs deeper
+    than the kept deltas rebuild the ledger.
+    """
+
+    name = "Balance ledger"
+    state_collection = "address_balance_state"
+    block_projection = {
+        "_id": 0,
+        "index": 1,
+        "hash": 1,
+        "transactions.public_key": 1,
+        "transactions.inputs.id": 1,
+        "transactions.outputs.to": 1,
+        "transactions.outputs.value": 1,
+    }
+    max_deltas = 1000
+
+    def get_block_deltas(self, block):
+        deltas = defaultdict(float)
+        if isinstance(block, dict):
+            transactions = [
+                (
+                    txn["public_key"],
+                    bool(txn.get("inputs")),
+                    [(x["to"], x["value"]) for x in txn.get("outputs", [])],
+                )
+                for txn in block.get("transactions", [])
+            ]
+        else:
+            transactions = [
+                (
+                    txn.public_key,
+                    bool(txn.inputs),
+                    [(x.to, x.value) for x in txn.outputs],
+                )
+                for txn in block.transactions
+            ]
+        for public_key, has_inputs, outputs in transactions:
+            sender = public_key_to_address(public_key)
+            for to, value in outputs:
+                if to == sender:
+                    if not has_inputs:
+                        deltas[to] += value
+                    continue
+                deltas[to] += value
+                if has_inputs:
+                    deltas[sender] -= value
+        return {k: v for k, v in deltas.items() if v}
+
+    async def get_balance(self, address):
+        if not self.is_current():
+            return None
+        balance = await self.mongo.async_db.address_balances.find_one(
+            {"address": address}, {"_id": 0, "balance": 1}
+        )
+        return balance["balance"] if balance else 0.0
+
+    def get_block_data(self, block):
+        return self.get_block_deltas(block)
+
+    def is_clean(self, state):
+        return not state.get("dirty")
+
+    async def can_rollback(self, rolled_back):
+        delta = await self.mongo.async_db.address_balance_deltas.find_one(
+            {"index": self.height}, {"_id": 0, "index": 1}
+        )
+        return delta is not None
+
+    async def _apply(self, entries):
+        totals = defaultdict(float)
+        for index, block_hash, deltas in entries:
+            for address, value in deltas.items():
+                totals[address] += value
+        min_index = self.get_min_delta_index()
+        delta_docs = [
+            {
+                "index": index,
+                "hash": block_hash,
+                "deltas": [{"address": k, "value": v} for k, v in deltas.items()],
+            }
+            for index, block_hash, deltas in entries
+            if index >= min_index
+        ]
+        index, block_hash, _ = entries[-1]
+        await self._write(
+            [
+                UpdateOne({"address": k}, {"$inc": {"balance": v}}, upsert=True)
+                for k, v in totals.items()
+                if v
+            ],
+            delta_docs,
+            index,
+            block_hash,
+        )
+
+    async def _rollback(self, index):
+        totals = defaultdict(float)
+        async for delta in self.mongo.async_db.address_balance_deltas.find(
+            {"index": {"$gte": index}}, {"_id": 0}
+        ):
+            for x in delta["deltas"]:
+                totals[x["address"]] -= x["value"]
+        height = index - 1
+        previous = None
+        if height >= 0:
+            previous = await self.mongo.async_db.address_balance_deltas.find_one(
+                {"index": height}, {"_id": 0, "hash": 1}
+            )
+        await self._write(
+            [
+                UpdateOne({"address": k}, {"$inc": {"balance": v}})
+                for k, v in totals.items()
+                if v
+            ],
+            [],
+            height,
+            previous["hash"] if previous else None,
+            rollback_index=index,
+        )
+
+    async def _write(
+        self, balance_writes, delta_docs, height, block_hash, rollback_index=None
+    ):
+        # $inc is not idempotent, so the tip is marked dirty until the writes
+        # complete and an interrupted write forces a rebuild on load
+        await self.mongo.async_db.address_balance_state.update_one(
+            {"name": "tip"}, {"$set": {"dirty": True}}, upsert=True
+        )
+        if balance_writes:
+            await self.mongo.async_db.address_balances.bulk_write(
+                balance_writes, ordered=False
+            )
+        delta_writes = []
+        if rollback_index is not None:
+            delta_writes.append(DeleteMany({"index": {"$gte": rollback_index}}))
+        if delta_docs:
+            await self.mongo.async_db.address_balance_deltas.insert_many(delta_docs)
+            delta_writes.append(
+                DeleteMany({"index": {"$lt": height - self.max_deltas}})
+            )
+        if delta_writes:
+            await self.mongo.async_db.address_balance_deltas.bulk_write(delta_writes)
+        await self._save_tip(height, block_hash)
+
+    def get_min_delta_index(self):
+        latest_block = self.config.LatestBlock.block
+        if latest_block is None:
+            return 0
+        return latest_block.index - self.max_deltas
+
+    async def _reset(self):
+        await self.mongo.async_db.address_balance_state.update_one(
+            {"name": "tip"}, {"$set": {"dirty": True}}, upsert=True
+        )
+        await self.mongo.async_db.address_balances.delete_many({})
+        await self.mongo.async_db.address_balance_deltas.delete_many({})
+        await self._save_tip(-1, None)
+
+    def get_tip_state(self, height, block_hash):
+        return dict(super().get_tip_state(height, block_hash), dirty=False)
@@ -10,7 +10,6 @@ from logging import getLogger
 
 import pyrx
 from bitcoin.signmessage import BitcoinMessage, VerifyMessage
-from bitcoin.wallet import P2PKHBitcoinAddress
 from coincurve.utils import verify_signature
 from tornado.iostream import StreamClosedError
 from tornado.tcpclient import TCPClient
@@ -19,7 +18,9 @@ from tornado.util import TimeoutError
 import yadacoin.core.config
 from yadacoin.core.chain import CHAIN
 from yadacoin.core.config import Config
+from yadacoin.core.crypt import public_key_to_address
 from yadacoin.core.latestblock import LatestBlock
+from yadacoin.core.merkle import NONCE_PLACEHOLDER, fill_header, get_merkle_root
 from yadacoin.core.nodes import Nodes
 from yadacoin.core.transaction import (
     InvalidTransactionException,
@@ -125,7 +126,9 @@ class Block(object):
         "index",
         "prev_hash",
         "nonce",
-        "transactions",
+        "_transactions",
+        "_raw_transactions",
+        "_coinbase_address",
         "txn_hashes",
         "merkle_root",
         "verify_merkle_root",
@@ -175,29 +178,76 @@ class Block(object):
         self.target = target
         self.special_target = special_target
         if target == 0:
-            # Same call as in new block check - but there's a circular reference here.
-            latest_block = LatestBlock.block
-            if not latest_block:
-                self.target = CHAIN.MAX_TARGET
-            else:
-                if self.index >= CHAIN.FORK_10_MIN_BLOCK:
-                    self.target = await CHAIN.get_target_10min(latest_block, self)
-                else:
-                    self.target = await CHAIN.get_target(self.index, latest_block, self)
-            self.special_target = self.target
-            # TODO: do we need recalc special target here if special min?
+            await self.set_target()
         self.header = header
 
-        self.transactions = []
-        for txn in transactions or []:
-            transaction = Transaction.ensure_instance(txn)
-            transaction.coinbase = Block.is_coinbase(self, transaction)
-            self.transactions.append(transaction)
+        # transactions are decoded on first access, so blocks only read for
+        # their header fields never build Transaction objects
+        self._transactions = None
+        self._raw_transactions = transactions or []
+        self._coinbase_address = None
 
         return self
 
+    @property
+    def transactions(self):
+        if self._transactions is None:
+            transactions = []
+            for txn in self._raw_transactions:
+                transaction = Transaction.ensure_instance(txn)
+                transaction.coinbase = Block.is_coinbase(self, transaction)
+                transactions.append(transaction)
+            self._transactions = transactions
+            self._raw_transactions = None
+        return self._transactions
+
+    @transactions.setter
+    def transactions(self, value):
+        self._transactions = value
+        self._raw_transactions = None
+
+    @property
+    def coinbase_address(self):
+        # keyed by public_key since generated blocks may change it
+        cached = getattr(self, "_coinbase_address", None)
+        if cached is None or cached[0] != self.public_key:
+            cached = (
+                self.public_key,
+                public_key_to_address(self.public_key),
+            )
+            self._coinbase_address = cached
+        return cached[1]
+
     async def copy(self):
-        return await Block.from_json(self.to_json())
+        block = Block()
+        for attr in (
+            "config",
+            "app_log",
+            "version",
+            "time",
+            "index",
+            "prev_hash",
+            "nonce",
+            "merkle_root",
+            "verify_merkle_root",
+            "hash",
+            "public_key",
+            "signature",
+            "special_min",
+            "target",
+            "special_target",
+            "header",
+        ):
+            setattr(block, attr, getattr(self, attr))
+        transactions = (
+            self._raw_transactions if self._transactions is None else self._transactions
+        )
+        block._transactions = None
+        block._raw_transactions = [
+            x.to_dict() if isinstance(x, Transaction) else x for x in transactions
+        ]
+        block._coinbase_address = getattr(self, "_coinbase_address", None)
+        return block
 
     @classmethod
     async def generate(
@@ -211,6 +261,7 @@ class Block(object):
         prev_hash=None,
         nonce=None,
         target=0,
+        merkle_tree=None,
     ):
         config = Config()
         if force_version is None:
@@ -259,15 +310,18 @@ class Block(object):
                 Output.from_dict(
                     {
                         "value": (block_reward * 0.9) + float(fee_sum),
-                        "to": str(
-                            P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(public_key))
-                        ),
+                        "to": public_key_to_address(public_key),
                     }
                 )
             ]
             masternode_reward_total = block_reward * 0.1
 
-            successful_nodes = await test_all_nodes(nodes)
+            if hasattr(config, "masternode_prober"):
+                successful_nodes = await config.masternode_prober.get_reachable_nodes(
+                    nodes
+                )
+            else:
+                successful_nodes = await test_all_nodes(nodes)
             if successful_nodes:
                 if index >= CHAIN.CHECK_MASTERNODE_FEE_FORK:
                     masternode_fee_sum = sum(
@@ -288,12 +342,8 @@ class Block(object):
                         Output.from_dict(
                             {
                                 "value": float(masternode_reward_divided),
-                                "to": str(
-                                    P2PKHBitcoinAddress.from_pubkey(
-                                        bytes.fromhex(
-                                            successful_node.identity.public_key
-                                        )
-                                    )
+                                "to": public_key_to_address(
+                                    successful_node.identity.public_key
                                 ),
                             }
                         )
@@ -303,9 +353,7 @@ class Block(object):
                 Output.from_dict(
                     {
                         "value": block_reward + float(fee_sum),
-                        "to": str(
-                            P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(public_key))
-                        ),
+                        "to": public_key_to_address(public_key),
                     }
                 )
             ]
@@ -328,7 +376,7 @@ class Block(object):
             target=target,
         )
         txn_hashes = block.get_transaction_hashes()
-        block.set_merkle_root(txn_hashes)
+        block.set_merkle_root(txn_hashes, merkle_tree)
         block.header = block.generate_header()
         if nonce:
             block.nonce = str(nonce)
@@ -413,48 +461,35 @@ class Block(object):
 
     def generate_header(self):
         if int(self.version) < 3:
-            return (
-                str(self.version)
-                + str(self.time)
-                + self.public_key
-                + str(self.index)
-                + self.prev_hash
-                + "{nonce}"
-                + str(self.special_min)
-                + str(self.target)
-                + self.merkle_root
-            )
+            target = str(self.target)
+            special_min = str(self.special_min)
         else:
             # version 3 block do not contain special_min anymore and have target as 64 hex string
-            # print("target", block.target)
             # TODO: somewhere, target is calc with a / and result is float instead of int.
-            return (
-                str(self.version)
-                + str(self.time)
-                + self.public_key
-                + str(self.index)
-                + self.prev_hash
-                + "{nonce}"
-                + hex(int(self.target))[2:].rjust(64, "0")
-                + self.merkle_root
+            target = hex(int(self.target))[2:].rjust(64, "0")
+            special_min = ""
+        return "".join(
+            (
+                str(self.version),
+                str(self.time),
+                self.public_key,
+                str(self.index),
+                self.prev_hash,
+                NONCE_PLACEHOLDER,
+                special_min,
+                target,
+                self.merkle_root,
             )
+        )
 
-    def set_merkle_root(self, txn_hashes):
-        self.merkle_root = self.get_merkle_root(txn_hashes)
+    def set_merkle_root(self, txn_hashes, merkle_tree=None):
+        if merkle_tree is None:
+            self.merkle_root = self.get_merkle_root(txn_hashes)
+        else:
+            self.merkle_root = merkle_tree.update(txn_hashes)
 
     def get_merkle_root(self, txn_hashes):
-        hashes = []
-        for i in range(0, len(txn_hashes), 2):
-            txn1 = txn_hashes[i]
-            try:
-                txn2 = txn_hashes[i + 1]
-            except:
-                txn2 = ""
-            hashes.append(hashlib.sha256((txn1 + txn2).encode("utf-8")).digest().hex())
-        if len(hashes) > 1:
-            return self.get_merkle_root(hashes)
-        else:
-            return hashes[0]
+        return get_merkle_root(txn_hashes)
 
     @classmethod
     async def from_dict(cls, block):
@@ -493,9 +528,8 @@ class Block(object):
     def is_coinbase(block, txn):
         return (
             block.public_key == txn.public_key
-            and str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(block.public_key)))
-            in [x.to for x in txn.outputs]
             and len(txn.inputs) == 0
+            and block.coinbase_address in [x.to for x in txn.outputs]
         )
 
     def generate_hash_from_header(self, height, header, nonce):
@@ -506,7 +540,7 @@ class Block(object):
         )  # sha256(yadacoin65000)
         if height >= CHAIN.BLOCK_V5_FORK:
             bh = Block.pyrx.get_rx_hash(
-                header.encode().replace(b"{nonce}", binascii.unhexlify(nonce)),
+                fill_header(header, binascii.unhexlify(nonce)),
                 seed_hash,
                 height,
             )
@@ -525,8 +559,8 @@ class Block(object):
                 .hex()
             )
 
-    async def verify(self):
-        getcontext().prec = 8
+    def verify_stateless(self, hashtest=None):
+        """Checks that only depend on the block itself, safe to run in a worker process"""
         if int(self.version) != int(CHAIN.get_version_for_height(self.index)):
             raise Exception(
                 "Wrong version for block height",
@@ -540,7 +574,10 @@ class Block(object):
             raise Exception("Invalid block merkle root")
 
         header = self.generate_header()
-        hashtest = self.generate_hash_from_header(self.index, header, str(self.nonce))
+        if hashtest is None:
+            hashtest = self.generate_hash_from_header(
+                self.index, header, str(self.nonce)
+            )
         if self.hash != hashtest:
             getLogger("tornado.application").warning(
                 "Verify error hashtest {} header {} nonce {}".format(
@@ -549,7 +586,7 @@ class Block(object):
             )
             raise Exception("Invalid block hash")
 
-        address = str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(self.public_key)))
+        address = public_key_to_address(self.public_key)
         try:
             result = verify_signature(
                 base64.b64decode(self.signature),
@@ -570,6 +607,20 @@ class Block(object):
             except:
                 raise Exception("block signature2 is invalid")
 
+    async def async_generate_hash_from_header(self, height, header, nonce):
+        config = Config()
+        if hasattr(config, "hash_service"):
+            return await config.hash_service.hash(height, header, nonce)
+        return self.generate_hash_from_header(height, header, nonce)
+
+    async def verify(self, check_stateless=True):
+        getcontext().prec = 8
+        if check_stateless:
+            hashtest = await self.async_generate_hash_from_header(
+                self.index, self.generate_header(), str(self.nonce)
+            )
+            self.verify_stateless(hashtest=hashtest)
+
         if self.index >= CHAIN.PAY_MASTER_NODES_FORK:
             masernodes_by_address = (
                 Nodes.get_all_nodes_indexed_by_address_for_block_height(self.index)
@@ -595,9 +646,7 @@ class Block(object):
 
             if txn.coinbase:
                 if self.index >= CHAIN.PAY_MASTER_NODES_FORK:
-                    block_creator_address = str(
-                        P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(self.public_key))
-                    )
+                    block_creator_address = public_key_to_address(self.public_key)
                     for output in txn.outputs:
                         if output.to == block_creator_address:
                             coinbase_sum += float(output.value)
@@ -711,6 +760,20 @@ class Block(object):
         else:
             print("CRITICAL: block rejected...")
 
+    async def set_target(self):
+        """Target for this block's time, it eases as the time since the last block grows"""
+        # Same call as in new block check - but there's a circular reference here.
+        latest_block = LatestBlock.block
+        if not latest_block:
+            self.target = CHAIN.MAX_TARGET
+        else:
+            if self.index >= CHAIN.FORK_10_MIN_BLOCK:
+                self.target = await CHAIN.get_target_10min(latest_block, self)
+            else:
+                self.target = await CHAIN.get_target(self.index, latest_block, self)
+        self.special_target = self.target
+        # TODO: do we need recalc special target here if special min?
+
     def to_dict(self):
         try:
             return {
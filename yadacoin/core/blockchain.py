@@ -130,10 +130,19 @@ class Blockchain(object):
             yield x
 
     @staticmethod
-    async def test_block(block, extra_blocks=[], simulate_last_block=None):
+    async def test_block(
+        block, extra_blocks=[], simulate_last_block=None, used_inputs=None
+    ):
         config = Config()
+        verified_key = None
+        stateless_verified = False
+        if hasattr(config, "block_verifier"):
+            verified_key = config.block_verifier.get_key(block)
+            stateless_verified = config.block_verifier.is_verified(
+                block, key=verified_key
+            )
         try:
-            await block.verify()
+            await block.verify(check_stateless=not stateless_verified)
         except Exception as e:
             config.app_log.warning("Integrate block error 1: {}".format(e))
             return False
@@ -179,7 +188,10 @@ class Blockchain(object):
         if block.index >= CHAIN.CHECK_MASTERNODE_FEE_FORK:
             check_masternode_fee = True
 
-        used_inputs = {}
+        # callers testing a run of blocks pass one used_inputs for the whole run
+        # so an input spent earlier in the run is a double spend too
+        if used_inputs is None:
+            used_inputs = {}
         i = 0
         async for transaction in Blockchain.get_txns(block.transactions):
             if extra_blocks:
@@ -190,6 +202,7 @@ class Blockchain(object):
                 await transaction.verify(
                     check_max_inputs=check_max_inputs,
                     check_masternode_fee=check_masternode_fee,
+                    check_stateless=not stateless_verified,
                 )
             except InvalidTransactionException as e:
                 config.app_log.warning(e)
@@ -303,8 +316,29 @@ class Blockchain(object):
         if not checks_passed:
             return False
 
+        if hasattr(config, "block_verifier"):
+            config.block_verifier.mark_verified(block, key=verified_key)
+
         return True
 
+    @staticmethod
+    async def test_block_linkage(block, simulate_last_block=None):
+        """Only checks that block follows simulate_last_block, or the stored block
+
+        For blocks that already passed test_block against the same previous block.
+        """
+        if block.index == 0:
+            return True
+        if simulate_last_block:
+            return (
+                simulate_last_block.index == block.index - 1
+                and simulate_last_block.hash == block.prev_hash
+            )
+        last_block = await Config().mongo.async_db.blocks.find_one(
+            {"index": block.index - 1}, {"_id": 0, "hash": 1}
+        )
+        return bool(last_block) and last_block["hash"] == block.prev_hash
+
     async def test_inbound_blockchain(self, inbound_blockchain):
         existing_difficulty = await self.get_difficulty()
         inbound_difficulty = await inbound_blockchain.get_difficulty()
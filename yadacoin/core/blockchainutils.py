@@ -3,14 +3,15 @@ import json
 from logging import getLogger
 from time import time
 
-# from yadacoin.transactionutils import TU
-from bitcoin.wallet import P2PKHBitcoinAddress
 from coincurve import PrivateKey
 
 from yadacoin.core.blockchain import Blockchain
 from yadacoin.core.chain import CHAIN
 from yadacoin.core.config import Config
 
+# from yadacoin.transactionutils import TU
+from yadacoin.core.crypt import public_key_to_address
+
 GLOBAL_BU = None
 
 
@@ -35,6 +36,12 @@ class BlockChainUtils(object):
         self.latest_block = None
         self.app_log = getLogger("tornado.application")
 
+    def use_transaction_index(self):
+        return (
+            hasattr(self.config, "transaction_index")
+            and self.config.transaction_index.is_current()
+        )
+
     def invalidate_latest_block(self):
         self.latest_block = None
 
@@ -183,6 +190,10 @@ class BlockChainUtils(object):
         return result[0]["spent_balance"] if result else 0.0
 
     async def get_final_balance(self, address):
+        if hasattr(self.config, "balance_ledger"):
+            balance = await self.config.balance_ledger.get_balance(address)
+            if balance is not None:
+                return balance
         total_coinbase = await self.get_coinbase_total_output_balance(address)
         total_received = await self.get_total_received_balance(address)
         total_spent = await self.get_spent_balance(address)
@@ -220,24 +231,34 @@ class BlockChainUtils(object):
         return await public_key_address_pair_list.to_list(length=None)
 
     async def get_reverse_public_key(self, address):
-        reversed_public_key = await self.mongo.async_db.reversed_public_keys.find_one(
-            {"address": address}
-        )
-        if reversed_public_key:
-            return reversed_public_key["public_key"]
+        if hasattr(self.config, "public_key_index"):
+            public_key = await self.config.public_key_index.get_public_key(address)
+            # a current index has the key of every address that signed a transaction
+            if public_key or self.config.public_key_index.is_current():
+                return public_key
+        else:
+            reversed_public_key = (
+                await self.mongo.async_db.reversed_public_keys.find_one(
+                    {"address": address}
+                )
+            )
+            if reversed_public_key:
+                return reversed_public_key["public_key"]
         public_key_address_pairs = await self.get_public_key_address_pairs(address)
 
         if not public_key_address_pairs:
             return
 
         for public_key in public_key_address_pairs[0]["unique_public_keys"]:
-            xaddress = str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(public_key)))
+            xaddress = public_key_to_address(public_key)
             if xaddress == address:
                 await self.mongo.async_db.reversed_public_keys.update_one(
                     {"address": address, "public_key": public_key},
                     {"$set": {"address": address, "public_key": public_key}},
                     upsert=True,
                 )
+                if hasattr(self.config, "public_key_index"):
+                    self.config.public_key_index.set_public_key(address, public_key)
                 return public_key
 
     def get_wallet_unspent_transactions_for_dusting(self, address):
@@ -402,7 +423,7 @@ class BlockChainUtils(object):
 
         if sum == 0:
             async for txn in self.get_wallet_masternode_fees_delegated_transactions(
-                str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(public_key))),
+                public_key_to_address(public_key),
                 from_block,
             ):
                 sum += txn["transactions"]["masternode_fee"]
@@ -560,15 +581,31 @@ class BlockChainUtils(object):
     ):
         from yadacoin.core.transaction import Transaction
 
-        async for block in self.mongo.async_db.blocks.find({"transactions.id": id}):
-            if give_block:
-                return block
-            for txn in block["transactions"]:
-                if txn["id"] == id:
-                    if instance:
-                        return Transaction.from_dict(txn)
-                    else:
-                        return txn
+        if self.use_transaction_index():
+            res = await self.mongo.async_db.transactions.find_one(
+                {"id": id},
+                {"_id": 0, "block_index": 1, "txn": 1},
+                sort=[("block_index", 1)],
+            )
+            if res:
+                if give_block:
+                    return await self.mongo.async_db.blocks.find_one(
+                        {"index": res["block_index"]}
+                    )
+                if instance:
+                    return Transaction.from_dict(res["txn"])
+                else:
+                    return res["txn"]
+        else:
+            async for block in self.mongo.async_db.blocks.find({"transactions.id": id}):
+                if give_block:
+                    return block
+                for txn in block["transactions"]:
+                    if txn["id"] == id:
+                        if instance:
+                            return Transaction.from_dict(txn)
+                        else:
+                            return txn
         if inc_mempool:
             res2 = await self.mongo.async_db.miner_transactions.find_one({"id": id})
             if res2:
@@ -598,6 +635,24 @@ class BlockChainUtils(object):
     ):
         if not isinstance(input_ids, list):
             input_ids = [input_ids]
+        if hasattr(self.config, "utxo") and self.config.utxo.is_current():
+            spent_index = self.config.utxo.get_spent_index(
+                input_ids, public_key, from_index=from_index
+            )
+            if spent_index is not None:
+                if extra_blocks:
+                    for block in extra_blocks:
+                        if block.index == spent_index:
+                            for txn in block.transactions:
+                                for txn_input in txn.inputs:
+                                    if txn_input.id in input_ids:
+                                        return True
+                    return False
+                return True
+            if inc_mempool:
+                if await self.get_mempool_transactions(public_key, input_ids):
+                    return True
+            return False
         query = [
             {
                 "$match": {
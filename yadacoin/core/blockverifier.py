@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+from traceback import format_exc
+
+import tornado.ioloop
+
+from yadacoin.core.chain import CHAIN
+from yadacoin.core.config import Config
+
+
+def init_worker(config):
+    Config(config)
+
+
+def verify_block_stateless(block):
+    """Runs in a worker process: merkle root, header hash, block and transaction signatures"""
+    return asyncio.run(_verify_block_stateless(block))
+
+
+async def _verify_block_stateless(block):
+    from yadacoin.core.block import Block
+
+    try:
+        block = await Block.from_dict(block)
+        block.verify_stateless()
+        for txn in block.transactions:
+            await txn.verify_stateless(
+                check_max_inputs=block.index > CHAIN.CHECK_MAX_INPUTS_FORK
+            )
+    except Exception as e:
+        return False, str(e)
+    return True, ""
+
+
+class BlockVerifier:
+    """Fans the stateless part of block verification out to a process pool
+
+    Results are remembered per block so the sequential, stateful part of
+    Blockchain.test_block can skip hashing and signature checks for blocks
+    that were already verified.
+    """
+
+    max_verified = 10000
+
+    def __init__(self):
+        self.config = Config()
+        self.app_log = getLogger("tornado.application")
+        self.max_workers = self.config.block_verifier_workers or os.cpu_count() or 1
+        self.pool = None
+        self.verified = OrderedDict()
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(self.config.to_dict(),),
+            )
+        return self.pool
+
+    @staticmethod
+    def get_key(block):
+        # the block hash only commits to the transaction hashes, not their bodies
+        # or signatures, so the key covers the whole serialized block
+        return hashlib.sha256(
+            json.dumps(block.to_dict(), sort_keys=True).encode()
+        ).hexdigest()
+
+    def is_verified(self, block, key=None):
+        return (key or self.get_key(block)) in self.verified
+
+    def mark_verified(self, block, key=None):
+        key = key or self.get_key(block)
+        self.verified[key] = block.index
+        self.verified.move_to_end(key)
+        while len(self.verified) > self.max_verified:
+            self.verified.popitem(last=False)
+
+    async def verify_blocks(self, blocks):
+        # each block is serialized for its key once, not again when marked
+        keyed = [(x, self.get_key(x)) for x in blocks]
+        keyed = [(x, key) for x, key in keyed if key not in self.verified]
+        if not keyed or self.max_workers < 2:
+            return
+        loop = tornado.ioloop.IOLoop.current()
+        try:
+            pool = self.get_pool()
+            results = await asyncio.gather(
+                *[
+                    loop.run_in_executor(pool, verify_block_stateless, x.to_dict())
+                    for x, _ in keyed
+                ]
+            )
+        except Exception:
+            self.app_log.warning("{}".format(format_exc()))
+            self.pool = None
+            return
+        for (block, key), (result, message) in zip(keyed, results):
+            if result:
+                self.mark_verified(block, key=key)
+            else:
+                self.app_log.warning(
+                    "Stateless verification failed for block {}: {}".format(
+                        block.index, message
+                    )
+                )
+
+    def to_status_dict(self):
+        return {
+            "workers": self.max_workers,
+            "num_verified": len(self.verified),
+        }
@@ -3,6 +3,7 @@ This is a class to store the global chain params
 """
 
 from yadacoin.core.config import Config
+from yadacoin.core.targetwindow import TargetWindow
 
 
 class CHAIN(object):
@@ -38,6 +39,7 @@ class CHAIN(object):
     MAX_BLOCKS_PER_MESSAGE = (
         200  # Not really a chain param, but better if coherent across peers
     )
+    MAX_HEADERS_PER_MESSAGE = 2000
     MAX_RETRACE_DEPTH = (
         20  # Max allowed retrace. Deeper retrace would need manual chain truncating
     )
@@ -273,7 +275,6 @@ class CHAIN(object):
         cls.config = Config()
         if extra_blocks is None:
             extra_blocks = []
-        from yadacoin.core.block import Block
 
         # Aim at 5 min average block time, with escape hatch
         max_target = 0x0000FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF  # A single cpu does that under a minute.
@@ -316,41 +317,29 @@ class CHAIN(object):
 
         start_index = last_block.index
 
-        block_from_retarget_period_ago = None
-        for extra_block in extra_blocks:
-            if extra_block.index == start_index - retarget_period:
-                block_from_retarget_period_ago = extra_block
-                break
-
-        if not block_from_retarget_period_ago:
-            block_data = await Config().mongo.async_db.blocks.find_one(
-                {"index": start_index - retarget_period}
-            )
-            if not block_data:
-                return False
-            block_from_retarget_period_ago = await Block.from_dict(block_data)
+        extra_blocks_by_index = {x.index: x for x in extra_blocks}
+        if hasattr(cls.config, "target_window"):
+            target_window = cls.config.target_window
+        else:
+            target_window = TargetWindow()
+        entries = await target_window.get_entries(
+            start_index - retarget_period, start_index
+        )
+        for i in range(start_index - retarget_period, start_index + 1):
+            if i in extra_blocks_by_index:
+                entries[i] = TargetWindow.get_block_entry(extra_blocks_by_index[i])
 
-        retarget_period_ago_time = block_from_retarget_period_ago.time
+        if (start_index - retarget_period) not in entries:
+            return False
+        retarget_period_ago_time = entries[start_index - retarget_period][0]
         elapsed_time_from_retarget_period_ago = int(block.time) - int(
             retarget_period_ago_time
         )
         average_block_time = elapsed_time_from_retarget_period_ago / retarget_period
 
-        block_from_retarget_period2_ago = None
-        for extra_block in extra_blocks:
-            if extra_block.index == start_index - retarget_period2:
-                block_from_retarget_period2_ago = extra_block
-                break
-
-        if not block_from_retarget_period2_ago:
-            block_data = await Config().mongo.async_db.blocks.find_one(
-                {"index": start_index - retarget_period2}
-            )
-            if not block_data:
-                return False
-            block_from_retarget_period2_ago = await Block.from_dict(block_data)
-
-        retarget_period2_ago_time = block_from_retarget_period2_ago.time
+        if (start_index - retarget_period2) not in entries:
+            return False
+        retarget_period2_ago_time = entries[start_index - retarget_period2][0]
         elapsed_time_from_retarget_period2_ago = int(block.time) - int(
             retarget_period2_ago_time
         )
@@ -358,39 +347,23 @@ class CHAIN(object):
 
         # React faster to a drop in block time than to a raise. short block times are more a threat than large ones.
         if average_block_time2 < target_time:
-            hash_sum2 = 0
-            for i in range(start_index, start_index - retarget_period2, -1):
-                found = False
-                for extra_block in extra_blocks:
-                    if extra_block.index == i:
-                        hash_sum2 += extra_block.target
-                        found = True
-                        break
-                if not found:
-                    this_block = await Config().mongo.async_db.blocks.find_one(
-                        {"index": i}
-                    )
-                    if this_block:
-                        block_tmp = await Block.from_dict(this_block)
-                        hash_sum2 += block_tmp.target
+            hash_sum2 = cls.get_target_sum(
+                target_window,
+                entries,
+                extra_blocks_by_index,
+                start_index,
+                retarget_period2,
+            )
             average_target = hash_sum2 / retarget_period2
             target = int(average_target * average_block_time2 / target_time)
         else:
-            hash_sum = 0
-            for i in range(start_index, start_index - retarget_period, -1):
-                found = False
-                for extra_block in extra_blocks:
-                    if extra_block.index == i:
-                        hash_sum += extra_block.target
-                        found = True
-                        break
-                if not found:
-                    this_block = await Config().mongo.async_db.blocks.find_one(
-                        {"index": i}
-                    )
-                    if this_block:
-                        block_tmp = await Block.from_dict(this_block)
-                        hash_sum += block_tmp.target
+            hash_sum = cls.get_target_sum(
+                target_window,
+                entries,
+                extra_blocks_by_index,
+                start_index,
+                retarget_period,
+            )
             average_target = hash_sum / retarget_period
             # This adjusts both ways
             target = int(average_target * average_block_time / target_time)
@@ -413,6 +386,23 @@ class CHAIN(object):
             target = max_target
         return int(target)
 
+    @staticmethod
+    def get_target_sum(
+        target_window, entries, extra_blocks_by_index, start_index, period
+    ):
+        if not any(
+            i in extra_blocks_by_index
+            for i in range(start_index, start_index - period, -1)
+        ):
+            window_sum = target_window.get_sum(start_index, period)
+            if window_sum is not None:
+                return window_sum
+        return sum(
+            entries[i][1]
+            for i in range(start_index, start_index - period, -1)
+            if i in entries
+        )
+
     @classmethod
     async def get_target(cls, height, last_block, block, extra_blocks=None) -> int:
         from yadacoin.core.block import Block
@@ -0,0 +1,182 @@
+from logging import getLogger
+from traceback import format_exc
+
+import tornado.locks
+
+from yadacoin.core.config import Config
+
+
+class ChainFollower:
+    """Derived state that follows the chain tip
+
+    Subclasses keep some state computed from the blocks and record the height
+    and hash it was computed up to in a tip document of state_collection.
+    Blocks are applied by Consensus.insert_block as they are inserted, rolled
+    back on reorg and replayed from the blocks collection whenever the state
+    falls behind. A tip that does not match the chain on load, or a reorg
+    deeper than the subclass can roll back, rebuilds the state from scratch.
+
+    Subclasses provide get_block_data, which reads the part of a block they
+    need from a block dict or a Block, and _apply, _rollback and _reset over
+    their own collections. block_projection limits the fields read while
+    syncing.
+    """
+
+    name = None
+    state_collection = None
+    block_projection = {"_id": 0, "index": 1, "hash": 1}
+    batch_size = 1000
+
+    def __init__(self):
+        self.config = Config()
+        self.mongo = self.config.mongo
+        self.app_log = getLogger("tornado.application")
+        self.height = -1
+        self.block_hash = None
+        self.ready = False
+        self.lock = tornado.locks.Lock()
+
+    def get_state_collection(self):
+        return getattr(self.mongo.async_db, self.state_collection)
+
+    def is_current(self):
+        latest_block = self.config.LatestBlock.block
+        return (
+            self.ready
+            and latest_block is not None
+            and self.height == latest_block.index
+            and self.block_hash == latest_block.hash
+        )
+
+    def is_clean(self, state):
+        return True
+
+    async def load(self):
+        async with self.lock:
+            state = await self.get_state_collection().find_one({"name": "tip"})
+            block = None
+            if state and self.is_clean(state) and state["height"] >= 0:
+                block = await self.mongo.async_db.blocks.find_one(
+                    {"index": state["height"]}, {"hash": 1}
+                )
+            if not block or block["hash"] != state["hash"]:
+                self.app_log.warning(
+                    "{} does not match the chain, rebuilding".format(self.name)
+                )
+                await self._reset()
+                return
+            await self._load(state["height"])
+            self.set_tip(state["height"], state["hash"])
+
+    async def _load(self, height):
+        pass
+
+    async def sync(self):
+        async with self.lock:
+            await self._sync_safe()
+
+    async def rebuild(self):
+        async with self.lock:
+            self.ready = False
+            await self._reset()
+            await self._sync_safe()
+
+    async def apply_block(self, block):
+        async with self.lock:
+            if not self.ready:
+                return
+            try:
+                if block.index <= self.height:
+                    await self._rollback(block.index)
+                if self.height == block.index - 1 and (
+                    block.index == 0 or self.block_hash == block.prev_hash
+                ):
+                    await self._apply(
+                        [(block.index, block.hash, self.get_block_data(block))]
+                    )
+                    return
+            except Exception:
+                self.app_log.warning("{}".format(format_exc()))
+            await self._sync_safe()
+
+    async def _sync_safe(self):
+        try:
+            await self._sync()
+            self.ready = True
+        except Exception:
+            self.ready = False
+            self.app_log.warning("{}".format(format_exc()))
+
+    async def _sync(self):
+        await self._find_fork_point()
+        while True:
+            blocks = (
+                self.mongo.async_db.blocks.find(
+                    {"index": {"$gt": self.height}}, self.block_projection
+                )
+                .sort([("index", 1)])
+                .limit(self.batch_size)
+            )
+            entries = []
+            async for block in blocks:
+                if block["index"] != self.height + len(entries) + 1:
+                    break
+                entries.append(
+                    (block["index"], block["hash"], self.get_block_data(block))
+                )
+            if entries:
+                await self._apply(entries)
+            if len(entries) < self.batch_size:
+                return
+            self.app_log.info("{} synced to height: {}".format(self.name, self.height))
+
+    async def _find_fork_point(self):
+        rolled_back = 0
+        while self.height >= 0:
+            block = await self.mongo.async_db.blocks.find_one(
+                {"index": self.height}, {"hash": 1}
+            )
+            if block and block["hash"] == self.block_hash:
+                return
+            if not await self.can_rollback(rolled_back):
+                await self._reset()
+                return
+            await self._rollback(self.height)
+            rolled_back += 1
+
+    async def can_rollback(self, rolled_back):
+        """Whether the block at the current height can be rolled back"""
+        return True
+
+    def get_block_data(self, block):
+        raise NotImplementedError()
+
+    async def _apply(self, entries):
+        """Applies (index, hash, data) entries of consecutive blocks"""
+        raise NotImplementedError()
+
+    async def _rollback(self, index):
+        """Removes the blocks from index up to the current height"""
+        raise NotImplementedError()
+
+    async def _reset(self):
+        raise NotImplementedError()
+
+    def get_tip_state(self, height, block_hash):
+        return {"name": "tip", "height": height, "hash": block_hash}
+
+    async def _save_tip(self, height, block_hash):
+        self.set_tip(height, block_hash)
+        await self.get_state_collection().replace_one(
+            {"name": "tip"}, self.get_tip_state(height, block_hash), upsert=True
+        )
+
+    def set_tip(self, height, block_hash):
+        self.height = height
+        self.block_hash = block_hash
+
+    def to_status_dict(self):
+        return {
+            "ready": self.ready,
+            "height": self.height,
+        }
@@ -8,18 +8,18 @@ import base58
 import requests
 from bip32utils import BIP32Key
 from bitcoin import core
-from bitcoin.wallet import P2PKHBitcoinAddress
 from coincurve import PrivateKey, PublicKey
 from ecdsa import SECP256k1, VerifyingKey
 from ecdsa.util import sigdecode_der
 from mnemonic import Mnemonic
 
 from yadacoin import version
-from yadacoin.core.crypt import RIPEMD160
+from yadacoin.core.crypt import hash160, public_key_to_address
 from yadacoin.enums.modes import MODES
+from yadacoin.tcpsocket import codec
 
-core.Hash160 = RIPEMD160.ripemd160
-hashlib.ripemd160 = RIPEMD160.ripemd160
+core.Hash160 = hash160
+hashlib.ripemd160 = hash160
 
 
 class Config:
@@ -52,9 +52,7 @@ class Config:
         self.max_inbound = config.get("max_inbound", 10)
         self.max_outbound = config.get("max_outbound", 10)
         self.public_key = config["public_key"]
-        self.address = str(
-            P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(self.public_key))
-        )
+        self.address = public_key_to_address(self.public_key)
 
         self.private_key = config["private_key"]
         self.wif = self.to_wif(self.private_key)
@@ -98,7 +96,11 @@ class Config:
         # Do not try to test or connect to ourselves.
         self.outgoing_blacklist.append(self.serve_host)
         self.outgoing_blacklist.append("{}:{}".format(self.peer_host, self.peer_port))
-        self.protocol_version = 3
+        self.compact_wire_format = config.get("compact_wire_format", True)
+        self.inventory_relay = config.get("inventory_relay", True)
+        self.protocol_version = codec.get_protocol_version(
+            self.compact_wire_format, self.inventory_relay
+        )
         self.node_version = version
         # Config also serves as backbone storage for all singleton helpers used by the components.
         self.mongo = None
@@ -161,6 +163,15 @@ class Config:
 
         self.masternode_fee_minimum = config.get("masternode_fee_minimum", 1)
 
+        self.block_verifier_workers = config.get("block_verifier_workers", None)
+        self.hash_service_workers = config.get("hash_service_workers", None)
+        self.headers_first_sync = config.get("headers_first_sync", True)
+        self.verification_cache_size = config.get("verification_cache_size", 100000)
+        self.public_key_cache_size = config.get("public_key_cache_size", 100000)
+        self.share_retention_seconds = config.get("share_retention_seconds", 604800)
+        self.txn_inventory_wait = config.get("txn_inventory_wait", 1)
+        self.masternode_prober_wait = config.get("masternode_prober_wait", 30)
+
         for key, val in config.items():
             if not hasattr(self, key):
                 setattr(self, key, val)
@@ -256,14 +267,14 @@ class Config:
                 .format()
                 .hex()
             )
-            address = str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(public_key)))
+            address = public_key_to_address(public_key)
 
         if prv:
             key = PrivateKey.from_hex(prv)
             private_key = key.to_hex()
             extended_key = ""
             public_key = key.public_key.format().hex()
-            address = str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(public_key)))
+            address = public_key_to_address(public_key)
 
         if xprv:
             key = BIP32Key.fromExtendedKey(xprv)
@@ -274,7 +285,7 @@ class Config:
                 .format()
                 .hex()
             )
-            address = str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(public_key)))
+            address = public_key_to_address(public_key)
 
         if xprv and child:
             for x in child:
@@ -285,9 +296,7 @@ class Config:
                     .format()
                     .hex()
                 )
-                address = str(
-                    P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(public_key))
-                )
+                address = public_key_to_address(public_key)
 
         if not private_key:
             raise Exception("No key")
@@ -364,9 +373,7 @@ class Config:
         cls.origin = config.get("origin", True)
         cls.network = config.get("network", "mainnet")
         cls.public_key = config["public_key"]
-        cls.address = str(
-            P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(cls.public_key))
-        )
+        cls.address = public_key_to_address(cls.public_key)
 
         cls.private_key = config["private_key"]
         cls.wif = cls.generate_wif(cls.private_key)
@@ -443,6 +450,20 @@ class Config:
 
         cls.masternode_fee_minimum = config.get("masternode_fee_minimum", 1)
 
+        cls.block_verifier_workers = config.get("block_verifier_workers", None)
+        cls.hash_service_workers = config.get("hash_service_workers", None)
+        cls.headers_first_sync = config.get("headers_first_sync", True)
+        cls.verification_cache_size = config.get("verification_cache_size", 100000)
+        cls.public_key_cache_size = config.get("public_key_cache_size", 100000)
+        cls.share_retention_seconds = config.get("share_retention_seconds", 604800)
+        cls.txn_inventory_wait = config.get("txn_inventory_wait", 1)
+        cls.masternode_prober_wait = config.get("masternode_prober_wait", 30)
+        cls.compact_wire_format = config.get("compact_wire_format", True)
+        cls.inventory_relay = config.get("inventory_relay", True)
+        cls.protocol_version = codec.get_protocol_version(
+            cls.compact_wire_format, cls.inventory_relay
+        )
+
     @staticmethod
     def address_is_valid(address):
         try:
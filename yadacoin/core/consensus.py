@@ -7,6 +7,8 @@ import logging
 from time import time
 from traceback import format_exc
 
+from pymongo import DeleteMany, ReplaceOne
+from pymongo.errors import OperationFailure
 from tornado.iostream import StreamClosedError
 
 from yadacoin.core.block import Block
@@ -23,6 +25,7 @@ class MaxIterationsExceededException(Exception):
 
 class Consensus(object):
     lowest = CHAIN.MAX_TARGET
+    mongo_transactions = None
 
     @classmethod
     async def init_async(
@@ -292,7 +295,8 @@ class Consensus(object):
                 stream = await self.config.peer.get_peer_by_id(record["peer"]["rid"])
                 if stream and hasattr(stream, "peer") and stream.peer.authenticated:
                     self.config.processing_queues.block_queue.add(
-                        BlockProcessingQueueItem(Blockchain(record["block"]), stream)
+                        BlockProcessingQueueItem(Blockchain(record["block"]), stream),
+                        requeue=True,
                     )
 
             return True
@@ -315,6 +319,9 @@ class Consensus(object):
         if self.syncing:
             return False
 
+        if hasattr(self.config, "header_sync") and await self.config.header_sync.sync():
+            return
+
         async for peer in self.config.peer.get_sync_peers():
             if peer.synced or peer.message_queue.get("getblocks"):
                 continue
@@ -465,13 +472,21 @@ class Consensus(object):
         self.app_log.debug("integrate_blocks_with_existing_chain")
 
         extra_blocks = [x async for x in blockchain.blocks]
+        if hasattr(self.config, "block_verifier"):
+            await self.config.block_verifier.verify_blocks(extra_blocks)
         prev_block = None
+        used_inputs = {}
+        # every block left in blockchain after this pass has passed test_block
+        tested = self.config.network != "regnet"
         i = 0
         async for block in blockchain.blocks:
-            if self.config.network == "regnet":
+            if not tested:
                 break
             if not await Blockchain.test_block(
-                block, extra_blocks=extra_blocks, simulate_last_block=prev_block
+                block,
+                extra_blocks=extra_blocks,
+                simulate_last_block=prev_block,
+                used_inputs=used_inputs,
             ):
                 good_blocks = [x async for x in blockchain.get_blocks(0, i)]
                 if good_blocks:
@@ -505,39 +520,108 @@ class Consensus(object):
                 )
             return
 
+        # blocks are tested against each other rather than the database, so the
+        # whole run of consecutive valid blocks is written in one batch and the
+        # inputs spent by earlier blocks of the run are carried in used_inputs.
+        # Blocks that passed the first pass only have their linkage checked again.
+        blocks = []
+        prev_block = None
+        used_inputs = {}
         async for block in blockchain.blocks:
-            if (
-                not await Blockchain.test_block(block)
-                and self.config.network == "mainnet"
-            ):
+            if tested:
+                passed = await Blockchain.test_block_linkage(block, prev_block)
+            else:
+                passed = await Blockchain.test_block(
+                    block,
+                    extra_blocks=extra_blocks,
+                    simulate_last_block=prev_block,
+                    used_inputs=used_inputs,
+                )
+            if not passed and self.config.network == "mainnet":
+                await self.insert_blocks(blocks, stream)
                 return
-            await self.insert_block(block, stream)
+            blocks.append(block)
+            prev_block = block
+        await self.insert_blocks(blocks, stream)
 
         if stream:
             stream.syncing = False
 
     async def insert_block(self, block, stream):
-        self.app_log.debug("insert_block")
-        try:
-            await self.mongo.async_db.blocks.delete_many(
-                {"index": {"$gte": block.index}}
-            )
+        return await self.insert_blocks([block], stream)
 
+    async def write_blocks(self, blocks):
+        writes = [DeleteMany({"index": {"$gte": blocks[0].index}})]
+        for block in blocks:
             db_block = block.to_dict()
-
             db_block["updated_at"] = time()
+            writes.append(ReplaceOne({"index": block.index}, db_block, upsert=True))
+        txn_ids = [
+            x.transaction_signature for block in blocks for x in block.transactions
+        ]
 
-            await self.mongo.async_db.blocks.replace_one(
-                {"index": block.index}, db_block, upsert=True
-            )
+        if self.mongo_transactions is not False:
+            try:
+                async with await self.mongo.async_client.start_session() as session:
+                    async with session.start_transaction():
+                        await self.mongo.async_db.blocks.bulk_write(
+                            writes, ordered=True, session=session
+                        )
+                        await self.mongo.async_db.miner_transactions.delete_many(
+                            {"id": {"$in": txn_ids}}, session=session
+                        )
+                Consensus.mongo_transactions = True
+                return
+            except OperationFailure as e:
+                # standalone servers do not support transactions
+                if self.mongo_transactions or e.code != 20:
+                    raise
+                self.app_log.info(
+                    "Mongo transactions unavailable, writing blocks without"
+                )
+                Consensus.mongo_transactions = False
 
-            await self.mongo.async_db.miner_transactions.delete_many(
-                {"id": {"$in": [x.transaction_signature for x in block.transactions]}}
-            )
+        await self.mongo.async_db.blocks.bulk_write(writes, ordered=True)
+        await self.mongo.async_db.miner_transactions.delete_many(
+            {"id": {"$in": txn_ids}}
+        )
+
+    async def insert_blocks(self, blocks, stream):
+        self.app_log.debug("insert_blocks")
+        if not blocks:
+            return True
+        try:
+            await self.write_blocks(blocks)
 
             await self.config.LatestBlock.update_latest_block()
 
-            self.app_log.info("New block inserted for height: {}".format(block.index))
+            for block in blocks:
+                if hasattr(self.config, "utxo"):
+                    await self.config.utxo.apply_block(block)
+
+                if hasattr(self.config, "balance_ledger"):
+                    await self.config.balance_ledger.apply_block(block)
+
+                if hasattr(self.config, "transaction_index"):
+                    await self.config.transaction_index.apply_block(block)
+
+                if hasattr(self.config, "public_key_index"):
+                    await self.config.public_key_index.apply_block(block)
+
+                if hasattr(self.config, "target_window"):
+                    self.config.target_window.push(block)
+
+                if hasattr(self.config, "pool_stats"):
+                    self.config.pool_stats.add_block(block)
+
+                self.app_log.info(
+                    "New block inserted for height: {}".format(block.index)
+                )
+
+            # woken workers read the followers, so they are notified once every
+            # block of the run has been applied
+            if hasattr(self.config, "workers"):
+                self.config.workers.notify("block")
 
             if self.config.mp:
                 if self.syncing or (hasattr(stream, "syncing") and stream.syncing):
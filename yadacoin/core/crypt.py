@@ -1,6 +1,8 @@
 import base64
 import hashlib
+from functools import lru_cache
 
+from bitcoin.wallet import P2PKHBitcoinAddress
 from Crypto.Cipher import AES
 from pbkdf2 import PBKDF2
 
@@ -470,3 +472,26 @@ class RIPEMD160:
             state = RIPEMD160.compress(*state, fin[64 * b : 64 * (b + 1)])
         # Produce output.
         return b"".join((h & 0xFFFFFFFF).to_bytes(4, "little") for h in state)
+
+
+def has_native_ripemd160():
+    try:
+        hashlib.new("ripemd160")
+        return True
+    except ValueError:
+        return False
+
+
+NATIVE_RIPEMD160 = has_native_ripemd160()
+
+
+def hash160(data):
+    """RIPEMD160(SHA256(data)), through OpenSSL when it provides ripemd160"""
+    if NATIVE_RIPEMD160:
+        return hashlib.new("ripemd160", hashlib.sha256(data).digest()).digest()
+    return RIPEMD160.ripemd160(data)
+
+
+@lru_cache(maxsize=100000)
+def public_key_to_address(public_key):
+    return str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(public_key)))
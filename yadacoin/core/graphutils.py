@@ -651,6 +651,13 @@ class GraphUtils(object):
         ):
             if txn.get("relationship"):
                 yield txn
+        if self.config.BU.use_transaction_index():
+            async for x in self.config.mongo.async_db.transactions.find(
+                query, {"_id": 0, "txn": 1}
+            ).sort([("block_index", 1)]):
+                if x["txn"].get("relationship"):
+                    yield x["txn"]
+            return
         async for block in self.config.mongo.async_db.blocks.find(
             blocks_query, {"_id": 0}
         ):
@@ -0,0 +1,118 @@
+import asyncio
+import binascii
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from logging import getLogger
+from traceback import format_exc
+
+import tornado.ioloop
+
+from yadacoin.core.chain import CHAIN
+from yadacoin.core.config import Config
+
+
+def init_worker():
+    import pyrx
+
+    from yadacoin.core.block import Block
+
+    # create and warm the RandomX VM once, it is reused for every batch this worker hashes
+    Block.pyrx = pyrx.PyRX()
+    Block.pyrx.get_rx_hash(
+        "header",
+        binascii.unhexlify(
+            "4181a493b397a733b083639334bc32b407915b9a82b7917ac361816f0a1f5d4d"
+        ),
+        CHAIN.RANDOMX_FORK,
+    )
+
+
+def hash_headers(batch):
+    """Runs in a worker process, batch is a list of (height, header, nonce) tuples"""
+    from yadacoin.core.block import Block
+
+    block = Block()
+    return [
+        block.generate_hash_from_header(height, header, nonce)
+        for height, header, nonce in batch
+    ]
+
+
+class HashService:
+    """Batches RandomX header hashing onto worker processes
+
+    Requests made during the same IOLoop iteration are collected and split
+    across the workers, so callers can await a hash without blocking socket
+    I/O on the node.
+    """
+
+    max_batch_size = 256
+
+    def __init__(self):
+        self.config = Config()
+        self.app_log = getLogger("tornado.application")
+        self.workers = self.config.hash_service_workers
+        if self.workers is None:
+            self.workers = os.cpu_count() or 1
+        self.pool = None
+        self.pending = []
+        self.flush_scheduled = False
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+            )
+        return self.pool
+
+    async def hash(self, height, header, nonce):
+        if height < CHAIN.RANDOMX_FORK or not self.workers:
+            return hash_headers([(height, header, nonce)])[0]
+        future = asyncio.get_event_loop().create_future()
+        self.pending.append(((height, header, nonce), future))
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            tornado.ioloop.IOLoop.current().add_callback(self.flush)
+        return await future
+
+    async def hash_batch(self, batch):
+        return await asyncio.gather(*[self.hash(*x) for x in batch])
+
+    async def flush(self):
+        self.flush_scheduled = False
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        chunk_size = min(self.max_batch_size, max(1, -(-len(pending) // self.workers)))
+        chunks = [
+            pending[i : i + chunk_size] for i in range(0, len(pending), chunk_size)
+        ]
+        loop = tornado.ioloop.IOLoop.current()
+        await asyncio.gather(*[self.run_chunk(loop, chunk) for chunk in chunks])
+
+    async def run_chunk(self, loop, chunk):
+        try:
+            results = await loop.run_in_executor(
+                self.get_pool(), hash_headers, [item for item, future in chunk]
+            )
+        except Exception as e:
+            self.app_log.warning("{}".format(format_exc()))
+            if self.pool is not None:
+                self.pool.shutdown(wait=False)
+                self.pool = None
+            for item, future in chunk:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (item, future), result in zip(chunk, results):
+            if not future.done():
+                future.set_result(result)
+
+    def to_status_dict(self):
+        return {
+            "workers": self.workers,
+            "pending": len(self.pending),
+        }
@@ -0,0 +1,288 @@
+from logging import getLogger
+from time import time
+
+from yadacoin.core.block import Block
+from yadacoin.core.blockchain import Blockchain
+from yadacoin.core.chain import CHAIN
+from yadacoin.core.config import Config
+from yadacoin.core.processingqueue import BlockProcessingQueueItem
+
+HEADER_FIELDS = (
+    "index",
+    "hash",
+    "prevHash",
+    "time",
+    "target",
+    "special_min",
+    "special_target",
+    "nonce",
+    "merkleRoot",
+)
+
+
+class HeaderSync:
+    """Headers-first sync
+
+    Headers for a large range are fetched from one peer and checked for linkage
+    and claimed work. Bodies for the validated headers are then requested in
+    ranges from all sync peers at once, inside a sliding window above the local
+    tip. Bodies arriving out of order are buffered until the blocks right above
+    the tip are available and then handed to the block queue, which still runs
+    the full consensus checks on them.
+    """
+
+    header_window = 4000
+    body_window = 1000
+    body_range = 100
+    ranges_per_peer = 2
+    request_timeout = 30
+    unsupported_timeout = 600
+
+    def __init__(self):
+        self.config = Config()
+        self.app_log = getLogger("tornado.application")
+        self.unsupported = {}
+        self.num_header_requests = 0
+        self.reset()
+
+    def reset(self):
+        self.headers = {}
+        self.header_tip = None
+        self.header_request = None
+        self.in_flight = {}
+        self.buffer = {}
+        self.queued = None
+
+    @staticmethod
+    def get_peer_id(stream):
+        return getattr(stream.peer, stream.peer.id_attribute)
+
+    @staticmethod
+    def has_valid_work(header):
+        # mirrors the work checks of Blockchain.test_block, the claimed target is checked with the body
+        hash_int = int(header["hash"], 16)
+        target = int(header["target"], 16)
+        if (
+            header["index"] >= CHAIN.BLOCK_V5_FORK
+            and int(Blockchain.little_hash(header["hash"]), 16) < target
+        ):
+            return True
+        if hash_int < target:
+            return True
+        if header.get("special_min"):
+            if header["index"] < 38600:
+                return True
+            if hash_int < int(header.get("special_target") or "0", 16):
+                return True
+        return False
+
+    async def get_streams(self):
+        now = time()
+        return [
+            x
+            async for x in self.config.peer.get_sync_peers()
+            if now - self.unsupported.get(self.get_peer_id(x), 0)
+            > self.unsupported_timeout
+        ]
+
+    def prune(self):
+        latest_block = self.config.LatestBlock.block
+        if self.header_tip is None:
+            return
+        header = self.headers.get(latest_block.index)
+        if latest_block.index >= self.header_tip[0] or (
+            header and header["hash"] != latest_block.hash
+        ):
+            # caught up with the header chain or left it on a reorg
+            self.reset()
+            return
+        for index in [x for x in self.headers if x <= latest_block.index]:
+            del self.headers[index]
+        for index in [x for x in self.buffer if x <= latest_block.index]:
+            del self.buffer[index]
+        for start_index in list(self.in_flight):
+            if self.in_flight[start_index][1] <= latest_block.index:
+                del self.in_flight[start_index]
+        if self.queued and self.queued[0] <= latest_block.index:
+            self.queued = None
+
+    async def sync(self):
+        if not self.config.headers_first_sync:
+            return False
+        now = time()
+        if self.header_request and now - self.header_request[1] > self.request_timeout:
+            # no headersresponse, most likely a node without getheaders
+            self.unsupported[self.header_request[0]] = now
+            self.header_request = None
+        for start_index, (peer_id, end_index, requested) in list(
+            self.in_flight.items()
+        ):
+            if now - requested > self.request_timeout:
+                del self.in_flight[start_index]
+        if self.queued and now - self.queued[1] > self.request_timeout:
+            self.app_log.warning(
+                "Header sync: blocks up to {} were not inserted, restarting".format(
+                    self.queued[0]
+                )
+            )
+            self.reset()
+        self.prune()
+        streams = await self.get_streams()
+        if not streams:
+            return False
+        await self.request_headers(streams)
+        await self.request_bodies(streams)
+        await self.queue_blocks()
+        return True
+
+    async def request_headers(self, streams):
+        if self.header_request:
+            return
+        latest_block = self.config.LatestBlock.block
+        start_index = (
+            self.header_tip[0] + 1 if self.header_tip else latest_block.index + 1
+        )
+        if start_index - latest_block.index > self.header_window:
+            return
+        streams = [x for x in streams if not x.synced]
+        if not streams:
+            return
+        stream = streams[self.num_header_requests % len(streams)]
+        self.num_header_requests += 1
+        self.header_request = (self.get_peer_id(stream), time())
+        await self.config.nodeShared.write_params(
+            stream,
+            "getheaders",
+            {
+                "start_index": start_index,
+                "end_index": start_index + CHAIN.MAX_HEADERS_PER_MESSAGE - 1,
+            },
+        )
+
+    async def on_headers(self, stream, headers):
+        peer_id = self.get_peer_id(stream)
+        if not self.header_request or self.header_request[0] != peer_id:
+            return
+        self.header_request = None
+        self.prune()
+        latest_block = self.config.LatestBlock.block
+        if self.header_tip:
+            index, prev_hash = self.header_tip[0] + 1, self.header_tip[1]
+        else:
+            index, prev_hash = latest_block.index + 1, latest_block.hash
+        if not headers:
+            if not self.header_tip:
+                stream.synced = True
+            return
+        for header in sorted(headers, key=lambda x: x["index"]):
+            if header["index"] != index or header["prevHash"] != prev_hash:
+                # not on top of our chain, leave fork resolution to getblocks
+                self.app_log.info(
+                    "Header sync: headers from {} do not connect at {}".format(
+                        stream.peer.host, index
+                    )
+                )
+                self.unsupported[peer_id] = time()
+                break
+            if int(
+                header["time"]
+            ) > time() + CHAIN.TIME_TOLERANCE or not self.has_valid_work(header):
+                self.app_log.warning(
+                    "Header sync: invalid header {} from {}".format(
+                        index, stream.peer.host
+                    )
+                )
+                self.unsupported[peer_id] = time()
+                break
+            self.headers[index] = header
+            self.header_tip = (index, header["hash"])
+            index += 1
+            prev_hash = header["hash"]
+        await self.request_bodies(await self.get_streams())
+
+    async def request_bodies(self, streams):
+        if not self.header_tip:
+            return
+        latest_block = self.config.LatestBlock.block
+        # blocks handed to the block queue are not requested again
+        first_index = (self.queued[0] if self.queued else latest_block.index) + 1
+        end_index = min(self.header_tip[0], latest_block.index + self.body_window)
+        # ranges are aligned so they stay the same as the tip advances
+        start_index = first_index // self.body_range * self.body_range
+        num_ranges = {}
+        for peer_id, range_end, requested in self.in_flight.values():
+            num_ranges[peer_id] = num_ranges.get(peer_id, 0) + 1
+        idle = [
+            x
+            for x in streams
+            if num_ranges.get(self.get_peer_id(x), 0) < self.ranges_per_peer
+        ]
+        while start_index <= end_index and idle:
+            range_end = min(start_index + self.body_range - 1, end_index)
+            if start_index in self.in_flight or all(
+                x in self.buffer
+                for x in range(max(start_index, first_index), range_end + 1)
+            ):
+                start_index += self.body_range
+                continue
+            stream = idle.pop(0)
+            peer_id = self.get_peer_id(stream)
+            num_ranges[peer_id] = num_ranges.get(peer_id, 0) + 1
+            if num_ranges[peer_id] < self.ranges_per_peer:
+                idle.append(stream)
+            self.in_flight[start_index] = (peer_id, range_end, time())
+            stream.syncing = True
+            await self.config.nodeShared.write_params(
+                stream,
+                "getblocks",
+                {"start_index": start_index, "end_index": range_end},
+            )
+            start_index += self.body_range
+
+    def is_requested(self, stream, start_index):
+        return start_index in self.in_flight and self.in_flight[start_index][
+            0
+        ] == self.get_peer_id(stream)
+
+    async def on_blocks(self, stream, start_index, blocks):
+        peer_id, end_index, requested = self.in_flight.pop(start_index)
+        for block in blocks:
+            if block["index"] > end_index:
+                continue
+            header = self.headers.get(block["index"])
+            if not header or header["hash"] != block["hash"]:
+                continue
+            self.buffer[block["index"]] = (block, stream)
+        await self.queue_blocks()
+        await self.request_bodies(await self.get_streams())
+
+    async def queue_blocks(self):
+        self.prune()
+        if self.queued:
+            return
+        index = self.config.LatestBlock.block.index + 1
+        blocks = []
+        while index in self.buffer and len(blocks) < CHAIN.MAX_BLOCKS_PER_MESSAGE:
+            blocks.append(self.buffer.pop(index))
+            index += 1
+        if not blocks:
+            return
+        self.config.processing_queues.block_queue.add(
+            BlockProcessingQueueItem(
+                Blockchain(
+                    [await Block.from_dict(x) for x, stream in blocks], partial=True
+                ),
+                blocks[-1][1],
+            )
+        )
+        self.queued = (index - 1, time())
+
+    def to_status_dict(self):
+        return {
+            "header_tip": self.header_tip[0] if self.header_tip else None,
+            "num_headers": len(self.headers),
+            "in_flight": len(self.in_flight),
+            "buffered": len(self.buffer),
+            "queued_to": self.queued[0] if self.queued else None,
+            "unsupported_peers": len(self.unsupported),
+        }
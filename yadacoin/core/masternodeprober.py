@@ -0,0 +1,88 @@
+import asyncio
+from datetime import timedelta
+from logging import getLogger
+from time import time
+
+from tornado.tcpclient import TCPClient
+
+from yadacoin.core.config import Config
+from yadacoin.core.nodes import Nodes
+
+
+class MasternodeProber:
+    """Keeps a reachability record per masternode
+
+    Nodes are probed on a schedule by background_masternode_prober, so
+    Block.generate reads the reachable set without opening connections.
+    Nodes without a record yet are probed on demand.
+    """
+
+    timeout = 1
+    max_concurrency = 50
+
+    def __init__(self):
+        self.config = Config()
+        self.app_log = getLogger("tornado.application")
+        self.records = {}
+
+    @staticmethod
+    def get_key(node):
+        return (node.host, node.port)
+
+    async def probe(self, node, semaphore):
+        record = self.records.setdefault(
+            self.get_key(node),
+            {
+                "host": node.host,
+                "port": node.port,
+                "reachable": False,
+                "latency": None,
+                "last_success": None,
+                "last_probe": None,
+                "failures": 0,
+            },
+        )
+        async with semaphore:
+            start = time()
+            try:
+                stream = await TCPClient().connect(
+                    node.host, node.port, timeout=timedelta(seconds=self.timeout)
+                )
+                stream.close()
+                record["reachable"] = True
+                record["latency"] = time() - start
+                record["last_success"] = time()
+                record["failures"] = 0
+            except Exception as e:
+                if record["reachable"] or not record["failures"]:
+                    self.app_log.warning(
+                        f"Masternode {node.host}:{node.port} unreachable: {e.__class__.__name__} {e}"
+                    )
+                record["reachable"] = False
+                record["failures"] += 1
+            record["last_probe"] = time()
+
+    async def probe_nodes(self, nodes):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        await asyncio.gather(*[self.probe(node, semaphore) for node in nodes])
+
+    async def probe_all(self):
+        await self.probe_nodes(
+            Nodes.get_all_nodes_for_block_height(self.config.LatestBlock.block.index)
+        )
+
+    async def get_reachable_nodes(self, nodes):
+        unknown = [x for x in nodes if self.get_key(x) not in self.records]
+        if unknown:
+            await self.probe_nodes(unknown)
+        return [x for x in nodes if self.records[self.get_key(x)]["reachable"]]
+
+    def to_status_dict(self):
+        return {
+            "num_nodes": len(self.records),
+            "num_reachable": len([x for x in self.records.values() if x["reachable"]]),
+            "last_probe": max(
+                [x["last_probe"] for x in self.records.values() if x["last_probe"]],
+                default=None,
+            ),
+        }
@@ -0,0 +1,81 @@
+from functools import lru_cache
+from hashlib import sha256
+
+NONCE_PLACEHOLDER = "{nonce}"
+
+
+def hash_pair(left, right):
+    return sha256(left + right).hexdigest().encode()
+
+
+def get_next_level(level):
+    return [
+        hash_pair(level[i], level[i + 1] if i + 1 < len(level) else b"")
+        for i in range(0, len(level), 2)
+    ]
+
+
+def get_merkle_root(txn_hashes):
+    """Merkle root over the hex text of the hashes
+
+    Nodes are hashed as the utf-8 hex text of their children concatenated, an
+    unpaired node is hashed on its own and a single hash is still hashed
+    once. Levels are kept as ascii bytes so hex is only produced once per node.
+    """
+    level = [x.encode() for x in txn_hashes]
+    while True:
+        level = get_next_level(level)
+        if len(level) <= 1:
+            return level[0].decode()
+
+
+class MerkleTree:
+    """Merkle tree that keeps its levels between updates
+
+    update() compares the new leaves with the previous ones and only rehashes
+    nodes whose children changed. Leaves are sorted by hash, so a transaction
+    added to or removed from a template shifts the leaves after it; nodes
+    before the first changed leaf are reused and appends or removals at the
+    end cost O(log n).
+    """
+
+    def __init__(self):
+        self.levels = []
+
+    def update(self, txn_hashes):
+        levels = [[x.encode() for x in txn_hashes]]
+        while True:
+            depth = len(levels)
+            children = levels[-1]
+            old_children = self.levels[depth - 1] if depth <= len(self.levels) else []
+            old_parents = self.levels[depth] if depth < len(self.levels) else []
+            parents = []
+            for i in range(0, len(children), 2):
+                pair = children[i : i + 2]
+                if i // 2 < len(old_parents) and old_children[i : i + 2] == pair:
+                    parents.append(old_parents[i // 2])
+                else:
+                    parents.append(
+                        hash_pair(pair[0], pair[1] if len(pair) > 1 else b"")
+                    )
+            levels.append(parents)
+            if len(parents) <= 1:
+                break
+        self.levels = levels
+        return parents[0].decode()
+
+
+@lru_cache(maxsize=64)
+def get_header_template(header):
+    """Splits a header at its nonce placeholder into ascii byte prefix and suffix"""
+    prefix, placeholder, suffix = header.partition(NONCE_PLACEHOLDER)
+    if not placeholder:
+        return prefix.encode(), None
+    return prefix.encode(), suffix.encode()
+
+
+def fill_header(header, nonce_bytes):
+    prefix, suffix = get_header_template(header)
+    if suffix is None:
+        return prefix
+    return prefix + nonce_bytes + suffix
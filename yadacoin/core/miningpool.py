@@ -1,3 +1,4 @@
+import asyncio
 import json
 import random
 import uuid
@@ -9,6 +10,7 @@ from yadacoin.core.blockchain import Blockchain
 from yadacoin.core.chain import CHAIN
 from yadacoin.core.config import Config
 from yadacoin.core.job import Job
+from yadacoin.core.merkle import MerkleTree
 from yadacoin.core.peer import Peer
 from yadacoin.core.processingqueue import BlockProcessingQueueItem
 from yadacoin.core.transaction import Transaction
@@ -17,6 +19,12 @@ from yadacoin.tcpsocket.pool import StratumServer
 
 
 class MiningPool(object):
+    nonce_batch_size = 100
+    max_nonces_per_run = 1000
+    # rejections can be temporary, e.g. an input from a transaction that is
+    # not yet in a block, so rejected transactions are verified again later
+    rejected_ttl = 30
+
     @classmethod
     async def init_async(cls):
         self = cls()
@@ -36,6 +44,14 @@ class MiningPool(object):
             self.index = last_block.index
         self.last_refresh = 0
         self.block_factory = None
+        self.template_key = None
+        self.merkle_tree = MerkleTree()
+        self.candidates = {}
+        self.candidates_tip = None
+        self.candidates_checks = None
+        self.rejected = {}
+        self.generated_txns = []
+        self.generated_key = None
         await self.refresh()
         return self
 
@@ -45,52 +61,111 @@ class MiningPool(object):
         return status
 
     async def process_nonce_queue(self):
-        item = self.config.processing_queues.nonce_queue.pop()
+        try:
+            await self.process_nonce_items()
+        finally:
+            # one rollup write for every share accepted during this run
+            await self.config.share_ledger.flush()
+
+    async def process_nonce_items(self):
         i = 0  # max loops
-        while item:
-            self.config.processing_queues.nonce_queue.inc_num_items_processed()
+        while i < self.max_nonces_per_run:
+            items = []
+            while len(items) < self.nonce_batch_size:
+                item = self.config.processing_queues.nonce_queue.pop()
+                if not item:
+                    break
+                self.config.processing_queues.nonce_queue.inc_num_items_processed()
+                items.append(item)
+            if not items:
+                return
+            await self.process_nonce_batch(items)
+            i += len(items)
+
+        self.config.app_log.info("process_nonce_queue: max loops exceeded, exiting")
+
+    async def process_nonce_batch(self, items):
+        submissions = []
+        for item in items:
             body = item.body
-            stream = item.stream
-            miner = item.miner
-            nonce = body["params"].get("nonce")
-            job = stream.jobs[body["params"]["id"] or body["params"]["job_id"]]
-            if type(nonce) is not str:
-                result = {"error": True, "message": "nonce is wrong data type"}
-            if len(nonce) > CHAIN.MAX_NONCE_LEN:
-                result = {"error": True, "message": "nonce is too long"}
             data = {
                 "id": body.get("id"),
                 "method": body.get("method"),
                 "jsonrpc": body.get("jsonrpc"),
             }
-            data["result"] = await self.process_nonce(miner, nonce, job)
-            if not data["result"]:
+            nonce = body["params"].get("nonce")
+            job = item.stream.jobs.get(body["params"]["id"] or body["params"]["job_id"])
+            if type(nonce) is not str:
+                data["error"] = {"message": "nonce is wrong data type"}
+            elif len(nonce) > CHAIN.MAX_NONCE_LEN:
+                data["error"] = {"message": "nonce is too long"}
+            elif not job:
                 data["error"] = {"message": "Invalid hash for current block"}
+            submissions.append((item, data, nonce, job))
+
+        valid = [x for x in submissions if "error" not in x[1]]
+        shares = []
+        while valid:
+            valid = await self.process_nonce_hashes(valid, shares)
+
+        await self.config.share_ledger.add_shares(shares)
+
+        for item, data, nonce, job in submissions:
             try:
-                await stream.write("{}\n".format(json.dumps(data)).encode())
+                await item.stream.write("{}\n".format(json.dumps(data)).encode())
             except:
                 pass
             if "error" in data:
-                await StratumServer.send_job(stream)
+                await StratumServer.send_job(item.stream)
 
-            await StratumServer.block_checker()
+        await StratumServer.block_checker()
 
-            i += 1
-            if i >= 1000:
-                self.config.app_log.info(
-                    "process_nonce_queue: max loops exceeded, exiting"
-                )
-                return
+    async def process_nonce_hashes(self, valid, shares):
+        """Hashes the submissions at once and processes them in order
 
-            item = self.config.processing_queues.nonce_queue.pop()
+        A block accepted partway through replaces the template, so the
+        submissions after it are returned to be hashed against the new header.
+        """
+        header = self.block_factory.header
+        index = self.block_factory.index
+        hashes = await asyncio.gather(
+            *[
+                self.block_factory.async_generate_hash_from_header(
+                    job.index, header, nonce + job.extra_nonce
+                )
+                for item, data, nonce, job in valid
+            ],
+            return_exceptions=True,
+        )
+        for position, ((item, data, nonce, job), hash1) in enumerate(
+            zip(valid, hashes)
+        ):
+            if isinstance(hash1, Exception):
+                self.app_log.warning("Hashing share failed: {}".format(hash1))
+                data["error"] = {"message": "Invalid hash for current block"}
+                continue
+            data["result"] = await self.process_nonce(
+                item.miner, nonce, job, hash1=hash1, header=header, shares=shares
+            )
+            if not data["result"]:
+                data["error"] = {"message": "Invalid hash for current block"}
+            if self.block_factory.header != header or self.block_factory.index != index:
+                return valid[position + 1 :]
+        return []
 
-    async def process_nonce(self, miner, nonce, job):
+    async def process_nonce(
+        self, miner, nonce, job, hash1=None, header=None, shares=None
+    ):
         nonce = nonce + job.extra_nonce
-        header = self.block_factory.header
+        if header is None:
+            header = self.block_factory.header
         self.config.app_log.debug(f"Extra Nonce for job {job.index}: {job.extra_nonce}")
         self.config.app_log.debug(f"Nonce for job {job.index}: {nonce}")
 
-        hash1 = self.block_factory.generate_hash_from_header(job.index, header, nonce)
+        if hash1 is None:
+            hash1 = await self.block_factory.async_generate_hash_from_header(
+                job.index, header, nonce
+            )
         self.config.app_log.info(f"Hash1 for job {job.index}: {hash1}")
 
         if self.block_factory.index >= CHAIN.BLOCK_V5_FORK:
@@ -107,29 +182,26 @@ class MiningPool(object):
             )
         ):
             return False
-        block_candidate = await self.block_factory.copy()
-        block_candidate.hash = hash1
-        block_candidate.nonce = nonce
 
-        if block_candidate.special_min:
-            delta_t = int(block_candidate.time) - int(self.last_block_time)
+        special_target = self.block_factory.special_target
+        if self.block_factory.special_min:
+            delta_t = int(self.block_factory.time) - int(self.last_block_time)
             special_target = CHAIN.special_target(
-                block_candidate.index,
-                block_candidate.target,
+                self.block_factory.index,
+                self.block_factory.target,
                 delta_t,
                 self.config.network,
             )
-            block_candidate.special_target = special_target
 
         if (
-            block_candidate.index >= 35200
-            and (int(block_candidate.time) - int(self.last_block_time)) < 600
-            and block_candidate.special_min
+            self.block_factory.index >= 35200
+            and (int(self.block_factory.time) - int(self.last_block_time)) < 600
+            and self.block_factory.special_min
             and self.config.network == "mainnet"
         ):
             self.app_log.warning(
                 "Special min block too soon: hash {} header {} nonce {}".format(
-                    block_candidate.hash, block_candidate.header, block_candidate.nonce
+                    hash1, self.block_factory.header, nonce
                 )
             )
             return False
@@ -147,31 +219,54 @@ class MiningPool(object):
             16,
         )
 
-        if block_candidate.index >= CHAIN.BLOCK_V5_FORK:
-            test_hash = int(Blockchain.little_hash(block_candidate.hash), 16)
+        if self.block_factory.index >= CHAIN.BLOCK_V5_FORK:
+            test_hash = int(Blockchain.little_hash(hash1), 16)
         else:
             test_hash = int(hash1, 16)
 
         if test_hash < target:
             # submit share only now, not to slow down if we had a block
-            await self.mongo.async_db.shares.update_one(
-                {"hash": block_candidate.hash},
-                {
-                    "$set": {
-                        "address": miner.address,
-                        "address_only": miner.address_only,
-                        "index": block_candidate.index,
-                        "hash": block_candidate.hash,
-                        "nonce": nonce,
-                        "weight": job.miner_diff,
-                        "time": int(time()),
-                    }
-                },
-                upsert=True,
-            )
+            share = {
+                "address": miner.address,
+                "address_only": miner.address_only,
+                "index": self.block_factory.index,
+                "hash": hash1,
+                "nonce": nonce,
+                "weight": job.miner_diff,
+                "time": int(time()),
+            }
+            if shares is None:
+                await self.config.share_ledger.add_shares([share])
+            else:
+                shares.append(share)
 
             accepted = True
 
+        is_block = test_hash < int(self.block_factory.target)
+        is_special_min_block = self.block_factory.special_min and (
+            int(special_target) > int(hash1, 16)
+            or (
+                self.block_factory.index >= CHAIN.BLOCK_V5_FORK
+                and int(special_target) > int(Blockchain.little_hash(hash1), 16)
+            )
+        )
+        if not (is_block or is_special_min_block or self.config.network == "regnet"):
+            # only a share, the block candidate is never built
+            if accepted:
+                return {
+                    "hash": hash1,
+                    "nonce": nonce,
+                    "height": self.block_factory.index,
+                    "id": self.block_factory.signature,
+                }
+            return
+
+        block_candidate = await self.block_factory.copy()
+        block_candidate.hash = hash1
+        block_candidate.nonce = nonce
+        if block_candidate.special_min:
+            block_candidate.special_target = special_target
+
         if block_candidate.index >= CHAIN.BLOCK_V5_FORK:
             test_hash = int(Blockchain.little_hash(block_candidate.hash), 16)
         else:
@@ -280,12 +375,24 @@ class MiningPool(object):
             await self.config.LatestBlock.block_checker()
             if self.block_factory:
                 self.last_block_time = int(self.block_factory.time)
-            self.block_factory = await self.create_block(
-                await self.get_pending_transactions(),
-                self.config.public_key,
-                self.config.private_key,
-                index=self.config.LatestBlock.block.index + 1,
+            transactions = await self.get_pending_transactions()
+            template_key = (
+                self.config.LatestBlock.block.hash,
+                tuple(x.transaction_signature for x in transactions),
             )
+            if self.block_factory and template_key == self.template_key:
+                # same transactions on the same tip, the merkle root still holds
+                # but the target eases with the time since the last block
+                self.block_factory.time = int(time())
+                await self.block_factory.set_target()
+            else:
+                self.block_factory = await self.create_block(
+                    transactions,
+                    self.config.public_key,
+                    self.config.private_key,
+                    index=self.config.LatestBlock.block.index + 1,
+                )
+                self.template_key = template_key
             self.block_factory.header = self.block_factory.generate_header()
             self.refreshing = False
         except Exception:
@@ -296,7 +403,13 @@ class MiningPool(object):
             raise
 
     async def create_block(self, transactions, public_key, private_key, index):
-        return await Block.generate(transactions, public_key, private_key, index=index)
+        return await Block.generate(
+            transactions,
+            public_key,
+            private_key,
+            index=index,
+            merkle_tree=self.merkle_tree,
+        )
 
     async def block_to_mine_info(self):
         """Returns info for current block to mine"""
@@ -413,10 +526,13 @@ class MiningPool(object):
             yield x
 
     async def get_pending_transactions(self):
-        mempool_smart_contract_objs = {}
-        transaction_objs = {}
-        used_sigs = []
+        """Returns the transactions for the next block template
 
+        Verified mempool transactions are kept between refreshes. Only
+        transactions added to the mempool since the last refresh are verified,
+        and on a new tip only the ones conflicting with the new block are
+        dropped. A reorg or a fork changing the checks starts over.
+        """
         check_max_inputs = False
         if self.config.LatestBlock.block.index + 1 > CHAIN.CHECK_MAX_INPUTS_FORK:
             check_max_inputs = True
@@ -425,35 +541,106 @@ class MiningPool(object):
         if self.config.LatestBlock.block.index + 1 >= CHAIN.CHECK_MASTERNODE_FEE_FORK:
             check_masternode_fee = True
 
-        async for txn in self.mongo.async_db.miner_transactions.find(
-            {"relationship.smart_contract": {"$exists": True}}
-        ).sort([("fee", -1), ("time", 1)]):
-            transaction_obj = await self.verify_pending_transaction(
-                txn,
-                used_sigs,
-                check_max_inputs=check_max_inputs,
-                check_masternode_fee=check_masternode_fee,
+        await self.update_candidates(check_max_inputs, check_masternode_fee)
+
+        mempool_smart_contract_objs = {}
+        transaction_objs = {}
+        for transaction_obj in sorted(
+            self.candidates.values(),
+            key=lambda x: (-float(x.fee), int(x.time)),
+        ):
+            if self.is_smart_contract(transaction_obj):
+                if (
+                    transaction_obj.relationship.identity.wif
+                    in mempool_smart_contract_objs
+                    and int(transaction_obj.time)
+                    > int(
+                        mempool_smart_contract_objs[
+                            transaction_obj.relationship.identity.wif
+                        ].time
+                    )
+                ):
+                    continue
+
+                mempool_smart_contract_objs[
+                    transaction_obj.relationship.identity.wif
+                ] = transaction_obj
+            else:
+                transaction_objs.setdefault(transaction_obj.requested_rid, [])
+                transaction_objs[transaction_obj.requested_rid].append(transaction_obj)
+
+        generated_key = (self.candidates_tip, tuple(sorted(self.candidates)))
+        if generated_key != self.generated_key:
+            self.generated_txns = await self.get_generated_transactions(
+                transaction_objs
             )
-            if not isinstance(transaction_obj, Transaction):
-                continue
+            self.generated_key = generated_key
+
+        return (
+            list(mempool_smart_contract_objs.values())
+            + TU.get_transaction_objs_list(transaction_objs)
+            + self.generated_txns
+        )
 
+    @staticmethod
+    def is_smart_contract(transaction_obj):
+        from yadacoin.contracts.base import Contract
+
+        return isinstance(transaction_obj.relationship, Contract)
+
+    async def update_candidates(self, check_max_inputs, check_masternode_fee):
+        latest_block = self.config.LatestBlock.block
+        checks = (check_max_inputs, check_masternode_fee)
+        if latest_block.hash != self.candidates_tip:
             if (
-                transaction_obj.relationship.identity.wif in mempool_smart_contract_objs
-                and int(transaction_obj.time)
-                > int(
-                    mempool_smart_contract_objs[
-                        transaction_obj.relationship.identity.wif
-                    ].time
-                )
+                latest_block.prev_hash == self.candidates_tip
+                and checks == self.candidates_checks
             ):
-                continue
-
-            mempool_smart_contract_objs[
-                transaction_obj.relationship.identity.wif
-            ] = transaction_obj
+                # the new block can only have spent inputs of the candidates
+                spent = {
+                    (txn_input.id, txn.public_key)
+                    for txn in latest_block.transactions
+                    for txn_input in txn.inputs
+                }
+                for txn_id, transaction_obj in list(self.candidates.items()):
+                    if any(
+                        (x.id, transaction_obj.public_key) in spent
+                        for x in transaction_obj.inputs
+                    ):
+                        del self.candidates[txn_id]
+            else:
+                self.candidates = {}
+            self.rejected = {}
+            self.candidates_tip = latest_block.hash
+            self.candidates_checks = checks
+
+        mempool_ids = {
+            x["id"]
+            async for x in self.mongo.async_db.miner_transactions.find(
+                {}, {"_id": 0, "id": 1}
+            )
+        }
+        for txn_id in list(self.candidates):
+            if txn_id not in mempool_ids:
+                del self.candidates[txn_id]
+
+        now = time()
+        self.rejected = {
+            k: v
+            for k, v in self.rejected.items()
+            if k in mempool_ids and v > now - self.rejected_ttl
+        }
+        new_ids = [
+            x
+            for x in mempool_ids
+            if x not in self.candidates and x not in self.rejected
+        ]
+        if not new_ids:
+            return
 
+        used_sigs = list(self.candidates)
         async for txn in self.mongo.async_db.miner_transactions.find(
-            {"relationship.smart_contract": {"$exists": False}}
+            {"id": {"$in": new_ids}}
         ).sort([("fee", -1), ("time", 1)]):
             transaction_obj = await self.verify_pending_transaction(
                 txn,
@@ -462,15 +649,17 @@ class MiningPool(object):
                 check_masternode_fee=check_masternode_fee,
             )
             if not isinstance(transaction_obj, Transaction):
+                self.rejected[txn.get("id")] = now
                 continue
-            if transaction_obj.private == True:
+            if transaction_obj.private == True and not self.is_smart_contract(
+                transaction_obj
+            ):
                 transaction_obj.relationship = ""
+            self.candidates[transaction_obj.transaction_signature] = transaction_obj
 
-            transaction_objs.setdefault(transaction_obj.requested_rid, [])
-            transaction_objs[transaction_obj.requested_rid].append(transaction_obj)
-
-        # process recurring payments
+    async def get_generated_transactions(self, transaction_objs):
         generated_txns = []
+        # process recurring payments
         async for x in await TU.get_current_smart_contract_txns(
             self.config, self.config.LatestBlock.block.index
         ):
@@ -520,11 +709,7 @@ class MiningPool(object):
                     expired_blockchain_smart_contract_obj.public_key
                 )
 
-        return (
-            list(mempool_smart_contract_objs.values())
-            + TU.get_transaction_objs_list(transaction_objs)
-            + generated_txns
-        )
+        return generated_txns
 
     async def verify_pending_transaction(
         self, txn, used_sigs, check_max_inputs=False, check_masternode_fee=False
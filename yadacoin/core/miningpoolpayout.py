@@ -1,8 +1,9 @@
+from collections import defaultdict
 from logging import getLogger
 
-from yadacoin.core.block import Block
 from yadacoin.core.chain import CHAIN
 from yadacoin.core.config import Config
+from yadacoin.core.crypt import public_key_to_address
 from yadacoin.core.transaction import NotEnoughMoneyException, Transaction
 
 
@@ -59,64 +60,69 @@ class PoolPayer(object):
         ready_blocks = []
         do_payout = False
         async for won_block in won_blocks:
-            won_block = await self.config.mongo.async_db.blocks.find_one(
-                {
-                    "index": won_block["index"],
-                    "id": won_block["id"],
-                    "hash": won_block["hash"],
-                }
-            )
-            won_block = await Block.from_dict(won_block)
-            coinbase = won_block.get_coinbase()
-            if coinbase.outputs[0].to != self.config.address:
+            # the unwound transaction is the coinbase when it is signed by the block key
+            coinbase = won_block["transactions"]
+            if coinbase["public_key"] != won_block["public_key"] or (
+                public_key_to_address(won_block["public_key"])
+                not in [x["to"] for x in coinbase["outputs"]]
+            ):
+                continue
+            if coinbase["outputs"][0]["to"] != self.config.address:
                 continue
             if self.config.debug:
-                self.app_log.debug(won_block.index)
+                self.app_log.debug(won_block["index"])
             if (
-                won_block.index + self.config.payout_frequency
+                won_block["index"] + self.config.payout_frequency
             ) <= self.config.LatestBlock.block.index:
                 if len(ready_blocks) >= self.config.payout_frequency:
                     if self.config.debug:
                         self.app_log.debug(
-                            "entering payout at block: {}".format(won_block.index)
+                            "entering payout at block: {}".format(won_block["index"])
                         )
                     do_payout = True
                     break
                 else:
                     if self.config.debug:
                         self.app_log.debug(
-                            "block added for payout {}".format(won_block.index)
+                            "block added for payout {}".format(won_block["index"])
                         )
-                    ready_blocks.append(won_block)
+                    ready_blocks.append(
+                        (won_block["index"], Transaction.from_dict(coinbase))
+                    )
 
         if not do_payout:
             return
 
+        # everything the loop below needs is fetched up front, one query each
+        heights = [index for index, _ in ready_blocks]
+        used = await self.get_used_coinbases(
+            [coinbase.transaction_signature for _, coinbase in ready_blocks]
+        )
+        existing_payouts = {}
+        async for x in self.config.mongo.async_db.share_payout.find(
+            {"index": {"$in": heights}}
+        ):
+            existing_payouts.setdefault(x["index"], x)
+        try:
+            share_difficulties = await self.get_share_difficulties_for_heights(heights)
+        except Exception as e:
+            self.app_log.warning(e)
+            return
+
         # check if we already paid out
-        outputs = {}
+        outputs = defaultdict(float)
         coinbases = []
-        for block in ready_blocks:
+        for index, coinbase in ready_blocks:
             if self.config.debug:
-                self.app_log.debug(
-                    "do_payout_for_blocks begin loop {}".format(block.index)
-                )
-            already_used = await self.already_used(block.get_coinbase())
-            if already_used:
-                await self.config.mongo.async_db.shares.delete_many(
-                    {"index": block.index}
-                )
+                self.app_log.debug("do_payout_for_blocks begin loop {}".format(index))
+            if coinbase.transaction_signature in used:
+                await self.config.share_ledger.delete({"index": index})
                 continue
 
-            if self.config.debug:
-                self.app_log.debug(
-                    "do_payout_for_blocks passed already_used {}".format(block.index)
-                )
-            existing = await self.config.mongo.async_db.share_payout.find_one(
-                {"index": block.index}
-            )
+            existing = existing_payouts.get(index)
             if existing:
                 pending = await self.config.mongo.async_db.miner_transactions.find_one(
-                    {"inputs.id": block.get_coinbase().transaction_signature}
+                    {"inputs.id": coinbase.transaction_signature}
                 )
                 if pending:
                     return
@@ -128,12 +134,10 @@ class PoolPayer(object):
                     )
                     await self.broadcast_transaction(transaction)
                     return
-            if self.config.debug:
-                self.app_log.debug(
-                    "do_payout_for_blocks passed existing {}".format(block.index)
-                )
             try:
-                shares = await self.get_share_list_for_height(block.index)
+                shares = await self.get_share_list_for_height(
+                    index, share_difficulties.get(index, {})
+                )
                 if not shares:
                     continue
             except KeyError as e:
@@ -142,65 +146,25 @@ class PoolPayer(object):
             except Exception as e:
                 self.app_log.warning(e)
                 return
-            if self.config.debug:
-                self.app_log.debug(
-                    "do_payout_for_blocks passed get_share_list_for_height {}".format(
-                        block.index
-                    )
-                )
-            coinbase = block.get_coinbase()
             if coinbase.outputs[0].to != self.config.address:
                 return
-            if self.config.debug:
-                self.app_log.debug(
-                    "do_payout_for_blocks passed address compare {}".format(block.index)
-                )
             pool_take = self.config.pool_take
             total_pool_take = coinbase.outputs[0].value * pool_take
             total_payout = coinbase.outputs[0].value - total_pool_take
             coinbases.append(coinbase)
-            if self.config.debug:
-                self.app_log.debug(
-                    "do_payout_for_blocks coinbases so far {}".format(coinbases)
-                )
 
+            for address, x in shares.items():
+                outputs[address] += total_payout * x["payout_share"]
             if self.config.debug:
                 self.app_log.debug(
-                    "do_payout_for_blocks passed coinbase calcs {}".format(block.index)
-                )
-            for address, x in shares.items():
-                if self.config.debug:
-                    self.app_log.debug(
-                        "do_payout_for_blocks shares loop {}".format(block.index)
+                    "do_payout_for_blocks added {} payouts for {}".format(
+                        len(shares), index
                     )
-                exists = await self.config.mongo.async_db.share_payout.find_one(
-                    {"index": block.index, "txn.outputs.to": address}
                 )
-                if exists:
-                    raise PartialPayoutException(
-                        "this index has been partially paid out."
-                    )
-
-                if self.config.debug:
-                    self.app_log.debug(
-                        "do_payout_for_blocks passed shares exists {}".format(
-                            block.index
-                        )
-                    )
-                if address not in outputs:
-                    outputs[address] = 0.0
-                payout = total_payout * x["payout_share"]
-                outputs[address] += payout
-                if self.config.debug:
-                    self.app_log.debug(
-                        "do_payout_for_blocks passed adding payout to outputs {}".format(
-                            block.index
-                        )
-                    )
 
         if not outputs and ready_blocks:
             await self.config.mongo.async_db.share_payout.insert_one(
-                {"index": ready_blocks[-1].index}
+                {"index": ready_blocks[-1][0]}
             )
 
         if not coinbases:
@@ -249,76 +213,100 @@ class PoolPayer(object):
             transaction.to_dict()
         )
         await self.config.mongo.async_db.share_payout.insert_one(
-            {"index": block.index, "txn": transaction.to_dict()}
+            {"index": ready_blocks[-1][0], "txn": transaction.to_dict()}
         )
         await self.broadcast_transaction(transaction)
 
-    async def get_share_list_for_height(self, index):
-        raw_shares = []
-        async for x in self.config.mongo.async_db.shares.find(
-            {"index": index, "address": {"$ne": None}}
-        ).sort([("index", 1)]):
-            raw_shares.append(x)
-        if not raw_shares:
+    async def get_share_difficulties_for_heights(self, heights):
+        """Share difficulty grouped by height and miner address
+
+        Heights are read from the share rollups. Heights without rollups, from
+        before the rollups existed, are summed from the raw shares.
+        """
+        share_difficulties = (
+            await self.config.share_ledger.get_difficulties_for_heights(heights)
+        )
+        missing = [x for x in heights if x not in share_difficulties]
+        if missing:
+            share_hashes = await self.get_share_hashes_for_heights(missing)
+            for index, addresses in share_hashes.items():
+                share_difficulties[index] = {
+                    address: self.get_difficulty(hashes)
+                    for address, hashes in addresses.items()
+                }
+        return share_difficulties
+
+    async def get_share_hashes_for_heights(self, heights):
+        """Share hashes grouped by height and miner address in one aggregation"""
+        results = self.config.mongo.async_db.shares.aggregate(
+            [
+                {"$match": {"index": {"$in": heights}, "address": {"$ne": None}}},
+                {
+                    "$group": {
+                        "_id": {
+                            "index": "$index",
+                            "address": {
+                                "$arrayElemAt": [{"$split": ["$address", "."]}, 0]
+                            },
+                        },
+                        "hashes": {"$push": "$hash"},
+                    }
+                },
+            ],
+            allowDiskUse=True,
+        )
+        share_hashes = defaultdict(dict)
+        async for x in results:
+            share_hashes[x["_id"]["index"]][x["_id"]["address"]] = x["hashes"]
+        return share_hashes
+
+    async def get_share_list_for_height(self, index, share_difficulties=None):
+        if share_difficulties is None:
+            share_difficulties = (
+                await self.get_share_difficulties_for_heights([index])
+            ).get(index, {})
+        if not share_difficulties:
             return False
-        total_difficulty = self.get_difficulty([x for x in raw_shares])
-        shares = {}
-        for share in raw_shares:
-            address = share["address"].split(".")[0]
+        for address in share_difficulties:
             if not self.config.address_is_valid(address):
-                await self.config.mongo.async_db.shares.delete_many(
-                    {"address": address}
-                )
+                await self.config.share_ledger.delete({"address": address})
                 raise Exception(
                     "get_share_list_for_height invalid address: {}, removing related shares".format(
                         address
                     )
                 )
 
-            if address not in shares:
-                shares[address] = {
-                    "blocks": [],
-                }
-            shares[address]["blocks"].append(share)
-
-        add_up = 0
-        for address, item in shares.items():
-            test_difficulty = self.get_difficulty(item["blocks"])
-            shares[address]["payout_share"] = float(test_difficulty) / float(
-                total_difficulty
-            )
-            add_up += test_difficulty
-
-        if add_up == total_difficulty:
-            return shares
-        else:
-            raise NonMatchingDifficultyException()
+        total_difficulty = sum(share_difficulties.values())
+        return {
+            address: {"payout_share": float(difficulty) / float(total_difficulty)}
+            for address, difficulty in share_difficulties.items()
+        }
 
-    def get_difficulty(self, blocks):
-        difficulty = 0
-        for block in blocks:
-            target = int(block["hash"], 16)
-            difficulty += CHAIN.MAX_TARGET - target
-        return difficulty
+    def get_difficulty(self, hashes):
+        return len(hashes) * CHAIN.MAX_TARGET - sum(int(x, 16) for x in hashes)
 
-    async def already_used(self, txn):
+    async def get_used_coinbases(self, transaction_signatures):
         results = self.config.mongo.async_db.blocks.aggregate(
             [
                 {
                     "$match": {
-                        "transactions.inputs.id": txn.transaction_signature,
+                        "transactions.inputs.id": {"$in": transaction_signatures},
                     }
                 },
                 {"$unwind": "$transactions"},
                 {
                     "$match": {
-                        "transactions.inputs.id": txn.transaction_signature,
+                        "transactions.inputs.id": {"$in": transaction_signatures},
                         "transactions.public_key": self.config.public_key,
                     }
                 },
+                {"$project": {"_id": 0, "transactions.inputs.id": 1}},
             ]
         )
-        return [x async for x in results]
+        used = set()
+        async for x in results:
+            used.update(y["id"] for y in x["transactions"]["inputs"])
+        return used & set(transaction_signatures)
 
     async def broadcast_transaction(self, transaction):
         self.app_log.debug(f"broadcast_transaction {transaction.transaction_signature}")
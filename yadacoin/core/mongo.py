@@ -243,6 +243,11 @@ class Mongo(object):
         __index = IndexModel([("index", ASCENDING)], name="__index")
         __hash = IndexModel([("hash", ASCENDING)], name="__hash")
         __time = IndexModel([("time", DESCENDING)], name="__time")
+        __created_at = IndexModel(
+            [("created_at", ASCENDING)],
+            name="__created_at",
+            expireAfterSeconds=self.config.share_retention_seconds,
+        )
         try:
             self.db.shares.create_indexes(
                 [
@@ -253,11 +258,28 @@ class Mongo(object):
                     __index,
                     __hash,
                     __time,
+                    __created_at,
                 ]
             )
         except:
             pass
 
+        __index_address = IndexModel(
+            [("index", ASCENDING), ("address", ASCENDING)],
+            name="__index_address",
+            unique=True,
+        )
+        __address = IndexModel([("address", ASCENDING)], name="__address")
+        __address_only = IndexModel(
+            [("address_only", ASCENDING)], name="__address_only"
+        )
+        try:
+            self.db.share_rollups.create_indexes(
+                [__index_address, __address, __address_only]
+            )
+        except:
+            pass
+
         __index = IndexModel([("index", DESCENDING)], name="__index")
         try:
             self.db.share_payout.create_indexes(
@@ -275,6 +297,12 @@ class Mongo(object):
         except:
             pass
 
+        __address = IndexModel([("address", ASCENDING)], name="__address")
+        try:
+            self.db.reversed_public_keys.create_indexes([__address])
+        except:
+            pass
+
         __id = IndexModel([("id", ASCENDING)], name="__id")
         __hash = IndexModel([("hash", ASCENDING)], name="__hash")
         __outputs_to = IndexModel([("outputs.to", ASCENDING)], name="__outputs_to")
@@ -393,6 +421,57 @@ class Mongo(object):
         except:
             raise
 
+        __id_public_key = IndexModel(
+            [("id", ASCENDING), ("public_key", ASCENDING)],
+            name="__id_public_key",
+            unique=True,
+        )
+        __index = IndexModel([("index", ASCENDING)], name="__index")
+        try:
+            self.db.utxo_spent.create_indexes([__id_public_key, __index])
+        except:
+            pass
+
+        __address = IndexModel([("address", ASCENDING)], name="__address", unique=True)
+        try:
+            self.db.address_balances.create_indexes([__address])
+        except:
+            pass
+
+        __index = IndexModel([("index", ASCENDING)], name="__index")
+        try:
+            self.db.address_balance_deltas.create_indexes([__index])
+        except:
+            pass
+
+        __id = IndexModel([("id", ASCENDING)], name="__id")
+        __hash = IndexModel([("hash", ASCENDING)], name="__hash")
+        __rid = IndexModel([("rid", ASCENDING)], name="__rid")
+        __requested_rid = IndexModel(
+            [("requested_rid", ASCENDING)], name="__requested_rid"
+        )
+        __requester_rid = IndexModel(
+            [("requester_rid", ASCENDING)], name="__requester_rid"
+        )
+        __block_index = IndexModel([("block_index", ASCENDING)], name="__block_index")
+        __input_ids = IndexModel([("input_ids", ASCENDING)], name="__input_ids")
+        __output_to = IndexModel([("output_to", ASCENDING)], name="__output_to")
+        try:
+            self.db.transactions.create_indexes(
+                [
+                    __id,
+                    __hash,
+                    __rid,
+                    __requested_rid,
+                    __requester_rid,
+                    __block_index,
+                    __input_ids,
+                    __output_to,
+                ]
+            )
+        except:
+            pass
+
         # TODO: add indexes for peers
 
         if hasattr(self.config, "mongodb_username") and hasattr(
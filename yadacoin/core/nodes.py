@@ -1,7 +1,6 @@
 from collections import defaultdict
 
-from bitcoin.wallet import P2PKHBitcoinAddress
-
+from yadacoin.core.crypt import public_key_to_address
 from yadacoin.core.peer import Seed, SeedGateway, ServiceProvider
 
 
@@ -62,12 +61,7 @@ class Nodes:
     @classmethod
     def get_all_nodes_indexed_by_address_for_block_height(cls, height):
         nodes = cls().get_all_nodes_for_block_height(height)
-        return {
-            str(
-                P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(node.identity.public_key))
-            ): node
-            for node in nodes
-        }
+        return {public_key_to_address(node.identity.public_key): node for node in nodes}
 
 
 class Seeds(Nodes):
@@ -62,7 +62,7 @@ class Peer:
             "http_host": config.ssl.common_name or config.peer_host,
             "http_port": config.ssl.port or config.serve_port,
             "secure": config.ssl.is_valid(),
-            "protocol_version": 3,
+            "protocol_version": config.protocol_version,
             "node_version": config.node_version,
         }
         if config.peer_type == PEER_TYPES.SEED.value:
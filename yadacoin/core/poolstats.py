@@ -0,0 +1,236 @@
+from collections import deque, namedtuple
+from logging import getLogger
+from time import time
+
+from yadacoin.core.chain import CHAIN
+from yadacoin.core.config import Config
+
+BlockStat = namedtuple("BlockStat", ["index", "time", "target"])
+
+RESOLUTIONS = {
+    "1m": (60, 1440),
+    "1h": (3600, 720),
+    "1d": (86400, 365),
+}
+
+
+class TimeSeries:
+    """Ring buffer of fixed width time buckets
+
+    Each bucket holds the total and the number of the values added during its
+    interval. The oldest bucket is dropped once the buffer is full.
+    """
+
+    def __init__(self, width, size):
+        self.width = width
+        self.buckets = deque(maxlen=size)
+
+    def add(self, timestamp, value, count=1):
+        start = int(timestamp) - int(timestamp) % self.width
+        for bucket in reversed(self.buckets):
+            if bucket[0] == start:
+                bucket[1] += value
+                bucket[2] += count
+                return
+            if bucket[0] < start:
+                break
+        if count < 0 or (self.buckets and start < self.buckets[-1][0]):
+            # older than the newest bucket and not in the buffer, drop it
+            return
+        self.buckets.append([start, value, count])
+
+    def total_since(self, timestamp):
+        total = 0
+        for start, value, count in reversed(self.buckets):
+            if start < timestamp:
+                break
+            total += value
+        return total
+
+    def to_list(self, mean=False):
+        return [
+            {
+                "time": start,
+                "value": value / count if mean else value / self.width,
+            }
+            for start, value, count in self.buckets
+            if count
+        ]
+
+
+class Metric:
+    """Same values kept at every resolution of RESOLUTIONS
+
+    Rate metrics are served as totals per second, the others as the mean of
+    the values added in each bucket.
+    """
+
+    def __init__(self, mean=False, resolutions=RESOLUTIONS):
+        self.mean = mean
+        self.series = {
+            name: TimeSeries(width, size) for name, (width, size) in resolutions.items()
+        }
+        self.last_time = 0
+
+    def add(self, timestamp, value=1):
+        for series in self.series.values():
+            series.add(timestamp, value)
+        self.last_time = max(self.last_time, timestamp)
+
+    def remove(self, timestamp, value=1):
+        for series in self.series.values():
+            series.add(timestamp, -value, count=-1)
+
+    def rate(self, seconds, now=None):
+        now = now or time()
+        return self.series["1m"].total_since(now - seconds) / seconds
+
+    def to_list(self, resolution):
+        return self.series[resolution].to_list(mean=self.mean)
+
+
+class PoolStats:
+    """In-memory time series of the pool and the network
+
+    Shares are added by ShareLedger as they are accepted and blocks by
+    Consensus.insert_blocks, so hashrates, difficulty and block times are
+    served from memory at 1m, 1h and 1d resolution without scanning the
+    shares or blocks collections. The most recent blocks and the shares of
+    the last share_load_seconds are loaded once at startup, so the series do
+    not start empty after a restart. Miner and worker counts then follow
+    StratumServer.update_miner_count.
+    """
+
+    max_blocks = 1000
+    network_hash_rate_blocks = 48
+    miner_resolutions = {"1m": RESOLUTIONS["1m"], "1h": RESOLUTIONS["1h"]}
+    miner_idle_seconds = 86400
+    share_load_seconds = RESOLUTIONS["1m"][0] * RESOLUTIONS["1m"][1]
+
+    def __init__(self):
+        self.config = Config()
+        self.mongo = self.config.mongo
+        self.app_log = getLogger("tornado.application")
+        self.shares = Metric()
+        self.miners = {}
+        self.difficulty = Metric(mean=True)
+        self.block_times = Metric(mean=True)
+        self.workers = Metric(mean=True)
+        self.blocks = deque(maxlen=self.max_blocks)
+        self.miner_count = 0
+        self.worker_count = 0
+
+    @staticmethod
+    def get_block_stat(block):
+        if isinstance(block, dict):
+            return BlockStat(
+                block["index"], int(block["time"]), int(block["target"], 16)
+            )
+        return BlockStat(block.index, int(block.time), int(block.target))
+
+    async def load(self):
+        blocks = (
+            self.mongo.async_db.blocks.find(
+                {}, {"_id": 0, "index": 1, "time": 1, "target": 1}
+            )
+            .sort([("index", -1)])
+            .limit(self.max_blocks)
+        )
+        for block in reversed([x async for x in blocks]):
+            self.add_block(block)
+        await self.load_shares(time())
+
+    async def load_shares(self, now):
+        width = RESOLUTIONS["1m"][0]
+        workers = {}
+        async for share in self.mongo.async_db.shares.find(
+            {"time": {"$gte": now - self.share_load_seconds}},
+            {"_id": 0, "time": 1, "address": 1, "address_only": 1},
+        ).sort([("time", 1)]):
+            self.add_share(share)
+            start = int(share["time"]) - int(share["time"]) % width
+            workers.setdefault(start, set()).add(share["address"])
+        # workers that sent a share each minute stand in for the worker counts
+        for start, addresses in workers.items():
+            self.workers.add(start, len(addresses))
+
+    def add_share(self, share):
+        self.shares.add(share["time"])
+        address = share.get("address_only") or share["address"].split(".")[0]
+        miner = self.miners.get(address)
+        if miner is None:
+            miner = self.miners[address] = Metric(resolutions=self.miner_resolutions)
+        miner.add(share["time"])
+
+    def add_block(self, block):
+        block = self.get_block_stat(block)
+        while self.blocks and self.blocks[-1].index >= block.index:
+            # replaced by a reorg, take its values out of the series
+            self.add_block_values(self.blocks.pop(), self.blocks, remove=True)
+        self.add_block_values(block, self.blocks)
+        self.blocks.append(block)
+        self.prune_miners(block.time)
+
+    def add_block_values(self, block, previous_blocks, remove=False):
+        update = "remove" if remove else "add"
+        if previous_blocks and previous_blocks[-1].index == block.index - 1:
+            getattr(self.block_times, update)(
+                block.time, block.time - previous_blocks[-1].time
+            )
+        getattr(self.difficulty, update)(block.time, CHAIN.MAX_TARGET / block.target)
+
+    def prune_miners(self, now):
+        for address, miner in list(self.miners.items()):
+            if now - miner.last_time > self.miner_idle_seconds:
+                del self.miners[address]
+
+    def set_counts(self, miner_count, worker_count):
+        self.miner_count = miner_count
+        self.worker_count = worker_count
+        self.workers.add(time(), worker_count)
+
+    def get_pool_hash_rate(self, seconds=600):
+        return self.shares.rate(seconds) * self.config.pool_diff
+
+    def get_miner_hash_rate(self, address, seconds=1200):
+        """Hashrate of a miner over the seconds before its last share"""
+        miner = self.miners.get(address)
+        if not miner:
+            return None
+        return miner.rate(seconds, now=miner.last_time + 1) * self.config.pool_diff
+
+    def get_network_hash_rate(self):
+        return self.config.BU.get_hash_rate(
+            list(reversed(self.blocks))[: self.network_hash_rate_blocks]
+        )
+
+    def get_blocks_since(self, timestamp):
+        return [x for x in self.blocks if x.time >= timestamp]
+
+    def get_series(self, name, resolution, address=None):
+        if name == "pool_hashrate":
+            metric, scale = self.shares, self.config.pool_diff
+        elif name == "miner_hashrate":
+            metric = self.miners.get((address or "").split(".")[0])
+            scale = self.config.pool_diff
+            if metric is None:
+                return []
+        elif name == "network_difficulty":
+            metric, scale = self.difficulty, 1
+        elif name == "block_time":
+            metric, scale = self.block_times, 1
+        elif name == "workers":
+            metric, scale = self.workers, 1
+        else:
+            raise KeyError(name)
+        return [
+            {"time": x["time"], "value": x["value"] * scale}
+            for x in metric.to_list(resolution)
+        ]
+
+    def to_status_dict(self):
+        return {
+            "blocks": len(self.blocks),
+            "miners": len(self.miners),
+            "pool_hash_rate": self.get_pool_hash_rate(),
+        }
@@ -1,5 +1,11 @@
+import heapq
+from collections import OrderedDict
+from datetime import timedelta
+from itertools import count
 from time import time
 
+from tornado.locks import Condition
+
 from yadacoin.core.block import Block
 from yadacoin.core.blockchain import Blockchain
 from yadacoin.core.config import Config
@@ -9,8 +15,38 @@ from yadacoin.enums.modes import MODES
 
 
 class ProcessingQueue:
+    """Bounded priority queue of items keyed for dedup
+
+    Items are popped lowest priority value first and in arrival order within
+    a priority. A popped key is remembered for seen_ttl seconds so the same
+    item relayed by several peers is processed once. Re-queues by the
+    consumer itself pass requeue to skip that check. The queue holds at most
+    max_size items and max_per_source items from any one source, so a single
+    peer cannot crowd out the others. Readers wait in wait_for_space while
+    the queue is full instead of reading more from their socket.
+
+    push returns True when the item is queued, None when its key is already
+    queued or seen (counted in num_items_seen) and False when the bounds drop
+    it (counted in num_items_dropped).
+    """
+
     num_items_processed = 0
     time_sum = 0
+    max_size = 10000
+    max_per_source = 1000
+    seen_ttl = 120
+    # consumer woken when an item is added, see Worker
+    worker = None
+
+    def __init__(self):
+        self.queue = {}
+        self.heap = []
+        self.sources = {}
+        self.seen = OrderedDict()
+        self.counter = count()
+        self.num_items_dropped = 0
+        self.num_items_seen = 0
+        self.space = Condition()
 
     def time_sum_start(self):
         self.start_time = time()
@@ -21,15 +57,85 @@ class ProcessingQueue:
     def inc_num_items_processed(self):
         self.num_items_processed += 1
 
+    @staticmethod
+    def get_source(stream):
+        peer = getattr(stream, "peer", None)
+        if peer is None:
+            return None
+        return getattr(peer, peer.id_attribute, None)
+
+    def is_full(self):
+        return len(self.queue) >= self.max_size
+
+    def push(self, key, item, priority=0, source=None, requeue=False):
+        if key in self.queue or (not requeue and self.is_seen(key)):
+            self.num_items_seen += 1
+            return
+        if self.is_full() or (
+            source is not None and self.sources.get(source, 0) >= self.max_per_source
+        ):
+            self.num_items_dropped += 1
+            return False
+        self.queue[key] = (item, source)
+        if source is not None:
+            self.sources[source] = self.sources.get(source, 0) + 1
+        heapq.heappush(self.heap, (priority, next(self.counter), key))
+        if self.worker:
+            self.worker.wake()
+        return True
+
+    def pop(self):
+        while self.heap:
+            priority, _, key = heapq.heappop(self.heap)
+            if key not in self.queue:
+                continue
+            item, source = self.queue.pop(key)
+            if source is not None:
+                self.sources[source] -= 1
+                if not self.sources[source]:
+                    del self.sources[source]
+            self.set_seen(key)
+            self.space.notify_all()
+            return item
+        return None
+
+    def clear(self):
+        self.queue = {}
+        self.heap = []
+        self.sources = {}
+        self.space.notify_all()
+
+    def is_seen(self, key):
+        expires = self.seen.get(key)
+        return expires is not None and expires > time()
+
+    def set_seen(self, key):
+        now = time()
+        self.seen.pop(key, None)
+        self.seen[key] = now + self.seen_ttl
+        # entries are in expiry order, drop the expired ones from the front
+        while self.seen:
+            oldest, expires = next(iter(self.seen.items()))
+            if expires > now:
+                break
+            del self.seen[oldest]
+
+    async def wait_for_space(self):
+        while self.is_full():
+            await self.space.wait(timeout=timedelta(seconds=1))
+
     def to_dict(self):
-        return {"queue": self.queue}
+        return {"queue": {key: item for key, (item, source) in self.queue.items()}}
 
     def to_status_dict(self):
         return {
-            "queue_item_count": len(self.queue.values()),
+            "queue_item_count": len(self.queue),
             "average_processing_time": "%.4f"
             % (self.time_sum / (self.num_items_processed or 1)),
             "num_items_processed": self.num_items_processed,
+            "num_items_dropped": self.num_items_dropped,
+            "num_items_seen": self.num_items_seen,
+            "num_sources": len(self.sources),
         }
 
 
@@ -41,29 +147,25 @@ class BlockProcessingQueueItem:
 
 
 class BlockProcessingQueue(ProcessingQueue):
-    def __init__(self):
-        self.queue = {}
-        self.last_popped = ()
+    # blocks announced at the tip go ahead of sync batches
+    priorities = {"newblock": 0, "blockresponse": 1, "blocksresponse": 2}
+    seen_ttl = 10
 
-    def add(self, item: BlockProcessingQueueItem):
+    def add(self, item: BlockProcessingQueueItem, requeue=False):
+        """requeue is set by consensus for stored blocks it could not attach yet"""
         first_block = item.blockchain.first_block
         final_block = item.blockchain.final_block
         if isinstance(first_block, Block) and isinstance(final_block, Block):
-            if (first_block.hash, final_block.hash) == self.last_popped:
-                return
-            self.queue.setdefault((first_block.hash, final_block.hash), item)
+            key = (first_block.hash, final_block.hash)
         else:
-            if (first_block["hash"], final_block["hash"]) == self.last_popped:
-                return
-            self.queue.setdefault((first_block["hash"], final_block["hash"]), item)
-        return True
-
-    def pop(self):
-        if not self.queue:
-            return None
-        key, item = self.queue.popitem()
-        self.last_popped = key
-        return item
+            key = (first_block["hash"], final_block["hash"])
+        return self.push(
+            key,
+            item,
+            priority=self.priorities.get(item.body.get("method"), 0),
+            source=self.get_source(item.stream),
+            requeue=requeue,
+        )
 
 
 class TransactionProcessingQueueItem:
@@ -73,22 +175,14 @@ class TransactionProcessingQueueItem:
 
 
 class TransactionProcessingQueue(ProcessingQueue):
-    def __init__(self):
-        self.queue = {}
-        self.last_popped = ""
-
     def add(self, item: TransactionProcessingQueueItem):
-        if item.transaction.transaction_signature == self.last_popped:
-            return
-        self.queue.setdefault(item.transaction.transaction_signature, item)
-        return True
-
-    def pop(self):
-        if not self.queue:
-            return None
-        key, item = self.queue.popitem()
-        self.last_popped = key
-        return item
+        # highest fee first
+        return self.push(
+            item.transaction.transaction_signature,
+            item,
+            priority=-float(item.transaction.fee or 0),
+            source=self.get_source(item.stream),
+        )
 
 
 class NonceProcessingQueueItem:
@@ -101,22 +195,10 @@ class NonceProcessingQueueItem:
 
 
 class NonceProcessingQueue(ProcessingQueue):
-    def __init__(self):
-        self.queue = {}
-        self.last_popped = ""
-
     def add(self, item: NonceProcessingQueueItem):
-        if (item.id, item.nonce) == self.last_popped:
-            return
-        self.queue.setdefault((item.id, item.nonce), item)
-        return True
-
-    def pop(self):
-        if not self.queue:
-            return None
-        key, item = self.queue.popitem()
-        self.last_popped = key
-        return item
+        return self.push(
+            (item.id, item.nonce), item, source=self.get_source(item.stream)
+        )
 
 
 class ProcessingQueues:
@@ -136,3 +218,7 @@ class ProcessingQueues:
     def to_status_dict(self):
         out = {x.__class__.__name__: x.to_status_dict() for x in self.queues}
         return out
+
+    async def wait_for_space(self):
+        for queue in self.queues:
+            await queue.wait_for_space()
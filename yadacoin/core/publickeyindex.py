@@ -0,0 +1,123 @@
+from collections import OrderedDict
+
+from pymongo import UpdateOne
+
+from yadacoin.core.chainfollower import ChainFollower
+from yadacoin.core.crypt import public_key_to_address
+
+
+class PublicKeyIndex(ChainFollower):
+    """Resolves addresses back to the public key that controls them
+
+    Pairs are persisted in reversed_public_keys, since every transaction
+    carries its public_key and the address is derived from it. The index
+    follows the chain tip, so the first sync also backfills the pairs of
+    blocks inserted before the index existed. Resolved pairs are kept in a
+    bounded LRU so repeated balance and UTXO requests for the same address do
+    not touch the database. An address maps to the same public key on every
+    fork, so a rollback only moves the tip back and never removes pairs.
+
+    While the index is current an address missing from it has never signed a
+    transaction, so misses are cached until the next block.
+    """
+
+    name = "Public key index"
+    state_collection = "reversed_public_keys_state"
+    block_projection = {"_id": 0, "index": 1, "hash": 1, "transactions.public_key": 1}
+
+    def __init__(self, max_size=100000):
+        super().__init__()
+        self.max_size = max_size
+        self.public_keys = OrderedDict()
+        self.addresses = OrderedDict()
+        self.unknown = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def put(entries, key, value, max_size):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > max_size:
+            entries.popitem(last=False)
+
+    def set_public_key(self, address, public_key):
+        self.put(self.public_keys, address, public_key, self.max_size)
+        self.put(self.addresses, public_key, address, self.max_size)
+        self.unknown.pop(address, None)
+
+    async def get_public_key(self, address):
+        public_key = self.public_keys.get(address)
+        if public_key is not None:
+            self.public_keys.move_to_end(address)
+            self.hits += 1
+            return public_key
+        if address in self.unknown:
+            self.hits += 1
+            return None
+        self.misses += 1
+        reversed_public_key = await self.mongo.async_db.reversed_public_keys.find_one(
+            {"address": address}
+        )
+        if not reversed_public_key:
+            if self.is_current():
+                self.put(self.unknown, address, None, self.max_size)
+            return None
+        self.set_public_key(address, reversed_public_key["public_key"])
+        return reversed_public_key["public_key"]
+
+    def get_block_data(self, block):
+        if isinstance(block, dict):
+            return [txn.get("public_key") for txn in block.get("transactions", [])]
+        return [txn.public_key for txn in block.transactions]
+
+    async def _apply(self, entries):
+        pairs = {}
+        for _, _, public_keys in entries:
+            for public_key in public_keys:
+                if not public_key or public_key in self.addresses:
+                    continue
+                address = public_key_to_address(public_key)
+                self.set_public_key(address, public_key)
+                pairs[address] = public_key
+        self.unknown = OrderedDict()
+        if pairs:
+            await self.mongo.async_db.reversed_public_keys.bulk_write(
+                [
+                    UpdateOne(
+                        {"address": address},
+                        {
+                            "$setOnInsert": {
+                                "address": address,
+                                "public_key": public_key,
+                            }
+                        },
+                        upsert=True,
+                    )
+                    for address, public_key in pairs.items()
+                ],
+                ordered=False,
+            )
+        index, block_hash, _ = entries[-1]
+        await self._save_tip(index, block_hash)
+
+    async def _rollback(self, index):
+        height = index - 1
+        block = None
+        if height >= 0:
+            block = await self.mongo.async_db.blocks.find_one(
+                {"index": height}, {"hash": 1}
+            )
+        await self._save_tip(height, block["hash"] if block else None)
+
+    async def _reset(self):
+        # the pairs hold on every chain, only the backfill starts over
+        await self._save_tip(-1, None)
+
+    def to_status_dict(self):
+        return dict(
+            super().to_status_dict(),
+            size=len(self.public_keys),
+            hits=self.hits,
+            misses=self.misses,
+        )
@@ -0,0 +1,89 @@
+import heapq
+from itertools import count
+from time import time
+
+
+class RetryMessages(dict):
+    """Messages awaiting a response, keyed by (rid, method, ...)
+
+    Handlers store and acknowledge messages as in a plain dict. Keys are also
+    indexed by peer rid, so a disconnected peer drops its messages without a
+    scan, and scheduled in a heap ordered by next retry time, so the message
+    sender only visits the messages that are due. Every retry doubles the
+    delay before the next one, up to max_delay.
+    """
+
+    base_delay = 10
+    max_delay = 120
+
+    def __init__(self):
+        super().__init__()
+        self.heap = []
+        self.by_peer = {}
+        self.entries = {}
+        self.counter = count()
+
+    def __setitem__(self, key, message):
+        super().__setitem__(key, message)
+        self.by_peer.setdefault(key[0], set()).add(key)
+        self.schedule(key, time() + self.get_delay(0))
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.unindex(key)
+
+    def pop(self, key, *default):
+        if key in self:
+            self.unindex(key)
+        return super().pop(key, *default)
+
+    def clear(self):
+        super().clear()
+        self.heap = []
+        self.by_peer = {}
+        self.entries = {}
+
+    def unindex(self, key):
+        self.entries.pop(key, None)
+        keys = self.by_peer.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_peer[key[0]]
+
+    def remove_peer(self, rid):
+        for key in self.by_peer.pop(rid, ()):
+            super().__delitem__(key)
+            self.entries.pop(key, None)
+
+    def get_delay(self, attempts):
+        return min(self.base_delay * 2**attempts, self.max_delay)
+
+    def schedule(self, key, at):
+        entry = next(self.counter)
+        self.entries[key] = entry
+        heapq.heappush(self.heap, (at, entry, key))
+
+    def pop_due(self, now=None):
+        """Keys whose retry time has passed, each rescheduled with backoff"""
+        now = now or time()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            at, entry, key = heapq.heappop(self.heap)
+            if self.entries.get(key) != entry:
+                # acknowledged or stored again since it was scheduled
+                continue
+            attempts = self[key].get("retry_attempts", 0) if self[key] else 0
+            self.schedule(key, now + self.get_delay(attempts + 1))
+            due.append(key)
+        if len(self.heap) > 2 * len(self.entries) + 1000:
+            self.heap = [x for x in self.heap if self.entries.get(x[2]) == x[1]]
+            heapq.heapify(self.heap)
+        return due
+
+    def to_status_dict(self):
+        return {
+            "num_messages": len(self),
+            "num_peers": len(self.by_peer),
+            "scheduled": len(self.heap),
+        }
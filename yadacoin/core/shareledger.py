@@ -0,0 +1,161 @@
+from datetime import datetime
+from logging import getLogger
+from traceback import format_exc
+
+from pymongo import UpdateOne
+
+from yadacoin.core.chain import CHAIN
+from yadacoin.core.config import Config
+
+
+class ShareLedger:
+    """Per-height, per-address rollups of the accepted pool shares
+
+    Accepted shares are still written to the shares collection, but only as
+    an audit trail that expires through a TTL index on created_at. Every
+    share that is new to that collection is added to an in-memory rollup
+    keyed by height and miner address, and the rollups are flushed to
+    share_rollups with one $inc per key. Payouts and pool statistics read the
+    rollups, so their cost follows the number of miners per height instead
+    of the number of shares.
+
+    The difficulty of a share is MAX_TARGET minus its hash, which does not fit
+    in a 64 bit integer, so rollups keep it as a double. Payouts only use it
+    as a ratio between miners.
+    """
+
+    def __init__(self):
+        self.config = Config()
+        self.mongo = self.config.mongo
+        self.app_log = getLogger("tornado.application")
+        self.pending = {}
+        self.shares_added = 0
+        self.flushes = 0
+
+    @staticmethod
+    def get_difficulty(hash):
+        return CHAIN.MAX_TARGET - int(hash, 16)
+
+    def add_rollup(self, share):
+        key = (share["index"], share["address"])
+        rollup = self.pending.get(key)
+        if rollup is None:
+            rollup = self.pending[key] = {
+                "index": share["index"],
+                "address": share["address"],
+                "address_only": share.get("address_only")
+                or share["address"].split(".")[0],
+                "shares": 0,
+                "weight": 0,
+                "difficulty": 0,
+                "first_time": share["time"],
+                "last_time": share["time"],
+            }
+        rollup["shares"] += 1
+        rollup["weight"] += share.get("weight") or 0
+        rollup["difficulty"] += self.get_difficulty(share["hash"])
+        rollup["first_time"] = min(rollup["first_time"], share["time"])
+        rollup["last_time"] = max(rollup["last_time"], share["time"])
+
+    async def add_shares(self, shares):
+        """Writes the raw shares and rolls up the ones that were not seen before"""
+        if not shares:
+            return
+        created_at = datetime.utcnow()
+        result = await self.mongo.async_db.shares.bulk_write(
+            [
+                UpdateOne(
+                    {"hash": share["hash"]},
+                    {"$set": dict(share, created_at=created_at)},
+                    upsert=True,
+                )
+                for share in shares
+            ],
+            ordered=False,
+        )
+        for i in result.upserted_ids:
+            self.add_rollup(shares[i])
+            self.shares_added += 1
+            if hasattr(self.config, "pool_stats"):
+                self.config.pool_stats.add_share(shares[i])
+
+    async def flush(self):
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        try:
+            await self.mongo.async_db.share_rollups.bulk_write(
+                [
+                    UpdateOne(
+                        {"index": x["index"], "address": x["address"]},
+                        {
+                            "$inc": {
+                                "shares": x["shares"],
+                                "weight": x["weight"],
+                                "difficulty": float(x["difficulty"]),
+                            },
+                            "$min": {"first_time": x["first_time"]},
+                            "$max": {"last_time": x["last_time"]},
+                            "$setOnInsert": {"address_only": x["address_only"]},
+                        },
+                        upsert=True,
+                    )
+                    for x in pending.values()
+                ],
+                ordered=False,
+            )
+            self.flushes += 1
+        except Exception:
+            # keep the increments for the next flush
+            for key, x in pending.items():
+                if key in self.pending:
+                    rollup = self.pending[key]
+                    for field in ("shares", "weight", "difficulty"):
+                        rollup[field] += x[field]
+                    rollup["first_time"] = min(rollup["first_time"], x["first_time"])
+                    rollup["last_time"] = max(rollup["last_time"], x["last_time"])
+                else:
+                    self.pending[key] = x
+            self.app_log.warning("{}".format(format_exc()))
+
+    async def get_difficulties_for_heights(self, heights):
+        """Share difficulty by height and miner address, workers merged"""
+        await self.flush()
+        difficulties = {}
+        async for x in self.mongo.async_db.share_rollups.find(
+            {"index": {"$in": heights}},
+            {"_id": 0, "index": 1, "address": 1, "difficulty": 1},
+        ):
+            height = difficulties.setdefault(x["index"], {})
+            address = x["address"].split(".")[0]
+            height[address] = height.get(address, 0) + x["difficulty"]
+        return difficulties
+
+    async def get_share_count(self, query):
+        """Number of shares matching a query on address or address_only"""
+        await self.flush()
+        async for x in self.mongo.async_db.share_rollups.aggregate(
+            [
+                {"$match": query},
+                {"$group": {"_id": None, "shares": {"$sum": "$shares"}}},
+            ]
+        ):
+            return x["shares"]
+        return 0
+
+    async def delete(self, query):
+        """Removes shares and rollups matching a query on index or address"""
+        self.pending = {
+            key: x
+            for key, x in self.pending.items()
+            if not all(x[field] == value for field, value in query.items())
+        }
+        await self.mongo.async_db.shares.delete_many(query)
+        await self.mongo.async_db.share_rollups.delete_many(query)
+
+    def to_status_dict(self):
+        return {
+            "pending": len(self.pending),
+            "shares_added": self.shares_added,
+            "flushes": self.flushes,
+        }
@@ -0,0 +1,106 @@
+from logging import getLogger
+
+from yadacoin.core.config import Config
+
+
+class TargetWindow:
+    """Rolling (time, target) window over the most recent blocks in the db
+
+    Advanced by Consensus.insert_block, so retargeting reads the last retarget
+    periods from memory. The sum of the targets over each retarget period ending
+    at the tip is updated incrementally as blocks are pushed.
+    """
+
+    size = 60
+    periods = (30, 9)
+
+    def __init__(self):
+        self.config = Config()
+        self.mongo = self.config.mongo
+        self.app_log = getLogger("tornado.application")
+        self.entries = {}
+        self.sums = {}
+        self.tip_index = None
+        self.tip_hash = None
+
+    @staticmethod
+    def get_block_entry(block):
+        if isinstance(block, dict):
+            return int(block["time"]), int(block["target"], 16)
+        return int(block.time), int(block.target)
+
+    def is_current(self):
+        latest_block = self.config.LatestBlock.block
+        return (
+            latest_block is not None
+            and self.tip_index == latest_block.index
+            and self.tip_hash == latest_block.hash
+        )
+
+    async def load(self):
+        latest_block = self.config.LatestBlock.block
+        self.entries = {}
+        self.tip_index = None
+        self.tip_hash = None
+        if not latest_block:
+            return
+        self.entries = await self.fetch(
+            latest_block.index - self.size + 1, latest_block.index
+        )
+        self.tip_index = latest_block.index
+        self.tip_hash = latest_block.hash
+        self.sums = {
+            period: sum(
+                self.entries[i][1]
+                for i in range(self.tip_index, self.tip_index - period, -1)
+                if i in self.entries
+            )
+            for period in self.periods
+        }
+
+    async def fetch(self, start_index, end_index):
+        return {
+            x["index"]: self.get_block_entry(x)
+            async for x in self.mongo.async_db.blocks.find(
+                {"index": {"$gte": start_index, "$lte": end_index}},
+                {"_id": 0, "index": 1, "time": 1, "target": 1},
+            )
+        }
+
+    def push(self, block):
+        if block.index == self.tip_index and block.hash == self.tip_hash:
+            return
+        if (
+            self.tip_index is None
+            or block.index != self.tip_index + 1
+            or block.prev_hash != self.tip_hash
+        ):
+            # reorg or gap, reload from the db on next use
+            self.tip_index = None
+            self.tip_hash = None
+            return
+        entry = self.get_block_entry(block)
+        self.entries[block.index] = entry
+        for period in self.periods:
+            dropped = self.entries.get(block.index - period)
+            self.sums[period] += entry[1] - (dropped[1] if dropped else 0)
+        self.entries.pop(block.index - self.size, None)
+        self.tip_index = block.index
+        self.tip_hash = block.hash
+
+    async def get_entries(self, start_index, end_index):
+        if not self.is_current():
+            await self.load()
+        entries = {
+            i: self.entries[i]
+            for i in range(start_index, end_index + 1)
+            if i in self.entries
+        }
+        if self.tip_index is None or start_index <= self.tip_index - self.size:
+            entries.update(await self.fetch(start_index, end_index))
+        return entries
+
+    def get_sum(self, end_index, period):
+        if self.tip_index is None or end_index != self.tip_index:
+            return None
+        return self.sums.get(period)
@@ -7,7 +7,6 @@ from logging import getLogger
 from traceback import format_exc
 
 from bitcoin.signmessage import BitcoinMessage, VerifyMessage
-from bitcoin.wallet import P2PKHBitcoinAddress
 from coincurve import verify_signature
 from ecdsa import SECP256k1, VerifyingKey
 from ecdsa.util import sigdecode_der
@@ -15,6 +14,7 @@ from ecdsa.util import sigdecode_der
 from yadacoin.core.chain import CHAIN
 from yadacoin.core.collections import Collections
 from yadacoin.core.config import Config
+from yadacoin.core.crypt import public_key_to_address
 from yadacoin.core.transactionutils import TU
 
 
@@ -255,9 +255,7 @@ class Transaction(object):
         outputs_and_fee_total = sum([x.value for x in self.outputs]) + self.fee
         if outputs_and_fee_total == 0:
             return
-        my_address = str(
-            P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(self.public_key))
-        )
+        my_address = public_key_to_address(self.public_key)
 
         input_sum = 0
         inputs = []
@@ -345,9 +343,7 @@ class Transaction(object):
     ):
         if isinstance(input_obj, ExternalInput):
             await input_txn.verify()
-            address = str(
-                P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(input_txn.public_key))
-            )
+            address = public_key_to_address(input_txn.public_key)
         else:
             address = my_address
 
@@ -461,6 +457,11 @@ class Transaction(object):
         config.app_log.warning("Exception {}".format(e))
 
     def verify_signature(self, address):
+        key = (self.transaction_signature, self.hash, self.public_key)
+        if hasattr(
+            self.config, "verification_cache"
+        ) and self.config.verification_cache.has_passed(key, "signature"):
+            return
         try:
             result = verify_signature(
                 base64.b64decode(self.transaction_signature),
@@ -495,13 +496,11 @@ class Transaction(object):
                     raise InvalidTransactionSignatureException(
                         "transaction signature did not verify"
                     )
+        if hasattr(self.config, "verification_cache"):
+            self.config.verification_cache.mark_passed(key, "signature")
 
-    async def verify(
-        self,
-        check_input_spent=False,
-        check_max_inputs=False,
-        check_masternode_fee=False,
-    ):
+    async def verify_stateless(self, check_max_inputs=False):
+        """Checks that only depend on the transaction itself, safe to run in a worker process"""
         from yadacoin.contracts.base import Contract
 
         if check_max_inputs and len(self.inputs) > CHAIN.MAX_INPUTS:
@@ -510,13 +509,20 @@ class Transaction(object):
             )
 
         verify_hash = await self.generate_hash()
-        address = str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(self.public_key)))
+        address = public_key_to_address(self.public_key)
 
         if verify_hash != self.hash:
             raise InvalidTransactionException("transaction is invalid")
 
         self.verify_signature(address)
 
+        # the relationship is covered by the hash checked above
+        key = (self.transaction_signature, self.hash, self.public_key)
+        if hasattr(
+            self.config, "verification_cache"
+        ) and self.config.verification_cache.has_passed(key, "relationship_size"):
+            return
+
         relationship = self.relationship
         if isinstance(self.relationship, Contract):
             relationship = self.relationship.to_string()
@@ -525,6 +531,20 @@ class Transaction(object):
             raise MaxRelationshipSizeExceeded(
                 f"Relationship field cannot be greater than {TransactionConsts.RELATIONSHIP_MAX_SIZE.value} bytes"
             )
+        if hasattr(self.config, "verification_cache"):
+            self.config.verification_cache.mark_passed(key, "relationship_size")
+
+    async def verify(
+        self,
+        check_input_spent=False,
+        check_max_inputs=False,
+        check_masternode_fee=False,
+        check_stateless=True,
+    ):
+        if check_stateless:
+            await self.verify_stateless(check_max_inputs=check_max_inputs)
+
+        address = public_key_to_address(self.public_key)
         # verify spend
         total_input = 0
         exclude_recovered_ids = []
@@ -557,35 +577,41 @@ class Transaction(object):
             found = False
             for output in txn_input.outputs:
                 if isinstance(txn, ExternalInput):
-                    ext_address = P2PKHBitcoinAddress.from_pubkey(
-                        bytes.fromhex(txn_input.public_key)
-                    )
-                    int_address = P2PKHBitcoinAddress.from_pubkey(
-                        bytes.fromhex(txn.public_key)
-                    )
+                    ext_address = public_key_to_address(txn_input.public_key)
+                    int_address = public_key_to_address(txn.public_key)
                     if str(output.to) == str(ext_address) and str(int_address) == str(
                         txn.address
                     ):
-                        try:
-                            result = verify_signature(
-                                base64.b64decode(txn.signature),
-                                txn.id.encode("utf-8"),
-                                bytes.fromhex(txn_input.public_key),
-                            )
-                            if not result:
-                                raise Exception()
-                        except:
+                        key = (txn.signature, txn.id, txn_input.public_key)
+                        if not hasattr(
+                            self.config, "verification_cache"
+                        ) or not self.config.verification_cache.has_passed(
+                            key, "signature"
+                        ):
                             try:
-                                result = VerifyMessage(
-                                    ext_address,
-                                    BitcoinMessage(txn.id, magic=""),
-                                    txn.signature,
+                                result = verify_signature(
+                                    base64.b64decode(txn.signature),
+                                    txn.id.encode("utf-8"),
+                                    bytes.fromhex(txn_input.public_key),
                                 )
                                 if not result:
-                                    raise
+                                    raise Exception()
                             except:
-                                raise InvalidTransactionSignatureException(
-                                    "external input transaction signature did not verify"
+                                try:
+                                    result = VerifyMessage(
+                                        ext_address,
+                                        BitcoinMessage(txn.id, magic=""),
+                                        txn.signature,
+                                    )
+                                    if not result:
+                                        raise
+                                except:
+                                    raise InvalidTransactionSignatureException(
+                                        "external input transaction signature did not verify"
+                                    )
+                            if hasattr(self.config, "verification_cache"):
+                                self.config.verification_cache.mark_passed(
+                                    key, "signature"
                                 )
 
                         found = True
@@ -823,7 +849,7 @@ class Transaction(object):
         ):
             return False
         self.app_log.warning("recovering missing transaction input: {}".format(txn_id))
-        address = str(P2PKHBitcoinAddress.from_pubkey(bytes.fromhex(self.public_key)))
+        address = public_key_to_address(self.public_key)
         missing_txns = self.config.mongo.async_db.blocks.aggregate(
             [
                 {"$unwind": "$transactions"},
@@ -0,0 +1,81 @@
+from yadacoin.core.chainfollower import ChainFollower
+
+
+class TransactionIndex(ChainFollower):
+    """Flattened copy of the transactions in the chain
+
+    The transactions collection holds one document per transaction with the
+    index and hash of its block, its input ids and output addresses, so
+    lookups by id, hash, rid or input are point reads instead of scans of the
+    embedded transactions array of every matching block. Lookups fall back
+    to the blocks collection while the index is not current.
+    """
+
+    name = "Transaction index"
+    state_collection = "transactions_state"
+    block_projection = {"_id": 0, "index": 1, "hash": 1, "transactions": 1}
+    max_rollback = 1000
+
+    @staticmethod
+    def get_block_documents(block):
+        if not isinstance(block, dict):
+            block = block.to_dict()
+        return [
+            {
+                "id": txn.get("id"),
+                "hash": txn.get("hash"),
+                "public_key": txn.get("public_key"),
+                "rid": txn.get("rid"),
+                "requested_rid": txn.get("requested_rid"),
+                "requester_rid": txn.get("requester_rid"),
+                "time": txn.get("time"),
+                "block_index": block["index"],
+                "block_hash": block["hash"],
+                "input_ids": [x["id"] for x in txn.get("inputs", [])],
+                "output_to": [x["to"] for x in txn.get("outputs", [])],
+                "txn": txn,
+            }
+            for txn in block.get("transactions", [])
+        ]
+
+    def get_block_data(self, block):
+        return self.get_block_documents(block)
+
+    async def _load(self, height):
+        await self.mongo.async_db.transactions.delete_many(
+            {"block_index": {"$gt": height}}
+        )
+
+    async def can_rollback(self, rolled_back):
+        return rolled_back < self.max_rollback
+
+    async def _apply(self, entries):
+        documents = [x for _, _, block_documents in entries for x in block_documents]
+        if documents:
+            await self.mongo.async_db.transactions.insert_many(documents, ordered=False)
+        index, block_hash, _ = entries[-1]
+        await self._save_tip(index, block_hash)
+
+    async def _rollback(self, index):
+        await self.mongo.async_db.transactions.delete_many(
+            {"block_index": {"$gte": index}}
+        )
+        height = index - 1
+        previous = None
+        if height >= 0:
+            previous = await self.mongo.async_db.transactions.find_one(
+                {"block_index": height}, {"_id": 0, "block_hash": 1}
+            )
+        await self._save_tip(height, previous["block_hash"] if previous else None)
+
+    async def _reset(self):
+        await self.mongo.async_db.transactions.delete_many({})
+        await self._save_tip(-1, None)
+
+    async def get_blocks_query(self, query, blocks_query):
+        if not self.is_current():
+            return blocks_query
+        block_indexes = await self.mongo.async_db.transactions.distinct(
+            "block_index", query
+        )
+        return {"index": {"$in": block_indexes}}
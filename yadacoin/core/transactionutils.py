@@ -198,16 +198,23 @@ class TU(object):  # Transaction Utilities
         config.last_mempool_clean = time.time()
 
     @classmethod
-    async def rebroadcast_mempool(cls, config, confirmed_peers, include_zero=False):
+    async def rebroadcast_mempool(
+        cls, config, confirmed_peers=None, include_zero=False
+    ):
         from yadacoin.core.transaction import Transaction
 
         query = {"outputs.value": {"$gt": 0}}
         if include_zero:
             query = {}
+        confirmed_peers = confirmed_peers or {}
 
+        peer_streams = [x async for x in config.peer.get_sync_peers()]
+        if not peer_streams:
+            return
         async for txn in config.mongo.async_db.miner_transactions.find(query):
             x = Transaction.from_dict(txn)
-            async for peer_stream in config.peer.get_sync_peers():
+            to_peers = []
+            for peer_stream in peer_streams:
                 if (
                     peer_stream.peer.rid,
                     "newtxn",
@@ -217,34 +224,38 @@ class TU(object):  # Transaction Utilities
                         f"Skipping peer {peer_stream.peer.rid} in rebroadcast_mempool as it has already confirmed the transaction."
                     )
                     continue
-
-                await config.nodeShared.write_params(
-                    peer_stream, "newtxn", {"transaction": x.to_dict()}
-                )
-                if peer_stream.peer.protocol_version > 1:
-                    config.nodeClient.retry_messages[
-                        (peer_stream.peer.rid, "newtxn", x.transaction_signature)
-                    ] = {"transaction": x.to_dict()}
-                await asyncio.sleep(1)
+                if config.txn_inventory.supports(peer_stream):
+                    config.txn_inventory.announce(peer_stream, x.transaction_signature)
+                    continue
+                to_peers.append(peer_stream)
+            await cls.broadcast_transaction(config, x, to_peers)
+            # the writes of one transaction go out together, yield between them
+            await asyncio.sleep(0)
         return
 
     @classmethod
     async def rebroadcast_failed(cls, config, id):
         from yadacoin.core.transaction import Transaction
 
+        peer_streams = [x async for x in config.peer.get_sync_peers()]
         async for txn in config.mongo.async_db.failed_transactions.find(
             {"txn.id": id.replace(" ", "+")}
         ):
             x = Transaction.from_dict(txn["txn"])
-            async for peer_stream in config.peer.get_sync_peers():
-                await config.nodeShared.write_params(
-                    peer_stream, "newtxn", {"transaction": x.to_dict()}
-                )
-                if peer_stream.peer.protocol_version > 1:
-                    config.nodeClient.retry_messages[
-                        (peer_stream.peer.rid, "newtxn", x.transaction_signature)
-                    ] = {"transaction": x.to_dict()}
-                time.sleep(0.1)
+            await cls.broadcast_transaction(config, x, peer_streams)
+
+    @classmethod
+    async def broadcast_transaction(cls, config, txn, peer_streams):
+        """Sends newtxn to the peers with the message serialized once"""
+        if not peer_streams:
+            return
+        payload = {"transaction": txn.to_dict()}
+        await config.nodeShared.broadcast_params(peer_streams, "newtxn", payload)
+        for peer_stream in peer_streams:
+            if peer_stream.peer.protocol_version > 1:
+                config.nodeClient.retry_messages[
+                    (peer_stream.peer.rid, "newtxn", txn.transaction_signature)
+                ] = payload
 
     @classmethod
     async def get_current_smart_contract_txns(cls, config, start_index):
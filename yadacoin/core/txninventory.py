@@ -0,0 +1,137 @@
+from collections import OrderedDict
+from logging import getLogger
+from time import time
+
+from yadacoin.core.config import Config
+from yadacoin.tcpsocket.codec import INVENTORY_PROTOCOL_VERSION
+
+
+class TransactionInventory:
+    """Relays transactions to inventory peers by id instead of by body
+
+    Peers advertising INVENTORY_PROTOCOL_VERSION get the ids of new mempool
+    transactions, batched per peer and sent as one txninv every
+    txn_inventory_wait seconds. A peer asks for the ids missing from its
+    miner_transactions with gettxns and gets the bodies in txnsresponse.
+    Each peer has a bounded set of the ids it is known to have, from its
+    announcements, its gettxns requests and the transactions it sent us, and
+    those ids are never announced to it. Any other id is announced again by
+    the next mempool rebroadcast, so an announcement lost in transit is
+    retried the way retry_messages retries newtxn. Peers on older protocols
+    still get full newtxn messages.
+    """
+
+    max_known = 50000
+    max_announce = 1000
+    max_request = 100
+    request_timeout = 30
+
+    def __init__(self):
+        self.config = Config()
+        self.mongo = self.config.mongo
+        self.app_log = getLogger("tornado.application")
+        self.known = {}
+        self.pending = {}
+        self.requested = OrderedDict()
+        self.num_announced = 0
+        self.num_suppressed = 0
+        self.num_requested = 0
+        self.num_received = 0
+
+    @staticmethod
+    def supports(stream):
+        peer = getattr(stream, "peer", None)
+        return getattr(peer, "protocol_version", 1) >= INVENTORY_PROTOCOL_VERSION
+
+    def is_known(self, rid, txn_id):
+        return txn_id in self.known.get(rid, ())
+
+    def add_known(self, rid, txn_id):
+        known = self.known.get(rid)
+        if known is None:
+            known = self.known[rid] = OrderedDict()
+        known[txn_id] = None
+        known.move_to_end(txn_id)
+        while len(known) > self.max_known:
+            known.popitem(last=False)
+
+    def remove_peer(self, rid):
+        self.known.pop(rid, None)
+        self.pending.pop(rid, None)
+
+    def announce(self, stream, txn_id):
+        """Queues txn_id for the next txninv to stream, unless the peer has it"""
+        rid = stream.peer.rid
+        pending = self.pending.get(rid)
+        if self.is_known(rid, txn_id) or (pending and txn_id in pending[1]):
+            self.num_suppressed += 1
+            return False
+        if pending is None:
+            pending = self.pending[rid] = (stream, {})
+        pending[1][txn_id] = None
+        return True
+
+    async def flush(self):
+        pending, self.pending = self.pending, {}
+        for stream, txn_ids in pending.values():
+            txn_ids = list(txn_ids)
+            for i in range(0, len(txn_ids), self.max_announce):
+                await self.config.nodeShared.write_params(
+                    stream, "txninv", {"ids": txn_ids[i : i + self.max_announce]}
+                )
+            self.num_announced += len(txn_ids)
+
+    def expire_requests(self, now):
+        while self.requested:
+            txn_id, requested_at = next(iter(self.requested.items()))
+            if requested_at > now - self.request_timeout:
+                break
+            del self.requested[txn_id]
+
+    async def get_missing(self, stream, txn_ids):
+        """Announced ids that are not in the mempool, queued or requested"""
+        for txn_id in txn_ids:
+            self.add_known(stream.peer.rid, txn_id)
+        now = time()
+        self.expire_requests(now)
+        transaction_queue = self.config.processing_queues.transaction_queue
+        txn_ids = [
+            x
+            for x in dict.fromkeys(txn_ids)
+            if x not in self.requested
+            and x not in transaction_queue.queue
+            and not transaction_queue.is_seen(x)
+        ]
+        if not txn_ids:
+            return []
+        have = set()
+        async for x in self.mongo.async_db.miner_transactions.find(
+            {"id": {"$in": txn_ids}}, {"_id": 0, "id": 1}
+        ):
+            have.add(x["id"])
+        missing = [x for x in txn_ids if x not in have]
+        for txn_id in missing:
+            self.requested[txn_id] = now
+        self.num_requested += len(missing)
+        return missing
+
+    def add_requested(self, stream, txn_ids):
+        """The peer asked for txn_ids with gettxns and is sent what we have"""
+        for txn_id in txn_ids:
+            self.add_known(stream.peer.rid, txn_id)
+
+    def add_received(self, stream, txn_id):
+        self.add_known(stream.peer.rid, txn_id)
+        self.requested.pop(txn_id, None)
+        self.num_received += 1
+
+    def to_status_dict(self):
+        return {
+            "peers": len(self.known),
+            "pending": sum(len(x[1]) for x in self.pending.values()),
+            "requested": len(self.requested),
+            "announced": self.num_announced,
+            "suppressed": self.num_suppressed,
+            "num_requested": self.num_requested,
+            "received": self.num_received,
+        }
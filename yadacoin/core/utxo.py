@@ -0,0 +1,119 @@
+from collections import OrderedDict, defaultdict
+
+from pymongo import UpdateOne
+
+from yadacoin.core.chainfollower import ChainFollower
+
+
+class UTXOSet(ChainFollower):
+    """Spent output index keyed by (txn_id, public_key)
+
+    Every input of every transaction in the chain marks the output it consumes
+    as spent. The lowest block index spending a given output is kept in memory
+    and mirrored to the utxo_spent collection so a restart does not require a
+    full rebuild. Rollbacks reach back as far as the remembered tip hashes.
+    """
+
+    name = "UTXO set"
+    state_collection = "utxo_state"
+    block_projection = {
+        "_id": 0,
+        "index": 1,
+        "hash": 1,
+        "transactions.public_key": 1,
+        "transactions.inputs.id": 1,
+    }
+    max_tip_hashes = 1000
+
+    def __init__(self):
+        super().__init__()
+        self.spent = {}
+        self.keys_by_index = defaultdict(list)
+        self.tip_hashes = OrderedDict()
+
+    @staticmethod
+    def get_block_entries(block):
+        if isinstance(block, dict):
+            for txn in block.get("transactions", []):
+                for txn_input in txn.get("inputs", []):
+                    yield (txn_input["id"], txn["public_key"])
+        else:
+            for txn in block.transactions:
+                for txn_input in txn.inputs:
+                    yield (txn_input.id, txn.public_key)
+
+    def get_block_data(self, block):
+        return list(self.get_block_entries(block))
+
+    def get_spent_index(self, input_ids, public_key, from_index=None):
+        if not isinstance(input_ids, list):
+            input_ids = [input_ids]
+        spent_index = None
+        for input_id in input_ids:
+            index = self.spent.get((input_id, public_key))
+            if index is None:
+                continue
+            if from_index and index >= from_index:
+                continue
+            if spent_index is None or index < spent_index:
+                spent_index = index
+        return spent_index
+
+    async def _load(self, height):
+        await self.mongo.async_db.utxo_spent.delete_many({"index": {"$gt": height}})
+        async for x in self.mongo.async_db.utxo_spent.find({}, {"_id": 0}):
+            self.spent[(x["id"], x["public_key"])] = x["index"]
+            self.keys_by_index[x["index"]].append((x["id"], x["public_key"]))
+
+    async def can_rollback(self, rolled_back):
+        return self.height - 1 < 0 or self.height - 1 in self.tip_hashes
+
+    async def _apply(self, entries):
+        writes = []
+        for index, block_hash, keys in entries:
+            for key in keys:
+                existing = self.spent.get(key)
+                if existing is not None and existing <= index:
+                    continue
+                self.spent[key] = index
+                self.keys_by_index[index].append(key)
+                writes.append(
+                    UpdateOne(
+                        {"id": key[0], "public_key": key[1]},
+                        {"$min": {"index": index}},
+                        upsert=True,
+                    )
+                )
+            # every height is remembered for rollbacks
+            self.set_tip(index, block_hash)
+        if writes:
+            await self.mongo.async_db.utxo_spent.bulk_write(writes, ordered=False)
+        index, block_hash, _ = entries[-1]
+        await self._save_tip(index, block_hash)
+
+    async def _rollback(self, index):
+        for i in range(index, self.height + 1):
+            for key in self.keys_by_index.pop(i, []):
+                if self.spent.get(key) == i:
+                    del self.spent[key]
+            self.tip_hashes.pop(i, None)
+        await self.mongo.async_db.utxo_spent.delete_many({"index": {"$gte": index}})
+        height = index - 1
+        await self._save_tip(height, self.tip_hashes.get(height))
+
+    async def _reset(self):
+        self.spent = {}
+        self.keys_by_index = defaultdict(list)
+        self.tip_hashes = OrderedDict()
+        await self.mongo.async_db.utxo_spent.delete_many({})
+        await self._save_tip(-1, None)
+
+    def set_tip(self, height, block_hash):
+        super().set_tip(height, block_hash)
+        if height >= 0:
+            self.tip_hashes[height] = block_hash
+            while len(self.tip_hashes) > self.max_tip_hashes:
+                self.tip_hashes.popitem(last=False)
+
+    def to_status_dict(self):
+        return dict(super().to_status_dict(), num_spent=len(self.spent))
@@ -0,0 +1,39 @@
+from collections import OrderedDict
+
+
+class VerificationCache:
+    """Bounded LRU of the stateless checks a transaction has passed
+
+    Entries are keyed by (transaction_signature, hash, public_key). Signature
+    checks only depend on that triple, so a transaction verified on arrival is
+    not verified again by block template refreshes, block validation or
+    consensus. Spend checks depend on chain state and are never cached.
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def has_passed(self, key, check):
+        checks = self.entries.get(key)
+        if checks is None or check not in checks:
+            self.misses += 1
+            return False
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return True
+
+    def mark_passed(self, key, check):
+        self.entries.setdefault(key, set()).add(check)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def to_status_dict(self):
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,112 @@
+import asyncio
+from datetime import timedelta
+from logging import getLogger
+from time import time
+from traceback import format_exc
+
+import tornado.ioloop
+import tornado.locks
+from tornado.util import TimeoutError
+
+
+class Worker:
+    """Background coroutine that runs when woken, or every interval when idle
+
+    wake() is called by the producers of its work, a processing queue when an
+    item is added or Workers.notify for events like a new block. Wakes that
+    arrive while the worker runs are coalesced into one more run and runs
+    never overlap. The interval only matters when nothing wakes the worker.
+    A worker attached to a queue runs again right away while the queue still
+    holds items.
+    """
+
+    def __init__(self, name, target, interval, events=(), queue=None):
+        self.name = name
+        self.target = target
+        self.interval = interval
+        self.events = events
+        self.queue = queue
+        if queue is not None:
+            queue.worker = self
+        self.app_log = getLogger("tornado.application")
+        self.event = tornado.locks.Event()
+        self.woken_at = None
+        self.runs = 0
+        self.wakes = 0
+        self.last_run_time = 0
+        self.total_run_time = 0
+        self.last_lag = 0
+        self.max_lag = 0
+        self.last_run = 0
+
+    def wake(self):
+        if not self.event.is_set():
+            self.woken_at = time()
+            self.wakes += 1
+        self.event.set()
+
+    def start(self):
+        tornado.ioloop.IOLoop.current().spawn_callback(self.run)
+
+    def get_backlog(self):
+        if self.queue is None:
+            return None
+        return len(self.queue.queue)
+
+    async def run(self):
+        while True:
+            try:
+                await self.event.wait(timeout=timedelta(seconds=self.interval))
+            except TimeoutError:
+                pass
+            self.event.clear()
+            await self.run_once()
+            if self.get_backlog():
+                self.wake()
+            # let the producers in before the next run
+            await asyncio.sleep(0)
+
+    async def run_once(self):
+        start = time()
+        if self.woken_at is not None:
+            self.last_lag = start - self.woken_at
+            self.max_lag = max(self.max_lag, self.last_lag)
+            self.woken_at = None
+        try:
+            await self.target()
+        except Exception:
+            self.app_log.error(format_exc())
+        self.last_run = time()
+        self.last_run_time = self.last_run - start
+        self.total_run_time += self.last_run_time
+        self.runs += 1
+
+    def to_status_dict(self):
+        return {
+            "runs": self.runs,
+            "wakes": self.wakes,
+            "backlog": self.get_backlog(),
+            "last_run": int(self.last_run),
+            "last_run_time": "%.4f" % self.last_run_time,
+            "average_run_time": "%.4f" % (self.total_run_time / (self.runs or 1)),
+            "last_lag": "%.4f" % self.last_lag,
+            "max_lag": "%.4f" % self.max_lag,
+        }
+
+
+class Workers:
+    def __init__(self):
+        self.workers = {}
+
+    def add(self, worker):
+        self.workers[worker.name] = worker
+        worker.start()
+        return worker
+
+    def notify(self, event):
+        for worker in self.workers.values():
+            if event in worker.events:
+                worker.wake()
+
+    def to_status_dict(self):
+        return {name: x.to_status_dict() for name, x in self.workers.items()}
@@ -15,6 +15,19 @@ class HashrateAPIHandler(BaseHandler):
     async def refresh(self):
         from yadacoin.core.block import Block
 
+        if hasattr(self.config, "pool_stats") and self.config.pool_stats.blocks:
+            block = self.config.pool_stats.blocks[-1]
+            self.config.HashRateAPIHandler = {
+                "cache": {
+                    "time": time.time(),
+                    "circulating": CHAIN.get_circulating_supply(block.index),
+                    "height": block.index,
+                    "network_hash_rate": self.config.pool_stats.get_network_hash_rate(),
+                    "difficulty": int(CHAIN.MAX_TARGET / block.target),
+                }
+            }
+            return
+
         blocks = [
             await Block.from_dict(x)
             async for x in self.config.mongo.async_db.blocks.find({})
@@ -56,6 +69,11 @@ class ExplorerHandler(BaseHandler):
 
 
 class ExplorerSearchHandler(BaseHandler):
+    async def get_blocks_query(self, query, blocks_query):
+        if not hasattr(self.config, "transaction_index"):
+            return blocks_query
+        return await self.config.transaction_index.get_blocks_query(query, blocks_query)
+
     async def get_wallet_balance(self, term):
         re.search(r"[A-Fa-f0-9]+", term).group(0)
         res = await self.config.mongo.async_db.blocks.count_documents(
@@ -187,9 +205,10 @@ class ExplorerSearchHandler(BaseHandler):
 
         try:
             re.search(r"[A-Fa-f0-9]{64}", term).group(0)
-            res = await self.config.mongo.async_db.blocks.count_documents(
-                {"transactions.hash": term}
+            blocks_query = await self.get_blocks_query(
+                {"hash": term}, {"transactions.hash": term}
             )
+            res = await self.config.mongo.async_db.blocks.count_documents(blocks_query)
             if res:
                 return self.render_as_json(
                     {
@@ -197,7 +216,7 @@ class ExplorerSearchHandler(BaseHandler):
                         "result": [
                             changetime(x)
                             async for x in self.config.mongo.async_db.blocks.find(
-                                {"transactions.hash": term}, {"_id": 0}
+                                blocks_query, {"_id": 0}
                             )
                         ],
                     }
@@ -207,9 +226,10 @@ class ExplorerSearchHandler(BaseHandler):
 
         try:
             re.search(r"[A-Fa-f0-9]{64}", term).group(0)
-            res = await self.config.mongo.async_db.blocks.count_documents(
-                {"transactions.rid": term}
+            blocks_query = await self.get_blocks_query(
+                {"rid": term}, {"transactions.rid": term}
             )
+            res = await self.config.mongo.async_db.blocks.count_documents(blocks_query)
             if res:
                 return self.render_as_json(
                     {
@@ -217,7 +237,7 @@ class ExplorerSearchHandler(BaseHandler):
                         "result": [
                             changetime(x)
                             async for x in self.config.mongo.async_db.blocks.find(
-                                {"transactions.rid": term}, {"_id": 0}
+                                blocks_query, {"_id": 0}
                             )
                         ],
                     }
@@ -227,14 +247,17 @@ class ExplorerSearchHandler(BaseHandler):
 
         try:
             base64.b64decode(term.replace(" ", "+"))
-            res = await self.config.mongo.async_db.blocks.count_documents(
+            txn_id = term.replace(" ", "+")
+            blocks_query = await self.get_blocks_query(
+                {"$or": [{"id": txn_id}, {"input_ids": txn_id}]},
                 {
                     "$or": [
-                        {"transactions.id": term.replace(" ", "+")},
-                        {"transactions.inputs.id": term.replace(" ", "+")},
+                        {"transactions.id": txn_id},
+                        {"transactions.inputs.id": txn_id},
                     ]
-                }
+                },
             )
+            res = await self.config.mongo.async_db.blocks.count_documents(blocks_query)
             if res:
                 return self.render_as_json(
                     {
@@ -242,17 +265,7 @@ class ExplorerSearchHandler(BaseHandler):
                         "result": [
                             changetime(x)
                             async for x in self.config.mongo.async_db.blocks.find(
-                                {
-                                    "$or": [
-                                        {"transactions.id": term.replace(" ", "+")},
-                                        {
-                                            "transactions.inputs.id": term.replace(
-                                                " ", "+"
-                                            )
-                                        },
-                                    ]
-                                },
-                                {"_id": 0},
+                                blocks_query, {"_id": 0}
                             )
                         ],
                     }
@@ -324,15 +324,7 @@ class GetMonitoringHandler(BaseHandler):
             else self.config.public_key
         )
         mining_time_interval = 600
-        shares_count = await self.config.mongo.async_db.shares.count_documents(
-            {"time": {"$gte": time.time() - mining_time_interval}}, hint="__time"
-        )
-        if shares_count > 0:
-            pool_hash_rate = (
-                shares_count * self.config.pool_diff
-            ) / mining_time_interval
-        else:
-            pool_hash_rate = 0
+        pool_hash_rate = self.config.pool_stats.get_pool_hash_rate(mining_time_interval)
 
         pool_blocks_found_list = (
             await self.config.mongo.async_db.blocks.find(
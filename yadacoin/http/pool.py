@@ -17,7 +17,7 @@ class PoolSharesHandler(BaseHandler):
                     {"address_only": address},
                 ]
             }
-        total_share = await self.config.mongo.async_db.shares.count_documents(query)
+        total_share = await self.config.share_ledger.get_share_count(query)
         total_hash = total_share * self.config.pool_diff
         self.render_as_json({"total_hash": int(total_hash)})
 
@@ -46,6 +46,17 @@ class PoolPayoutsHandler(BaseHandler):
 class PoolHashRateHandler(BaseHandler):
     async def get(self):
         address = self.get_query_argument("address")
+        miner_hashrate_seconds = (
+            self.config.miner_hashrate_seconds
+            if hasattr(self.config, "miner_hashrate_seconds")
+            else 1200
+        )
+        if "." not in address:
+            miner_hashrate = self.config.pool_stats.get_miner_hash_rate(
+                address, miner_hashrate_seconds
+            )
+            if miner_hashrate is not None:
+                return self.render_as_json({"miner_hashrate": int(miner_hashrate)})
         query = {"address": address}
         if "." not in address:
             query = {
@@ -59,11 +70,6 @@ class PoolHashRateHandler(BaseHandler):
         )
         if not last_share:
             return self.render_as_json({"result": 0})
-        miner_hashrate_seconds = (
-            self.config.miner_hashrate_seconds
-            if hasattr(self.config, "miner_hashrate_seconds")
-            else 1200
-        )
 
         query = {"time": {"$gt": last_share["time"] - miner_hashrate_seconds}}
         if "." in address:
@@ -82,6 +88,23 @@ class PoolHashRateHandler(BaseHandler):
         self.render_as_json({"miner_hashrate": int(miner_hashrate)})
 
 
+class PoolStatsSeriesHandler(BaseHandler):
+    async def get(self):
+        series = self.get_query_argument("series", "pool_hashrate")
+        resolution = self.get_query_argument("resolution", "1h")
+        address = self.get_query_argument("address", None)
+        try:
+            results = self.config.pool_stats.get_series(series, resolution, address)
+        except KeyError:
+            self.set_status(400)
+            return self.render_as_json(
+                {"status": False, "message": "unknown series or resolution"}
+            )
+        self.render_as_json(
+            {"series": series, "resolution": resolution, "results": results}
+        )
+
+
 class PoolScanMissedPayoutsHandler(BaseHandler):
     async def get(self):
         start_index = self.get_query_argument("start_index")
@@ -93,5 +116,6 @@ POOL_HANDLERS = [
     (r"/shares-for-address", PoolSharesHandler),
     (r"/payouts-for-address", PoolPayoutsHandler),
     (r"/hashrate-for-address", PoolHashRateHandler),
+    (r"/pool-stats-series", PoolStatsSeriesHandler),
     (r"/scan-missed-payouts", PoolScanMissedPayoutsHandler),
 ]
@@ -567,14 +567,22 @@ class TransactionByIdHandler(BaseHandler):
         best_mt_txn = await self.config.mongo.async_db.miner_transactions.find_one(
             {"id": txn_id}, {"_id": 0}, sort=[("time", -1)]
         )
-        result = await self.config.mongo.async_db.blocks.find_one(
-            {"transactions.id": txn_id}, {"_id": 0}, sort=[("transactions.time", -1)]
-        )
         all_block_txn = []
-        if result:
-            for txn in result["transactions"]:
-                if txn["id"] == txn_id:
-                    all_block_txn.append(txn)
+        if self.config.BU.use_transaction_index():
+            async for x in self.config.mongo.async_db.transactions.find(
+                {"id": txn_id}, {"_id": 0, "txn": 1}
+            ):
+                all_block_txn.append(x["txn"])
+        else:
+            result = await self.config.mongo.async_db.blocks.find_one(
+                {"transactions.id": txn_id},
+                {"_id": 0},
+                sort=[("transactions.time", -1)],
+            )
+            if result:
+                for txn in result["transactions"]:
+                    if txn["id"] == txn_id:
+                        all_block_txn.append(txn)
 
         best_block_txn = None
         if all_block_txn:
@@ -1,5 +1,5 @@
+import asyncio
 import base64
-import json
 import socket
 import time
 from datetime import timedelta
@@ -7,16 +7,26 @@ from traceback import format_exc
 from uuid import uuid4
 
 from coincurve import verify_signature
+from tornado.concurrent import Future
 from tornado.iostream import StreamClosedError
 from tornado.tcpclient import TCPClient
 from tornado.tcpserver import TCPServer
 from tornado.util import TimeoutError
 
 from yadacoin.core.config import Config
+from yadacoin.tcpsocket.codec import (
+    COMPACT_PROTOCOL_VERSION,
+    decode,
+    encode,
+    read_frame,
+    use_compact,
+)
 
 REQUEST_RESPONSE_MAP = {
     "blockresponse": "getblock",
     "blocksresponse": "getblocks",
+    "headersresponse": "getheaders",
+    "txnsresponse": "gettxns",
 }
 
 REQUEST_ONLY = [
@@ -28,6 +38,7 @@ REQUEST_ONLY = [
     "blocksresponse_confirmed",
     "newblock_confirmed",
     "newtxn_confirmed",
+    "txninv",
     "disconnect",
 ]
 
@@ -42,27 +53,52 @@ class BaseRPC:
     async def write_params(self, stream, method, data):
         await self.write_as_json(stream, method, data, "params")
 
-    async def write_as_json(self, stream, method, data, rpc_type, req_id=None):
+    async def broadcast_params(self, streams, method, data):
+        """Sends the same params message to many streams, encoded once per format"""
+        rpc_data = {
+            "id": str(uuid4()),
+            "method": method,
+            "jsonrpc": 2.0,
+            "params": data,
+        }
+        encoded = {}
+        await asyncio.gather(
+            *[
+                self.write_as_json(
+                    stream, method, data, "params", rpc_data=rpc_data, encoded=encoded
+                )
+                for stream in streams
+            ]
+        )
+
+    async def write_as_json(
+        self, stream, method, data, rpc_type, req_id=None, rpc_data=None, encoded=None
+    ):
         if isinstance(stream, DummyStream):
             self.config.app_log.warning(
                 "Stream is an instance of DummyStream, cannot send data."
             )
             return
-        rpc_data = {
-            "id": req_id if req_id else str(uuid4()),
-            "method": method,
-            "jsonrpc": 2.0,
-            rpc_type: data,
-        }
+        if rpc_data is None:
+            rpc_data = {
+                "id": req_id if req_id else str(uuid4()),
+                "method": method,
+                "jsonrpc": 2.0,
+                rpc_type: data,
+            }
         if rpc_type == "params":
-            if method not in stream.message_queue:
-                stream.message_queue[method] = {}
-            if len(stream.message_queue[method].keys()) > 25:
-                queue_key = list(stream.message_queue[method].keys())[0]
-                del stream.message_queue[method][queue_key]
-            stream.message_queue[method][rpc_data["id"]] = rpc_data
+            message_queue = stream.message_queue.setdefault(method, {})
+            if len(message_queue) > 25:
+                del message_queue[next(iter(message_queue))]
+            message_queue[rpc_data["id"]] = rpc_data
         try:
-            await stream.write("{}\n".format(json.dumps(rpc_data)).encode())
+            compact = self.config.protocol_version >= COMPACT_PROTOCOL_VERSION
+            compact = compact and use_compact(stream, method)
+            if encoded is None:
+                encoded = {}
+            if compact not in encoded:
+                encoded[compact] = encode(rpc_data, compact=compact)
+            await OutboundBuffer.get(stream).write(encoded[compact])
         except StreamClosedError:
             if hasattr(stream, "peer"):
                 self.config.app_log.warning(
@@ -128,15 +164,15 @@ class BaseRPC:
                 id_attr
             ]
         try:
-            for y in self.config.nodeServer.retry_messages.copy():
-                if y[0] == id_attr:
-                    del self.config.nodeServer.retry_messages[y]
+            self.config.nodeServer.retry_messages.remove_peer(id_attr)
         except:
             pass
         try:
-            for y in self.config.nodeClient.retry_messages.copy():
-                if y[0] == id_attr:
-                    del self.config.nodeClient.retry_messages[y]
+            self.config.nodeClient.retry_messages.remove_peer(id_attr)
+        except:
+            pass
+        try:
+            self.config.txn_inventory.remove_peer(id_attr)
         except:
             pass
 
@@ -162,10 +198,12 @@ class RPCSocketServer(TCPServer, BaseRPC):
         stream.message_queue = {}
         while True:
             try:
-                data = await stream.read_until(b"\n")
+                # stop reading while the processing queues are full
+                await self.config.processing_queues.wait_for_space()
+                data = await read_frame(stream)
                 stream.last_activity = int(time.time())
                 self.config.health.tcp_server.last_activity = time.time()
-                body = json.loads(data)
+                body = decode(data)
                 method = body.get("method")
                 if "result" in body:
                     if method in REQUEST_RESPONSE_MAP:
@@ -253,13 +291,67 @@ class RPCSocketServer(TCPServer, BaseRPC):
                 id_attr
             ]
         try:
-            for y in self.config.nodeServer.retry_messages.copy():
-                if y[0] == id_attr:
-                    del self.config.nodeServer.retry_messages[y]
+            self.config.nodeServer.retry_messages.remove_peer(id_attr)
+        except:
+            pass
+        try:
+            self.config.txn_inventory.remove_peer(id_attr)
         except:
             pass
 
 
+class OutboundBuffer:
+    """Coalesces the messages written to a stream while a write is pending
+
+    The first writer writes straight to the stream. Messages queued while
+    that write is in progress are joined and written in one call once it
+    completes, so bursts of small messages become a few large writes without
+    delaying a message sent on an idle stream. Each writer still waits until
+    its own bytes are written and sees the error if the write fails.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.chunks = []
+        self.waiters = []
+        self.writing = False
+        self.writes = 0
+        self.messages = 0
+
+    @classmethod
+    def get(cls, stream):
+        buffer = getattr(stream, "outbound_buffer", None)
+        if buffer is None:
+            buffer = stream.outbound_buffer = cls(stream)
+        return buffer
+
+    async def write(self, data):
+        self.chunks.append(data)
+        self.messages += 1
+        if self.writing:
+            waiter = Future()
+            self.waiters.append(waiter)
+            await waiter
+            return
+        self.writing = True
+        try:
+            while self.chunks:
+                chunks, self.chunks = self.chunks, []
+                waiters, self.waiters = self.waiters, []
+                try:
+                    await self.stream.write(b"".join(chunks))
+                except Exception as e:
+                    for waiter in waiters + self.waiters:
+                        waiter.set_exception(e)
+                    self.chunks, self.waiters = [], []
+                    raise
+                self.writes += 1
+                for waiter in waiters:
+                    waiter.set_result(None)
+        finally:
+            self.writing = False
+
+
 class DummyStream:
     peer = None
 
@@ -407,7 +499,9 @@ class RPCSocketClient(TCPClient):
     async def wait_for_data(self, stream):
         while True:
             try:
-                body = json.loads(await stream.read_until(b"\n"))
+                # stop reading while the processing queues are full
+                await self.config.processing_queues.wait_for_space()
+                body = decode(await read_frame(stream))
                 if "result" in body:
                     if body["method"] in REQUEST_RESPONSE_MAP:
                         if body["id"] in stream.message_queue.get(
@@ -461,8 +555,6 @@ class RPCSocketClient(TCPClient):
         if stream.peer.rid in self.outbound_pending[stream.peer.__class__.__name__]:
             del self.outbound_pending[stream.peer.__class__.__name__][stream.peer.rid]
         try:
-            for y in self.config.nodeClient.retry_messages.copy():
-                if y[0] == stream.peer.rid:
-                    del self.config.nodeClient.retry_messages[y]
+            self.config.nodeClient.retry_messages.remove_peer(stream.peer.rid)
         except:
             pass
@@ -0,0 +1,159 @@
+import base64
+import binascii
+import json
+import struct
+import zlib
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# peers advertising this protocol_version accept compact frames
+COMPACT_PROTOCOL_VERSION = 4
+# and from this one relay transactions by inventory, see TransactionInventory
+INVENTORY_PROTOCOL_VERSION = 5
+
+# methods carrying whole blocks, everything else stays newline delimited json
+COMPACT_METHODS = {
+    "blocksresponse",
+    "blocksresponse_confirmed",
+    "headersresponse",
+    "blockresponse",
+    "blockresponse_confirmed",
+    "newblock",
+    "newblock_confirmed",
+    "txninv",
+    "gettxns",
+    "txnsresponse",
+}
+
+# string fields sent as raw bytes when they round trip exactly
+BINARY_FIELDS = {
+    "hash",
+    "prevHash",
+    "merkleRoot",
+    "public_key",
+    "dh_public_key",
+    "id",
+    "ids",
+    "rid",
+    "requester_rid",
+    "requested_rid",
+    "relationship",
+    "relationship_hash",
+    "prerotated_key_hash",
+    "miner_signature",
+    "target",
+    "special_target",
+}
+
+EXT_HEX = 1
+EXT_BASE64 = 2
+
+# a json line never starts with a null byte
+FRAME_MARKER = b"\x00"
+FRAME_HEADER = struct.Struct(">BI")
+FLAG_ZLIB = 1
+
+COMPRESS_THRESHOLD = 1024
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+
+class WireFormatException(Exception):
+    pass
+
+
+def is_available():
+    return msgpack is not None
+
+
+def get_protocol_version(compact_wire_format, inventory_relay):
+    if not compact_wire_format or not is_available():
+        return 3
+    if inventory_relay:
+        return INVENTORY_PROTOCOL_VERSION
+    return COMPACT_PROTOCOL_VERSION
+
+
+def use_compact(stream, method):
+    return (
+        method in COMPACT_METHODS
+        and is_available()
+        and hasattr(stream, "peer")
+        and getattr(stream.peer, "protocol_version", 1) >= COMPACT_PROTOCOL_VERSION
+    )
+
+
+def pack_string(value):
+    if len(value) % 2 == 0:
+        try:
+            raw = bytes.fromhex(value)
+            if raw.hex() == value:
+                return msgpack.ExtType(EXT_HEX, raw)
+        except ValueError:
+            pass
+    try:
+        raw = base64.b64decode(value, validate=True)
+        if base64.b64encode(raw).decode() == value:
+            return msgpack.ExtType(EXT_BASE64, raw)
+    except (ValueError, binascii.Error):
+        pass
+    return value
+
+
+def pack_fields(value, key=None):
+    if isinstance(value, dict):
+        return {k: pack_fields(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [pack_fields(x, key) for x in value]
+    if key in BINARY_FIELDS and isinstance(value, str) and value:
+        return pack_string(value)
+    return value
+
+
+def unpack_ext(code, data):
+    if code == EXT_HEX:
+        return data.hex()
+    if code == EXT_BASE64:
+        return base64.b64encode(data).decode()
+    return msgpack.ExtType(code, data)
+
+
+def encode(rpc_data, compact=False):
+    if not compact:
+        return "{}\n".format(json.dumps(rpc_data)).encode()
+    payload = msgpack.packb(pack_fields(rpc_data), use_bin_type=True)
+    flags = 0
+    if len(payload) > COMPRESS_THRESHOLD:
+        payload = zlib.compress(payload)
+        flags |= FLAG_ZLIB
+    return FRAME_MARKER + FRAME_HEADER.pack(flags, len(payload)) + payload
+
+
+async def read_frame(stream):
+    marker = await stream.read_bytes(1)
+    if marker != FRAME_MARKER:
+        return marker + await stream.read_until(b"\n")
+    header = await stream.read_bytes(FRAME_HEADER.size)
+    flags, length = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise WireFormatException("frame too large: {}".format(length))
+    return marker + header + await stream.read_bytes(length)
+
+
+def decode(data):
+    if data[:1] != FRAME_MARKER:
+        return json.loads(data)
+    if not is_available():
+        raise WireFormatException("compact frame received but msgpack is missing")
+    flags, length = FRAME_HEADER.unpack(data[1 : 1 + FRAME_HEADER.size])
+    payload = data[1 + FRAME_HEADER.size :]
+    if flags & FLAG_ZLIB:
+        decompressor = zlib.decompressobj()
+        payload = decompressor.decompress(payload, MAX_FRAME_SIZE)
+        if decompressor.unconsumed_tail:
+            raise WireFormatException("decompressed frame too large")
+    return msgpack.unpackb(
+        payload, raw=False, ext_hook=unpack_ext, strict_map_key=False
+    )
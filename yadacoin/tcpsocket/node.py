@@ -9,6 +9,7 @@ from yadacoin.core.block import Block
 from yadacoin.core.blockchain import Blockchain
 from yadacoin.core.chain import CHAIN
 from yadacoin.core.config import Config
+from yadacoin.core.headersync import HEADER_FIELDS
 from yadacoin.core.peer import (
     Group,
     Peer,
@@ -22,6 +23,7 @@ from yadacoin.core.processingqueue import (
     BlockProcessingQueueItem,
     TransactionProcessingQueueItem,
 )
+from yadacoin.core.retrymessages import RetryMessages
 from yadacoin.core.transaction import Transaction
 from yadacoin.core.transactionutils import TU
 from yadacoin.enums.modes import MODES
@@ -62,7 +64,7 @@ class NodeClientNewTxnTracker:
 
 
 class NodeRPC(BaseRPC):
-    retry_messages = {}
+    retry_messages = RetryMessages()
     confirmed_peers = set()
 
     def __init__(self):
@@ -96,6 +98,29 @@ class NodeRPC(BaseRPC):
                 (stream.peer.rid, "blocksresponse", start_index, body["id"])
             ] = message
 
+    async def getheaders(self, body, stream):
+        params = body.get("params")
+        start_index = int(params.get("start_index", 0))
+        end_index = min(
+            int(params.get("end_index", 0)),
+            start_index + CHAIN.MAX_HEADERS_PER_MESSAGE - 1,
+        )
+        headers = self.config.mongo.async_db.blocks.find(
+            {"index": {"$gte": start_index, "$lte": end_index}},
+            {"_id": 0, **{x: 1 for x in HEADER_FIELDS}},
+        ).sort([("index", 1)])
+        result = await headers.to_list(length=CHAIN.MAX_HEADERS_PER_MESSAGE)
+        await self.write_result(
+            stream,
+            "headersresponse",
+            {"headers": result, "start_index": start_index},
+            body["id"],
+        )
+
+    async def headersresponse(self, body, stream):
+        result = body.get("result", {})
+        await self.config.header_sync.on_headers(stream, result.get("headers", []))
+
     async def service_provider_request(self, body, stream):
         payload = body.get("params", {})
         if not payload.get("seed_gateway"):
@@ -158,6 +183,10 @@ class NodeRPC(BaseRPC):
             self.config.app_log.info("newtxn, no payload")
             return
 
+        await self.add_transaction(txn, body, stream)
+
+    async def add_transaction(self, txn, body, stream):
+        self.config.txn_inventory.add_known(stream.peer.rid, txn.transaction_signature)
         self.newtxn_tracker.by_host[stream.peer.host] = (
             self.newtxn_tracker.by_host.get(stream.peer.host, 0) + 1
         )
@@ -191,6 +220,35 @@ class NodeRPC(BaseRPC):
         if peer_stream:
             await peer_stream.newtxn(body, source="tcpsocket")
 
+    async def txninv(self, body, stream):
+        txn_ids = body.get("params", {}).get("ids", [])
+        txn_ids = txn_ids[: self.config.txn_inventory.max_announce]
+        missing = await self.config.txn_inventory.get_missing(stream, txn_ids)
+        max_request = self.config.txn_inventory.max_request
+        for i in range(0, len(missing), max_request):
+            await self.write_params(
+                stream, "gettxns", {"ids": missing[i : i + max_request]}
+            )
+
+    async def gettxns(self, body, stream):
+        txn_ids = body.get("params", {}).get("ids", [])
+        txn_ids = txn_ids[: self.config.txn_inventory.max_request]
+        self.config.txn_inventory.add_requested(stream, txn_ids)
+        transactions = await self.config.mongo.async_db.miner_transactions.find(
+            {"id": {"$in": txn_ids}}, {"_id": 0}
+        ).to_list(length=len(txn_ids))
+        await self.write_result(
+            stream, "txnsresponse", {"transactions": transactions}, body["id"]
+        )
+
+    async def txnsresponse(self, body, stream):
+        for transaction in body.get("result", {}).get("transactions", []):
+            txn = Transaction.from_dict(transaction)
+            self.config.txn_inventory.add_received(stream, txn.transaction_signature)
+            await self.add_transaction(
+                txn, {"id": body["id"], "params": {"transaction": transaction}}, stream
+            )
+
     async def process_transaction_queue(self):
         item = self.config.processing_queues.transaction_queue.pop()
         i = 0  # max loops
@@ -263,6 +321,11 @@ class NodeRPC(BaseRPC):
                     f"Skipping peer {stream.peer.rid} in inbound stream as it has already confirmed the transaction."
                 )
                 continue
+            if self.config.txn_inventory.supports(peer_stream):
+                self.config.txn_inventory.announce(
+                    peer_stream, txn.transaction_signature
+                )
+                continue
             if peer_stream.peer.protocol_version > 1:
                 self.retry_messages[
                     (peer_stream.peer.rid, "newtxn", txn.transaction_signature)
@@ -285,6 +348,11 @@ class NodeRPC(BaseRPC):
                     f"Skipping peer {stream.peer.rid} in outbound stream as it has already confirmed the transaction."
                 )
                 continue
+            if self.config.txn_inventory.supports(peer_stream):
+                self.config.txn_inventory.announce(
+                    peer_stream, txn.transaction_signature
+                )
+                continue
             if peer_stream.peer.protocol_version > 1:
                 self.config.nodeClient.retry_messages[
                     (peer_stream.peer.rid, "newtxn", txn.transaction_signature)
@@ -375,8 +443,15 @@ class NodeRPC(BaseRPC):
         if self.config.LatestBlock.block.index >= CHAIN.CHECK_MASTERNODE_FEE_FORK:
             check_masternode_fee = True
 
+        inventory = self.config.txn_inventory.supports(peer_stream)
         async for x in self.config.mongo.async_db.miner_transactions.find({}):
             txn = Transaction.from_dict(x)
+            if inventory:
+                # the peer fetches what it is missing
+                self.config.txn_inventory.announce(
+                    peer_stream, txn.transaction_signature
+                )
+                continue
             try:
                 await txn.verify(
                     check_max_inputs=check_max_inputs,
@@ -393,13 +468,23 @@ class NodeRPC(BaseRPC):
                 ] = payload
 
     async def send_block_to_peers(self, block):
+        peer_streams = []
         async for peer_stream in self.config.peer.get_sync_peers():
             if (
                 hasattr(peer_stream.peer, "block")
                 and peer_stream.peer.block.index > block.index + 100
             ):
                 continue
-            await self.send_block_to_peer(block, peer_stream)
+            peer_streams.append(peer_stream)
+        if not peer_streams:
+            return
+        payload = {"payload": {"block": block.to_dict()}}
+        await self.broadcast_params(peer_streams, "newblock", payload)
+        for peer_stream in peer_streams:
+            if peer_stream.peer.protocol_version > 1:
+                self.retry_messages[
+                    (peer_stream.peer.rid, "newblock", block.hash)
+                ] = payload
 
     async def send_block_to_peer(self, block, peer_stream):
         payload = {"payload": {"block": block.to_dict()}}
@@ -453,6 +538,13 @@ class NodeRPC(BaseRPC):
             await self.write_result(
                 stream, "blocksresponse_confirmed", body.get("result", {}), body["id"]
             )
+        if hasattr(self.config, "header_sync") and self.config.header_sync.is_requested(
+            stream, result.get("start_index")
+        ):
+            await self.config.header_sync.on_blocks(
+                stream, result.get("start_index"), blocks or []
+            )
+            return
         if not blocks:
             self.config.app_log.info(f"blocksresponse, no blocks, {stream.peer.host}")
             self.config.consensus.syncing = False
@@ -863,7 +955,7 @@ class NodeRPC(BaseRPC):
 
 
 class NodeSocketServer(RPCSocketServer, NodeRPC):
-    retry_messages = {}
+    retry_messages = RetryMessages()
     disconnect_tracker = NodeServerDisconnectTracker()
     newtxn_tracker = NodeServerNewTxnTracker()
 
@@ -873,7 +965,7 @@ class NodeSocketServer(RPCSocketServer, NodeRPC):
 
 
 class NodeSocketClient(RPCSocketClient, NodeRPC):
-    retry_messages = {}
+    retry_messages = RetryMessages()
     disconnect_tracker = NodeClientDisconnectTracker()
     newtxn_tracker = NodeClientNewTxnTracker()
 
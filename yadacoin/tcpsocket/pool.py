@@ -74,18 +74,18 @@ class StratumServer(RPCSocketServer):
     async def update_miner_count(cls):
         if not cls.config:
             cls.config = Config()
+        worker_count = len(StratumServer.inbound_streams[Miner.__name__].keys())
+        miner_count = len(await Peer.get_miner_streams())
+        if hasattr(cls.config, "pool_stats"):
+            cls.config.pool_stats.set_counts(miner_count, worker_count)
         await cls.config.mongo.async_db.pool_stats.update_one(
             {"stat": "worker_count"},
-            {
-                "$set": {
-                    "value": len(StratumServer.inbound_streams[Miner.__name__].keys())
-                }
-            },
+            {"$set": {"value": worker_count}},
             upsert=True,
         )
         await cls.config.mongo.async_db.pool_stats.update_one(
             {"stat": "miner_count"},
-            {"$set": {"value": len(await Peer.get_miner_streams())}},
+            {"$set": {"value": miner_count}},
             upsert=True,
         )
 
@@ -230,7 +230,7 @@ class RCPWebSocketServer(WebSocketHandler):
             bytes.fromhex(self.peer.identity.public_key)
         )
 
-        shares = await self.config.mongo.async_db.shares.count_documents(
+        shares = await self.config.share_ledger.get_share_count(
             {"address": str(address)}
         )
 